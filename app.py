@@ -1,15 +1,40 @@
 
 import os
 import io
+import glob
+import json
 import uuid
+import sqlite3
+import shutil
 import hashlib
+import logging
+import threading
+import multiprocessing
 import datetime as dt
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import closing, contextmanager
 import streamlit as st
+import numpy as np
 import pandas as pd
 import altair as alt  # Interactive charts
 from openpyxl.styles import PatternFill
 from openpyxl.formatting.rule import CellIsRule
 from openpyxl.utils import get_column_letter
+from ingest import (DIMENSION_COLUMNS, MONTH_KEY, FilterIndex, SearchIndex, as_dimension, format_percent_columns,
+                    isin_text, iter_data_sheet, looks_like_percent_col, metric_columns, normalized_month,
+                    parse_upload_file, read_data_sheet, stored_text, type_percent_columns, widen_frames)
+
+try:  # Parquet storage backend (optional; falls back to the Excel backend when missing)
+    import pyarrow
+    import pyarrow.parquet as pq
+except ImportError:
+    pyarrow = pq = None
+try:  # POSIX advisory file locks for concurrent sessions (not available on Windows)
+    import fcntl
+except ImportError:
+    fcntl = None
 
 
 # -------------------------------------
@@ -30,6 +55,7 @@ ATTACHMENTS_DIR = os.path.join(DATA_DIR, "attachments")
 HISTORY_FILE = os.path.join(DATA_DIR, "history.xlsx")
 COMBINED_FILE = os.path.join(DATA_DIR, "combined_data.xlsx")
 COMBINED_FILE_CSV = os.path.join(DATA_DIR, "combined_data.csv")
+COMBINED_DIR = os.path.join(DATA_DIR, "combined")
 AUDIT_LOG_FILE = os.path.join(DATA_DIR, "audit_log.xlsx")
 
 
@@ -42,6 +68,7 @@ BA_ATTACHMENTS_DIR = os.path.join(DATA_DIR, "attachments_ba")
 BA_HISTORY_FILE = os.path.join(DATA_DIR, "ba_history.xlsx")
 BA_COMBINED_FILE = os.path.join(DATA_DIR, "ba_combined_data.xlsx")
 BA_COMBINED_FILE_CSV = os.path.join(DATA_DIR, "ba_combined_data.csv")
+BA_COMBINED_DIR = os.path.join(DATA_DIR, "ba_combined")
 BA_AUDIT_LOG_FILE = os.path.join(DATA_DIR, "ba_audit_log.xlsx")
 BA_FEEDBACK_FILE = os.path.join(DATA_DIR, "ba_monthly_feedback.xlsx")
 BA_EXPORT_PREFIX = "ba_"
@@ -53,6 +80,7 @@ PE_ATTACHMENTS_DIR = os.path.join(DATA_DIR, "attachments_pe")
 PE_HISTORY_FILE = os.path.join(DATA_DIR, "pe_history.xlsx")
 PE_COMBINED_FILE = os.path.join(DATA_DIR, "pe_combined_data.xlsx")
 PE_COMBINED_FILE_CSV = os.path.join(DATA_DIR, "pe_combined_data.csv")
+PE_COMBINED_DIR = os.path.join(DATA_DIR, "pe_combined")
 PE_AUDIT_LOG_FILE = os.path.join(DATA_DIR, "pe_audit_log.xlsx")
 PE_FEEDBACK_FILE = os.path.join(DATA_DIR, "pe_monthly_feedback.xlsx")
 PE_EXPORT_PREFIX = "pe_"
@@ -62,6 +90,7 @@ TL_ATTACHMENTS_DIR = os.path.join(DATA_DIR, "attachments_tl")
 TL_HISTORY_FILE = os.path.join(DATA_DIR, "tl_history.xlsx")
 TL_COMBINED_FILE = os.path.join(DATA_DIR, "tl_combined_data.xlsx")
 TL_COMBINED_FILE_CSV = os.path.join(DATA_DIR, "tl_combined_data.csv")
+TL_COMBINED_DIR = os.path.join(DATA_DIR, "tl_combined")
 TL_AUDIT_LOG_FILE = os.path.join(DATA_DIR, "tl_audit_log.xlsx")
 TL_FEEDBACK_FILE = os.path.join(DATA_DIR, "tl_monthly_feedback.xlsx")
 TL_EXPORT_PREFIX = "tl_"
@@ -71,6 +100,7 @@ PL_ATTACHMENTS_DIR = os.path.join(DATA_DIR, "attachments_pl")
 PL_HISTORY_FILE = os.path.join(DATA_DIR, "pl_history.xlsx")
 PL_COMBINED_FILE = os.path.join(DATA_DIR, "pl_combined_data.xlsx")
 PL_COMBINED_FILE_CSV = os.path.join(DATA_DIR, "pl_combined_data.csv")
+PL_COMBINED_DIR = os.path.join(DATA_DIR, "pl_combined")
 PL_AUDIT_LOG_FILE = os.path.join(DATA_DIR, "pl_audit_log.xlsx")
 PL_FEEDBACK_FILE = os.path.join(DATA_DIR, "pl_monthly_feedback.xlsx")
 PL_EXPORT_PREFIX = "pl_"
@@ -81,7 +111,24 @@ PL_EXPORT_PREFIX = "pl_"
 EXCEL_MAX_ROWS = 1048576
 EXCEL_MAX_COLS = 16384
 REQUIRED_COLS = ["Domain ID", "Function", "Function Lead", "Team Lead"]
-MAX_UPLOAD_MB = 25
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "200"))
+# Larger uploads are streamed into storage in chunks of INGEST_CHUNK_ROWS rows instead of parsed in memory
+STREAM_UPLOAD_MB = float(os.getenv("STREAM_UPLOAD_MB", "25"))
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "20000"))
+
+# Combined-data storage backend: "parquet" (typed columnar parts under <prefix>combined/)
+# or "excel" (legacy whole-file combined_data.xlsx / .csv round-trip)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "parquet").strip().lower()
+# Corrected re-uploads of a month are stored as row deltas on the attachment they replace (Parquet backend only)
+DELTA_UPLOADS = os.getenv("DELTA_UPLOADS", "1").strip().lower() not in ("0", "false", "no", "off")
+DELTA_MAX_FRACTION = 0.5  # above this share of changed/added/removed rows the new file is stored in full
+DELTA_MAX_CHAIN = 8       # deltas stacked on deltas before a full write
+# Workbook reader for uploads and rebuilds: "auto" (calamine when installed, else openpyxl), "calamine" or "openpyxl"
+EXCEL_READER_ENGINE = os.getenv("EXCEL_READER_ENGINE", "auto").strip().lower()
+# Drop folder under DATA_DIR whose .xlsx files are ingested automatically (routed by filename); empty = off
+DROP_FOLDER = os.getenv("DROP_FOLDER", "").strip()
+DROP_DIR = os.path.join(DATA_DIR, DROP_FOLDER) if DROP_FOLDER else ""
+DROP_POLL_SECONDS = float(os.getenv("DROP_POLL_SECONDS", "30"))
 USERS = {
     "admin": {"password_hash": hashlib.sha256("admin123".encode()).hexdigest(), "role": "admin", "display_name": "Administrator"},
     "viewer": {"password_hash": hashlib.sha256("viewer123".encode()).hexdigest(), "role": "user", "display_name": "Viewer"},
@@ -91,106 +138,213 @@ FEEDBACK_FILE = os.path.join(DATA_DIR, "monthly_feedback.xlsx")
 FEEDBACK_PASSWORD = "TL@2025"
 MAX_FEEDBACK_CHARS = 500
 
+# Metadata store (history, feedback) for all datasets: one SQLite database in WAL mode.
+# Table names keep the old workbook names; the *.xlsx files above are only read once, for migration.
+METADATA_DB = os.path.join(DATA_DIR, "metadata.db")
+HISTORY_COLUMNS = [
+    "id","filename","saved_path","uploader","upload_dt","reporting_month",
+    "rows_count","source_url","status","message","active","superseded_by","validation_status","content_sha256"
+]
+AUDIT_COLUMNS = ["timestamp","action","attachment_id","filename","performed_by"]
+FEEDBACK_COLUMNS = ["Domain ID","Name","Month","Team Lead","Feedback","timestamp","entered_by"]
+
+# Per-dataset registry (keys match the upload routing labels)
+DATASET_KEYS = ["Associates", "BA", "PE", "TL", "PL"]
+DATASET_LABELS = {"Associates": "Associates", "BA": "Business Analyst", "PE": "Process Expert", "TL": "Team Lead", "PL": "Project Lead"}
+# Filename terms that route an upload to its dataset, checked in this order
+UPLOAD_ROUTES = [("business analyst", "BA"), ("associate", "Associates"), ("process expert", "PE"), ("team lead", "TL"), ("project lead", "PL")]
+ATTACHMENT_DIRS = {
+    "Associates": ATTACHMENTS_DIR, "BA": BA_ATTACHMENTS_DIR, "PE": PE_ATTACHMENTS_DIR,
+    "TL": TL_ATTACHMENTS_DIR, "PL": PL_ATTACHMENTS_DIR,
+}
+HISTORY_TABLES = {"Associates": "history", "BA": "ba_history", "PE": "pe_history", "TL": "tl_history", "PL": "pl_history"}
+AUDIT_JOURNALS = {"Associates": "audit_log", "BA": "ba_audit_log", "PE": "pe_audit_log", "TL": "tl_audit_log", "PL": "pl_audit_log"}
+FEEDBACK_TABLES = {
+    "Associates": "monthly_feedback", "BA": "ba_monthly_feedback", "PE": "pe_monthly_feedback",
+    "TL": "tl_monthly_feedback", "PL": "pl_monthly_feedback",
+}
+LEGACY_METADATA_FILES = {
+    "history": HISTORY_FILE, "ba_history": BA_HISTORY_FILE, "pe_history": PE_HISTORY_FILE,
+    "tl_history": TL_HISTORY_FILE, "pl_history": PL_HISTORY_FILE,
+    "monthly_feedback": FEEDBACK_FILE, "ba_monthly_feedback": BA_FEEDBACK_FILE, "pe_monthly_feedback": PE_FEEDBACK_FILE,
+    "tl_monthly_feedback": TL_FEEDBACK_FILE, "pl_monthly_feedback": PL_FEEDBACK_FILE,
+}
+
+# Audit log: append-only JSON-lines journal per dataset (data/audit/<name>.jsonl), rotated by size
+AUDIT_DIR = os.path.join(DATA_DIR, "audit")
+AUDIT_ROTATE_MB = int(os.getenv("AUDIT_ROTATE_MB", "10"))
+LEGACY_AUDIT_FILES = {
+    "Associates": AUDIT_LOG_FILE, "BA": BA_AUDIT_LOG_FILE, "PE": PE_AUDIT_LOG_FILE,
+    "TL": TL_AUDIT_LOG_FILE, "PL": PL_AUDIT_LOG_FILE,
+}
+
 # -------------------------------------
 # Storage Setup
 # -------------------------------------
 def ensure_storage():
     os.makedirs(DATA_DIR, exist_ok=True)
     os.makedirs(ATTACHMENTS_DIR, exist_ok=True)
-    if not os.path.exists(HISTORY_FILE):
-        pd.DataFrame(columns=[
-            "id","filename","saved_path","uploader","upload_dt","reporting_month",
-            "rows_count","source_url","status","message","active","superseded_by","validation_status"
-        ]).to_excel(HISTORY_FILE, index=False)
-    if not os.path.exists(COMBINED_FILE):
-        pd.DataFrame(columns=["Attachment ID"]).to_excel(COMBINED_FILE, index=False)
-    if not os.path.exists(COMBINED_FILE_CSV):
-        pd.DataFrame(columns=["Attachment ID"]).to_csv(COMBINED_FILE_CSV, index=False)
-    if not os.path.exists(AUDIT_LOG_FILE):
-        pd.DataFrame(columns=["timestamp","action","attachment_id","filename","performed_by"]).to_excel(AUDIT_LOG_FILE, index=False)
-    if not os.path.exists(FEEDBACK_FILE):
-        pd.DataFrame(columns=[
-            "Domain ID","Name","Month","Team Lead","Feedback","timestamp","entered_by"
-        ]).to_excel(FEEDBACK_FILE, index=False)
+    ensure_metadata_store()
+    ensure_audit_journal()
+    COMBINED_STORES["Associates"].ensure()
 
 # BA storage initialization
 def ensure_storage_ba():
     os.makedirs(BA_ATTACHMENTS_DIR, exist_ok=True)
-    if not os.path.exists(BA_HISTORY_FILE):
-        pd.DataFrame(columns=[
-            "id","filename","saved_path","uploader","upload_dt","reporting_month",
-            "rows_count","source_url","status","message","active","superseded_by","validation_status"
-        ]).to_excel(BA_HISTORY_FILE, index=False)
-    if not os.path.exists(BA_COMBINED_FILE):
-        pd.DataFrame(columns=["Attachment ID"]).to_excel(BA_COMBINED_FILE, index=False)
-    if not os.path.exists(BA_COMBINED_FILE_CSV):
-        pd.DataFrame(columns=["Attachment ID"]).to_csv(BA_COMBINED_FILE_CSV, index=False)
-    if not os.path.exists(BA_AUDIT_LOG_FILE):
-        pd.DataFrame(columns=["timestamp","action","attachment_id","filename","performed_by"]).to_excel(BA_AUDIT_LOG_FILE, index=False)
-    if not os.path.exists(BA_FEEDBACK_FILE):
-        pd.DataFrame(columns=[
-            "Domain ID","Name","Month","Team Lead","Feedback","timestamp","entered_by"
-        ]).to_excel(BA_FEEDBACK_FILE, index=False)
+    COMBINED_STORES["BA"].ensure()
 
 
 # PE storage initialization
 def ensure_storage_pe():
     os.makedirs(PE_ATTACHMENTS_DIR, exist_ok=True)
-    if not os.path.exists(PE_HISTORY_FILE):
-        pd.DataFrame(columns=[
-            "id","filename","saved_path","uploader","upload_dt","reporting_month",
-            "rows_count","source_url","status","message","active","superseded_by","validation_status"
-        ]).to_excel(PE_HISTORY_FILE, index=False)
-    if not os.path.exists(PE_COMBINED_FILE):
-        pd.DataFrame(columns=["Attachment ID"]).to_excel(PE_COMBINED_FILE, index=False)
-    if not os.path.exists(PE_COMBINED_FILE_CSV):
-        pd.DataFrame(columns=["Attachment ID"]).to_csv(PE_COMBINED_FILE_CSV, index=False)
-    if not os.path.exists(PE_AUDIT_LOG_FILE):
-        pd.DataFrame(columns=["timestamp","action","attachment_id","filename","performed_by"]).to_excel(PE_AUDIT_LOG_FILE, index=False)
-    if not os.path.exists(PE_FEEDBACK_FILE):
-        pd.DataFrame(columns=[
-            "Domain ID","Name","Month","Team Lead","Feedback","timestamp","entered_by"
-        ]).to_excel(PE_FEEDBACK_FILE, index=False)
+    COMBINED_STORES["PE"].ensure()
 
 
 # TL storage initialization
 def ensure_storage_tl():
     os.makedirs(TL_ATTACHMENTS_DIR, exist_ok=True)
-    if not os.path.exists(TL_HISTORY_FILE):
-        pd.DataFrame(columns=[
-            "id","filename","saved_path","uploader","upload_dt","reporting_month",
-            "rows_count","source_url","status","message","active","superseded_by","validation_status"
-        ]).to_excel(TL_HISTORY_FILE, index=False)
-    if not os.path.exists(TL_COMBINED_FILE):
-        pd.DataFrame(columns=["Attachment ID"]).to_excel(TL_COMBINED_FILE, index=False)
-    if not os.path.exists(TL_COMBINED_FILE_CSV):
-        pd.DataFrame(columns=["Attachment ID"]).to_csv(TL_COMBINED_FILE_CSV, index=False)
-    if not os.path.exists(TL_AUDIT_LOG_FILE):
-        pd.DataFrame(columns=["timestamp","action","attachment_id","filename","performed_by"]).to_excel(TL_AUDIT_LOG_FILE, index=False)
-    if not os.path.exists(TL_FEEDBACK_FILE):
-        pd.DataFrame(columns=[
-            "Domain ID","Name","Month","Team Lead","Feedback","timestamp","entered_by"
-        ]).to_excel(TL_FEEDBACK_FILE, index=False)
+    COMBINED_STORES["TL"].ensure()
 
 
 # PL storage initialization
 def ensure_storage_pl():
     os.makedirs(PL_ATTACHMENTS_DIR, exist_ok=True)
-    if not os.path.exists(PL_HISTORY_FILE):
-        pd.DataFrame(columns=[
-            "id","filename","saved_path","uploader","upload_dt","reporting_month",
-            "rows_count","source_url","status","message","active","superseded_by","validation_status"
-        ]).to_excel(PL_HISTORY_FILE, index=False)
-    if not os.path.exists(PL_COMBINED_FILE):
-        pd.DataFrame(columns=["Attachment ID"]).to_excel(PL_COMBINED_FILE, index=False)
-    if not os.path.exists(PL_COMBINED_FILE_CSV):
-        pd.DataFrame(columns=["Attachment ID"]).to_csv(PL_COMBINED_FILE_CSV, index=False)
-    if not os.path.exists(PL_AUDIT_LOG_FILE):
-        pd.DataFrame(columns=["timestamp","action","attachment_id","filename","performed_by"]).to_excel(PL_AUDIT_LOG_FILE, index=False)
-    if not os.path.exists(PL_FEEDBACK_FILE):
-        pd.DataFrame(columns=[
-            "Domain ID","Name","Month","Team Lead","Feedback","timestamp","entered_by"
-        ]).to_excel(PL_FEEDBACK_FILE, index=False)
+    COMBINED_STORES["PL"].ensure()
+
+
+# -------------------------------------
+# Metadata Store (SQLite: history, audit log, feedback)
+# -------------------------------------
+def _q(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+def _meta_connect():
+    conn = sqlite3.connect(METADATA_DB, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")  # readers never block the single writer
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+def _meta_columns(table):
+    if table in HISTORY_TABLES.values():
+        return HISTORY_COLUMNS
+    return FEEDBACK_COLUMNS
+
+def _to_sql_value(col, v):
+    if col == "active":
+        return int(bool(_coerce_active_bool(pd.Series([v])).iloc[0]))
+    if v is None or (not isinstance(v, (list, tuple)) and pd.isna(v)):
+        return None
+    if col == "rows_count":
+        try: return int(v)
+        except (TypeError, ValueError): return None
+    return str(v)
+
+def _meta_insert(conn, table, rows):
+    cols = _meta_columns(table)
+    conn.executemany(
+        f"INSERT INTO {_q(table)} ({', '.join(_q(c) for c in cols)}) VALUES ({', '.join('?' for _ in cols)})",
+        [tuple(_to_sql_value(c, r.get(c)) for c in cols) for r in rows],
+    )
+
+def ensure_metadata_store():
+    with closing(_meta_connect()) as conn, conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS _migrations (name TEXT PRIMARY KEY, migrated_at TEXT)")
+        conn.execute("CREATE TABLE IF NOT EXISTS _table_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+        for ds in DATASET_KEYS:
+            h, f = HISTORY_TABLES[ds], FEEDBACK_TABLES[ds]
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {_q(h)} ("
+                + ", ".join(f"{_q(c)} {'INTEGER' if c in ('rows_count', 'active') else 'TEXT'}" for c in HISTORY_COLUMNS) + ")"
+            )
+            if "content_sha256" not in {r[1] for r in conn.execute(f"PRAGMA table_info({_q(h)})")}:
+                conn.execute(f"ALTER TABLE {_q(h)} ADD COLUMN content_sha256 TEXT")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {_q(h + '_id')} ON {_q(h)} (id)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {_q(h + '_sha256')} ON {_q(h)} (content_sha256)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {_q(h + '_month')} ON {_q(h)} (reporting_month)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {_q(h + '_active')} ON {_q(h)} (active)")
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {_q(f)} (" + ", ".join(f"{_q(c)} TEXT" for c in FEEDBACK_COLUMNS) + ")")
+            # Each row written bumps its table's counter, whatever connection or tool writes it
+            for table in (h, f):
+                name = "'" + table.replace("'", "''") + "'"
+                for event in ("INSERT", "UPDATE", "DELETE"):
+                    conn.execute(
+                        f"CREATE TRIGGER IF NOT EXISTS {_q(f'{table}_{event.lower()}_version')} AFTER {event} "
+                        f"ON {_q(table)} BEGIN INSERT INTO _table_versions VALUES ({name}, 1) "
+                        "ON CONFLICT(name) DO UPDATE SET version = version + 1; END"
+                    )
+        # Content hashes of drop-folder files already ingested, so a file dropped twice is only loaded once
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS dropped_files "
+            "(sha256 TEXT PRIMARY KEY, filename TEXT, dataset TEXT, job TEXT, ingested_at TEXT)"
+        )
+        # One-shot import of the legacy workbooks
+        done = {r[0] for r in conn.execute("SELECT name FROM _migrations")}
+        for table, path in LEGACY_METADATA_FILES.items():
+            if table in done:
+                continue
+            if os.path.exists(path):
+                try:
+                    legacy = pd.read_excel(path)
+                except Exception:
+                    legacy = pd.DataFrame()
+                if not legacy.empty:
+                    _meta_insert(conn, table, legacy.to_dict("records"))
+            conn.execute("INSERT INTO _migrations VALUES (?, ?)", (table, dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        # Hash the saved files of uploads made before content hashes were recorded. Re-uploads of the same
+        # month + filename share a saved path, so only the newest row for a path matches the file on disk.
+        if "history_content_sha256" not in done:
+            for h in HISTORY_TABLES.values():
+                rows = conn.execute(
+                    f"SELECT rowid, saved_path FROM {_q(h)} WHERE content_sha256 IS NULL "
+                    f"AND rowid IN (SELECT MAX(rowid) FROM {_q(h)} GROUP BY saved_path)"
+                ).fetchall()
+                for rowid, path in rows:
+                    if path and os.path.exists(path):
+                        with open(path, "rb") as f:
+                            digest = hashlib.sha256(f.read()).hexdigest()
+                        conn.execute(f"UPDATE {_q(h)} SET content_sha256 = ? WHERE rowid = ?", (digest, rowid))
+            conn.execute(
+                "INSERT INTO _migrations VALUES (?, ?)",
+                ("history_content_sha256", dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+            )
+        # One comment per (Domain ID, Month): keep the newest of any duplicates before enforcing the key
+        for f in FEEDBACK_TABLES.values():
+            conn.execute(
+                f'DELETE FROM {_q(f)} WHERE rowid NOT IN ('
+                f'SELECT MAX(rowid) FROM {_q(f)} GROUP BY "Domain ID", "Month")'
+            )
+            conn.execute(f'DROP INDEX IF EXISTS {_q(f + "_domain_month")}')
+            conn.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS {_q(f + "_key")} ON {_q(f)} ("Domain ID", "Month")')
+
+def meta_table_version(table):
+    """
+    The table's write counter, kept by triggers so edits from outside the app count too but writes to other
+    tables don't, plus the database file's inode: a restored copy of the file starts a new series.
+    """
+    with closing(_meta_connect()) as conn:
+        row = conn.execute("SELECT version FROM _table_versions WHERE name = ?", (table,)).fetchone()
+    return (row[0] if row else 0, os.stat(METADATA_DB).st_ino)
+
+def _meta_read(table, where="", params=()) -> pd.DataFrame:
+    cols = _meta_columns(table)
+    with closing(_meta_connect()) as conn:
+        df = pd.read_sql_query(
+            f"SELECT {', '.join(_q(c) for c in cols)} FROM {_q(table)} {where} ORDER BY rowid", conn, params=params
+        )
+    if "active" in df.columns:
+        df["active"] = df["active"].fillna(0).astype(bool)
+    if "rows_count" in df.columns:
+        df["rows_count"] = df["rows_count"].astype("Int64")
+    return df
+
+def _meta_replace(table, df):
+    with closing(_meta_connect()) as conn, conn:
+        conn.execute(f"DELETE FROM {_q(table)}")
+        _meta_insert(conn, table, df.to_dict("records"))
+
+def export_metadata_xlsx(table) -> bytes:
+    """Spreadsheet view of one metadata table, for admins who still want the old workbooks."""
+    return make_excel_bytes_from_df(_meta_read(table), hide_cols=False)
 
 
 # -------------------------------------
@@ -205,45 +359,77 @@ def authenticate(username, password):
 # -------------------------------------
 # Excel Helpers
 # -------------------------------------
-def safe_month_from_columns(df):
-    for col in ["Month","Date"]:
-        if col in df.columns:
-            s = pd.to_datetime(df[col], errors="coerce")
-            if s.notna().any():
-                d = s.dropna().iloc[0]
-                return f"{d.year:04d}-{d.month:02d}"
+def month_keys(df) -> pd.Series:
+    """Month of every row as text (YYYY-MM, or the Month text itself when it is not a date), NaN where it has
+    none: the MONTH_KEY rule, so uploads are filed under the months the dashboard filters show."""
+    return normalized_month(df).astype(object)
+
+def month_from_columns(df):
+    """Month of the first row that has one (see month_keys), or None when there is none."""
+    keys = month_keys(df).dropna()
+    return keys.iloc[0] if len(keys) else None
+
+def current_month():
     now = dt.datetime.now()
     return f"{now.year:04d}-{now.month:02d}"
 
-def detect_header_and_read(xls, sheet_name):
-    raw = pd.read_excel(xls, sheet_name=sheet_name, header=None)
-    header_idx = 0
-    for i in range(min(10, len(raw))):
-        row = [str(v).strip() for v in raw.iloc[i].tolist()]
-        if all(col in row for col in REQUIRED_COLS):
-            header_idx = i
-            break
-    df = pd.read_excel(xls, sheet_name=sheet_name, header=header_idx)
-    df.columns = df.columns.str.strip()
-    return df
+def split_by_month(df):
+    """
+    [(month, rows)] in month order, from one grouping pass over the frame. Rows without a month of their
+    own go with the file's first month; a file with no month at all is filed under the current month.
+    """
+    keys = month_keys(df)
+    known = keys.dropna()
+    if known.empty:
+        return [(current_month(), df)]
+    first = known.iloc[0]
+    keys = keys.fillna(first)
+    if (keys == first).all():
+        return [(first, df)]
+    return [(month, part) for month, part in df.groupby(keys, sort=True)]
 
 def read_excel_bytes(file_bytes):
-    try:
-        xls = pd.ExcelFile(io.BytesIO(file_bytes), engine="openpyxl")
-    except Exception as e:
-        raise ValueError(f"Invalid Excel file: {e}")
-    if "Data" not in xls.sheet_names:
-        raise ValueError("Missing required sheet: Data")
-    return detect_header_and_read(xls, "Data")
+    return read_data_sheet(file_bytes, REQUIRED_COLS, engine=EXCEL_READER_ENGINE)
 
 def validate_required_columns(df):
     return [col for col in REQUIRED_COLS if col.lower() not in [c.lower() for c in df.columns]]
 
+def _load_history(dataset) -> pd.DataFrame:
+    return _meta_read(HISTORY_TABLES[dataset])
+
+def _save_history(dataset, df):
+    # Full-table replace; single-row changes go through update_history / record_upload
+    _meta_replace(HISTORY_TABLES[dataset], df)
+
+def get_history_row(dataset, attachment_id):
+    rows = _meta_read(HISTORY_TABLES[dataset], "WHERE id = ?", (str(attachment_id),))
+    return None if rows.empty else rows.iloc[0]
+
+def find_uploads_by_digest(dataset, digest):
+    """
+    The attachments already holding this exact file, one per reporting month (the active one first, else
+    the newest), ignoring invalidated ones. Empty when the file is new.
+    """
+    rows = _meta_read(
+        HISTORY_TABLES[dataset], "WHERE content_sha256 = ? AND validation_status IS NOT 'Invalid'", (digest,)
+    )
+    rows = rows.iloc[::-1].sort_values("active", ascending=False, kind="stable")
+    return rows.drop_duplicates("reporting_month").sort_values("reporting_month", kind="stable")
+
+def update_history(dataset, attachment_id, **values):
+    table = HISTORY_TABLES[dataset]
+    sets = ", ".join(f"{_q(c)} = ?" for c in values)
+    with closing(_meta_connect()) as conn, conn:
+        conn.execute(
+            f"UPDATE {_q(table)} SET {sets} WHERE id = ?",
+            tuple(_to_sql_value(c, v) for c, v in values.items()) + (str(attachment_id),),
+        )
+
 def load_history():
-    return pd.read_excel(HISTORY_FILE)
+    return _load_history("Associates")
 
 def save_history(df):
-    df.to_excel(HISTORY_FILE, index=False)
+    _save_history("Associates", df)
 
 # Robust coercion for the History.active column (handles True/False, 1/0, "TRUE"/"FALSE", "yes"/"no")
 def _coerce_active_bool(series):
@@ -253,225 +439,842 @@ def _coerce_active_bool(series):
     s = s.astype(str).str.strip().str.lower()
     truthy = {"true","1","yes","y","t"}
     falsy = {"false","0","no","n","f",""}
-    return s.apply(lambda v: True if v in truthy else (False if v in falsy else False))
+    return s.apply(lambda v: True if v in truthy else (False if v in falsy else False)).astype(bool)
+
+# -------------------------------------
+# Combined Storage Backends
+# -------------------------------------
+def _empty_combined():
+    return pd.DataFrame(columns=["Attachment ID"])
 
 # Prefer XLSX; if missing or failed, fall back to CSV
-def load_combined():
+def _read_legacy_combined(xlsx_path, csv_path):
     try:
-        return pd.read_excel(COMBINED_FILE)
+        return pd.read_excel(xlsx_path)
     except Exception:
         try:
-            return pd.read_csv(COMBINED_FILE_CSV)
+            return pd.read_csv(csv_path)
         except Exception:
-            return pd.DataFrame(columns=["Attachment ID"])
+            return _empty_combined()
 
-# Save to XLSX if within Excel bounds; otherwise save to CSV to avoid hard Excel limits
-def save_combined(df):
-    if not exceeds_excel_limits(df):
-        df.to_excel(COMBINED_FILE, index=False)
-    else:
-        df.to_csv(COMBINED_FILE_CSV, index=False)
+def _typed_for_parquet(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Give every column a single Arrow type before writing Parquet.
+    - Object columns whose values are all numbers become numeric.
+    - Any other mixed object column is stored as text (nulls stay null).
+    """
+    out = df.copy()
+    out.columns = [str(c) for c in out.columns]
+    for col in out.columns:
+        s = out[col]
+        if s.dtype != object:
+            continue
+        kind = pd.api.types.infer_dtype(s, skipna=True)
+        if kind in ("string", "empty", "boolean", "date", "datetime", "time", "decimal"):
+            continue
+        if kind in ("integer", "floating", "mixed-integer-float"):
+            out[col] = pd.to_numeric(s, errors="coerce")
+        else:
+            out[col] = s.where(s.isna(), s.astype(str))
+    return out
 
-def derive_saved_path(month, name):
-    return os.path.join(ATTACHMENTS_DIR, f"{month}_{name.replace('/', '_').replace(chr(92), '_')}")
+# ---- Streamed partitions (large uploads) ----
+def _widen_type(a, b):
+    """Arrow type that holds both a and b: numbers widen to float64, any other mix to text."""
+    if a == b or pyarrow.types.is_null(b):
+        return a
+    if pyarrow.types.is_null(a):
+        return b
+    numeric = (pyarrow.types.is_integer, pyarrow.types.is_floating)
+    if any(f(a) for f in numeric) and any(f(b) for f in numeric):
+        return pyarrow.float64()
+    return pyarrow.string()
+
+def _conform(table, schema):
+    """Cast a chunk to the partition's schema; values of columns widened to text are written as
+    read_data_sheet would have left them (percent metrics as "97.5%", other values as str)."""
+    columns = []
+    for field in schema:
+        col = table.column(field.name)
+        if col.type != field.type:
+            if col.null_count == len(col):
+                col = pyarrow.nulls(len(col), field.type)
+            elif pyarrow.types.is_string(field.type):
+                col = pyarrow.array(stored_text(field.name, col.to_pandas()), type=pyarrow.string(), from_pandas=True)
+            else:
+                col = col.cast(field.type)
+        columns.append(col)
+    return pyarrow.Table.from_arrays(columns, schema=schema)
 
-def supersede_existing_month(month, new_id, history_df):
-    mask = (history_df["reporting_month"] == month) & (history_df["active"] == True)
-    for idx in history_df[mask].index:
-        try: os.remove(history_df.at[idx, "saved_path"])
-        except: pass
-        history_df.at[idx, "active"] = False
-        history_df.at[idx, "superseded_by"] = new_id
-    return history_df
+# ---- Row-level deltas (corrected re-uploads of a month) ----
+DELTA_KEY = "Domain ID"
 
-# -------------------------------------
-# Percentage Conversion & Numeric Companions
-# -------------------------------------
-def convert_percentage_columns(df: pd.DataFrame) -> pd.DataFrame:
-    if df is None or df.empty:
+def _text_form(s: pd.Series):
+    """(is-null mask, text) for comparing cells across a Parquet round-trip (1 vs "1", NaN vs None)."""
+    na = s.isna().to_numpy()
+    return na, s.astype(str).to_numpy()
+
+def diff_rows(current: pd.DataFrame, new: pd.DataFrame):
+    """
+    Rows of `new` that are changed or added relative to `current`, keyed by Domain ID, plus the keys
+    `current` has and `new` lacks: (delta rows, changed keys, added keys, removed keys).
+    None when the two cannot be diffed row by row (different columns, missing or repeated keys).
+    """
+    cols = [c for c in new.columns if c != "Attachment ID"]
+    if (DELTA_KEY not in new.columns or DELTA_KEY not in current.columns
+            or set(cols) != {c for c in current.columns if c != "Attachment ID"}):
+        return None
+    new_keys = new[DELTA_KEY].astype(str)
+    cur_keys = current[DELTA_KEY].astype(str)
+    if new[DELTA_KEY].isna().any() or not new_keys.is_unique or not cur_keys.is_unique:
+        return None
+    cur_pos = pd.Index(cur_keys).get_indexer(new_keys)
+    common = cur_pos >= 0
+    differs = np.zeros(int(common.sum()), dtype=bool)
+    for col in cols:
+        a_na, a = _text_form(new[col].iloc[np.flatnonzero(common)])
+        b_na, b = _text_form(current[col].iloc[cur_pos[common]])
+        differs |= (a_na != b_na) | (~a_na & (a != b))
+    changed = np.zeros(len(new), dtype=bool)
+    changed[np.flatnonzero(common)[differs]] = True
+    removed = sorted(set(cur_keys) - set(new_keys))
+    return (new[changed | ~common], new_keys[changed].tolist(), new_keys[~common].tolist(), removed)
+
+def apply_delta(base: pd.DataFrame, delta: pd.DataFrame, removed, attachment_id) -> pd.DataFrame:
+    """The full rows of a delta attachment: `base` with changed rows replaced in place, removed rows
+    dropped and added rows appended, all relabelled with the attachment's id."""
+    base_keys = pd.Index(base[DELTA_KEY].astype(str))
+    delta_keys = delta[DELTA_KEY].astype(str)
+    kept = ~base_keys.isin(set(delta_keys) | set(removed))
+    pos = base_keys.get_indexer(delta_keys)
+    order = np.concatenate([np.flatnonzero(kept), np.where(pos >= 0, pos, len(base) + np.arange(len(delta)))])
+    out = pd.concat(widen_frames([base.loc[kept, list(delta.columns)], delta]), ignore_index=True)
+    out = out.iloc[np.argsort(order, kind="stable")].reset_index(drop=True)
+    out["Attachment ID"] = str(attachment_id)
+    return out
+
+
+def _stat_token(*paths):
+    """Cheap change token for files: (mtime_ns, size) per path, None where the file is missing."""
+    token = []
+    for path in paths:
+        try:
+            st_ = os.stat(path)
+        except FileNotFoundError:
+            token.append(None)
+        else:
+            token.append((st_.st_mtime_ns, st_.st_size))
+    return tuple(token)
+
+
+class ExcelCombinedStore:
+    """Legacy backend: the whole combined frame round-trips through one XLSX (CSV beyond Excel limits)."""
+    supports_deltas = False
+    supports_streaming = False
+
+    def __init__(self, xlsx_path, csv_path):
+        self.xlsx_path = xlsx_path
+        self.csv_path = csv_path
+
+    def ensure(self):
+        if not os.path.exists(self.xlsx_path):
+            _empty_combined().to_excel(self.xlsx_path, index=False)
+        if not os.path.exists(self.csv_path):
+            _empty_combined().to_csv(self.csv_path, index=False)
+
+    def version(self):
+        return _stat_token(self.xlsx_path, self.csv_path)
+
+    def load(self, columns=None, attachment_ids=None) -> pd.DataFrame:
+        # Files written before typed metrics hold "97.5%" text; numbers written since are kept as-is
+        df = type_percent_columns(_read_legacy_combined(self.xlsx_path, self.csv_path), raw=False)
+        # One file holds everything, so projections and predicates are applied after the full read
+        if attachment_ids is not None and "Attachment ID" in df.columns:
+            df = df[isin_text(df["Attachment ID"], [str(a) for a in attachment_ids])].reset_index(drop=True)
+        if columns is not None:
+            df = df[[c for c in dict.fromkeys([*columns, "Attachment ID"]) if c in df.columns]]
         return df
-    def looks_like_percent_col(name: str) -> bool:
-        n = name.strip().lower()
-        return ("target" in n or "actual" in n or "rating" in n or "final score" in n
-                or n.endswith("_t") or n.endswith("_a") or n.endswith("_r"))
-    cols_to_convert = [col for col in df.columns if looks_like_percent_col(str(col))]
-    def to_percent_str(x):
-        if pd.isna(x): return x
-        s = str(x).strip().replace(" ", "").replace(",", ".")
-        if s.endswith("%"):
+
+    def columns(self) -> dict:
+        df = self.load()
+        return {c: pd.api.types.is_numeric_dtype(df[c]) and not pd.api.types.is_bool_dtype(df[c]) for c in df.columns}
+
+    # Save to XLSX if within Excel bounds; otherwise save to CSV to avoid hard Excel limits
+    def save(self, df: pd.DataFrame):
+        if not exceeds_excel_limits(df):
+            df.to_excel(self.xlsx_path, index=False)
+        else:
+            df.to_csv(self.csv_path, index=False)
+
+    def append(self, df: pd.DataFrame):
+        self.save(pd.concat([self.load(), df], ignore_index=True))
+
+    def load_partition(self, attachment_id, columns=None) -> pd.DataFrame:
+        combined = self.load(columns)
+        return combined[combined["Attachment ID"] == attachment_id]
+
+    def write_partition(self, attachment_id, df: pd.DataFrame):
+        combined = self.load()
+        combined = combined[combined["Attachment ID"] != attachment_id]
+        self.save(pd.concat([combined, df], ignore_index=True))
+
+    def drop_partition(self, attachment_id):
+        combined = self.load()
+        self.save(combined[combined["Attachment ID"] != attachment_id])
+
+
+@contextmanager
+def _locked(path):
+    """Exclusive advisory lock on <path>.lock across sessions/processes (no-op without fcntl)."""
+    if fcntl is None:
+        yield
+        return
+    with open(path + ".lock", "a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+class ParquetCombinedStore:
+    """
+    Columnar backend: one typed Parquet partition per attachment plus a small manifest.json.
+    - write_partition() / drop_partition() touch one attachment only, so uploads, restores,
+      invalidations and admin edits cost O(size of one month) instead of O(all history).
+    - The manifest lists live partitions in load order and carries a version counter.
+    - ensure() migrates the legacy XLSX/CSV (or an older unpartitioned layout) once.
+    - Percent metrics are stored as float percentage points (schema 2); partitions written
+      with "97.5%" text by schema 1 are rewritten once by ensure().
+    - A corrected re-upload of a month can be stored as a delta on the attachment it replaces
+      (write_delta): only changed/added rows plus the removed keys. Loads resolve deltas; before
+      a base partition is replaced or dropped its deltas are rewritten in full.
+    """
+    SCHEMA = 2
+    supports_deltas = True
+    supports_streaming = True
+
+    def __init__(self, directory, legacy_xlsx, legacy_csv):
+        self.directory = directory
+        self.legacy_xlsx = legacy_xlsx
+        self.legacy_csv = legacy_csv
+        self.manifest_path = os.path.join(directory, "manifest.json")
+
+    @staticmethod
+    def _partition_name(attachment_id) -> str:
+        safe = "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in str(attachment_id))
+        return f"{safe}.parquet"
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as fh:
+                return json.load(fh)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_manifest(self, manifest):
+        manifest["version"] = int(manifest.get("version", 0)) + 1
+        manifest["schema"] = self.SCHEMA
+        manifest["updated"] = dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        tmp = f"{self.manifest_path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(manifest, fh, indent=1)
+        os.replace(tmp, self.manifest_path)
+
+    def _write_file(self, attachment_id, df: pd.DataFrame) -> str:
+        name = self._partition_name(attachment_id)
+        path = os.path.join(self.directory, name)
+        tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        typed = _typed_for_parquet(type_percent_columns(df, raw=False))
+        typed["Attachment ID"] = str(attachment_id)
+        typed.to_parquet(tmp, index=False)
+        os.replace(tmp, path)  # readers never see a half-written partition
+        return name
+
+    def _read_file(self, name, columns=None) -> pd.DataFrame:
+        path = os.path.join(self.directory, name)
+        try:
+            if columns is not None:  # only these column chunks are read; ones the file lacks are skipped
+                present = set(pq.read_schema(path).names)
+                columns = [c for c in columns if c in present]
+            return pd.read_parquet(path, columns=columns)
+        except FileNotFoundError:
+            return None  # dropped by a concurrent invalidation
+
+    @staticmethod
+    def _split_by_attachment(df: pd.DataFrame):
+        if "Attachment ID" not in df.columns:
+            return [("unassigned", df)]
+        keys = df["Attachment ID"].astype(str).where(df["Attachment ID"].notna(), "unassigned")
+        return [(str(aid), part) for aid, part in df.groupby(keys, sort=False)]
+
+    def ensure(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self.manifest_path):
+            self._upgrade_schema()
+            return
+        # Unpartitioned Parquet parts from the first Parquet layout are repartitioned once
+        parts = sorted(glob.glob(os.path.join(self.directory, "part-*.parquet")))
+        if parts:
+            self.save(pd.concat([pd.read_parquet(p) for p in parts], ignore_index=True))
+            for path in parts:
+                os.remove(path)
+            return
+        # One-shot migration: the legacy writer only fell back to CSV past Excel limits, so the newer file wins
+        legacy = [p for p in (self.legacy_xlsx, self.legacy_csv) if os.path.exists(p)]
+        if not legacy:
+            with _locked(self.manifest_path):
+                self._write_manifest({"partitions": {}})
+            return
+        newest = max(legacy, key=os.path.getmtime)
+        try:
+            df = pd.read_csv(newest) if newest.endswith(".csv") else pd.read_excel(newest)
+        except Exception:
+            df = _read_legacy_combined(self.legacy_xlsx, self.legacy_csv)
+        self.save(df)
+
+    def _upgrade_schema(self):
+        """Rewrite schema-1 partitions (percent text + `_num` companions) as typed floats, once."""
+        with _locked(self.manifest_path):
+            manifest = self._read_manifest() or {"partitions": {}}
+            if manifest.get("schema", 1) >= self.SCHEMA:
+                return
+            for aid, entry in manifest["partitions"].items():
+                frame = self._read_file(entry["file"])
+                if frame is not None:
+                    entry["file"] = self._write_file(aid, frame)
+            self._write_manifest(manifest)
+
+    def version(self):
+        """Change token from one directory scan: stat of the manifest and every partition, nothing parsed.
+        Catches out-of-band edits (another replica, a restored backup) as well as our own writes."""
+        with os.scandir(self.directory) as entries:
+            return tuple(sorted(
+                (e.name, e.stat().st_mtime_ns, e.stat().st_size)
+                for e in entries if e.name.endswith((".parquet", ".json"))
+            ))
+
+    def _resolve(self, manifest, aid, resolved, columns=None):
+        """Full rows of one attachment, following delta bases (each partition is read once per load)."""
+        if aid not in resolved:
+            entry = manifest["partitions"].get(aid)
+            frame = self._read_file(entry["file"], columns) if entry else None
+            if frame is not None and entry.get("base"):
+                base = self._resolve(manifest, entry["base"], resolved, columns)
+                frame = apply_delta(base, frame, entry.get("removed", []), aid) if base is not None else None
+            resolved[aid] = frame
+        return resolved[aid]
+
+    @staticmethod
+    def _projection(columns):
+        """Columns to read for a projection: deltas are resolved on DELTA_KEY, partitions told apart by Attachment ID."""
+        return None if columns is None else list(dict.fromkeys([*columns, "Attachment ID", DELTA_KEY]))
+
+    def load(self, columns=None, attachment_ids=None) -> pd.DataFrame:
+        """
+        The combined frame, or only part of it read from storage: `columns` projects (Attachment ID and
+        Domain ID are always kept) and `attachment_ids` reads those attachments' partitions only.
+        Partitions come in manifest order either way.
+        """
+        manifest = self._read_manifest() or {"partitions": {}}
+        aids = list(manifest["partitions"])
+        if attachment_ids is not None:
+            wanted = {str(a) for a in attachment_ids}
+            aids = [aid for aid in aids if aid in wanted]
+        resolved, columns = {}, self._projection(columns)
+        frames = [f for f in (self._resolve(manifest, aid, resolved, columns) for aid in aids) if f is not None]
+        if not frames:
+            return _empty_combined()
+        return pd.concat(widen_frames(frames), ignore_index=True) if len(frames) > 1 else frames[0]
+
+    def load_partition(self, attachment_id, columns=None) -> pd.DataFrame:
+        manifest = self._read_manifest() or {"partitions": {}}
+        frame = self._resolve(manifest, str(attachment_id), {}, self._projection(columns))
+        return frame if frame is not None else _empty_combined()
+
+    def columns(self) -> dict:
+        """Stored column -> whether it holds numbers, in first-seen order, from the partition footers alone."""
+        manifest = self._read_manifest() or {"partitions": {}}
+        numeric = {}
+        for entry in manifest["partitions"].values():
             try:
-                val = float(s[:-1])
-                return f"{round(val, 2)}%"
-            except:
-                return s
+                schema = pq.read_schema(os.path.join(self.directory, entry["file"]))
+            except FileNotFoundError:
+                continue
+            for field in schema:
+                if pyarrow.types.is_null(field.type):  # an all-empty column says nothing about its type
+                    numeric.setdefault(field.name, None)
+                    continue
+                is_number = pyarrow.types.is_integer(field.type) or pyarrow.types.is_floating(field.type)
+                numeric[field.name] = is_number if numeric.get(field.name) is None else numeric[field.name] and is_number
+        return {name: bool(is_number) for name, is_number in numeric.items()}
+
+    def delta_depth(self, attachment_id) -> int:
+        """How many deltas must be applied to load the attachment (0 for a full partition)."""
+        partitions = (self._read_manifest() or {"partitions": {}})["partitions"]
+        depth, entry = 0, partitions.get(str(attachment_id))
+        while entry and entry.get("base"):
+            depth, entry = depth + 1, partitions.get(entry["base"])
+        return depth
+
+    def _materialize_dependents(self, aid):
+        """Rewrite in full every delta based on `aid`, before that partition is replaced or dropped."""
+        partitions = (self._read_manifest() or {"partitions": {}})["partitions"]
+        for dep, entry in list(partitions.items()):
+            if entry.get("base") == aid:
+                self.write_partition(dep, self.load_partition(dep))
+
+    def write_partition(self, attachment_id, df: pd.DataFrame):
+        """Write (or replace) the rows of a single attachment."""
+        aid = str(attachment_id)
+        self._materialize_dependents(aid)
+        with _locked(self.manifest_path):
+            name = self._write_file(aid, df)
+            manifest = self._read_manifest() or {"partitions": {}}
+            manifest["partitions"][aid] = {"file": name, "rows": int(len(df))}
+            self._write_manifest(manifest)
+
+    def open_stream(self, attachment_id) -> "PartitionStream":
+        """Start writing (or replacing) an attachment chunk by chunk; nothing is visible until its commit()."""
+        aid = str(attachment_id)
+        self._materialize_dependents(aid)
+        return PartitionStream(self, aid)
+
+    def write_delta(self, attachment_id, base_id, rows: pd.DataFrame, removed, total_rows):
+        """Store an attachment as `rows` (changed + added) and `removed` keys on top of `base_id`."""
+        aid, base = str(attachment_id), str(base_id)
+        with _locked(self.manifest_path):
+            manifest = self._read_manifest() or {"partitions": {}}
+            if base not in manifest["partitions"]:
+                raise ValueError(f"Base attachment {base} is no longer stored")
+            name = self._write_file(aid, rows)
+            manifest["partitions"][aid] = {
+                "file": name, "rows": int(total_rows), "base": base, "removed": list(removed),
+                "delta_rows": int(len(rows)),
+            }
+            self._write_manifest(manifest)
+
+    def drop_partition(self, attachment_id):
+        """Remove one attachment: a manifest update plus a file delete."""
+        aid = str(attachment_id)
+        self._materialize_dependents(aid)
+        with _locked(self.manifest_path):
+            manifest = self._read_manifest() or {"partitions": {}}
+            entry = manifest["partitions"].pop(aid, None)
+            if entry is None:
+                return
+            self._write_manifest(manifest)
+        try: os.remove(os.path.join(self.directory, entry["file"]))
+        except FileNotFoundError: pass
+
+    def append(self, df: pd.DataFrame):
+        if df is None or df.empty:
+            return
+        for aid, part in self._split_by_attachment(df):
+            existing = self.load_partition(aid)
+            if not existing.empty:
+                part = pd.concat([existing, part], ignore_index=True)
+            self.write_partition(aid, part)
+
+    def save(self, df: pd.DataFrame):
+        """Full rewrite (used for migrations); every attachment gets its own partition."""
+        with _locked(self.manifest_path):
+            old = self._read_manifest() or {"partitions": {}}
+            partitions = {}
+            for aid, part in self._split_by_attachment(df):
+                partitions[aid] = {"file": self._write_file(aid, part), "rows": int(len(part))}
+            self._write_manifest({"version": old.get("version", 0), "partitions": partitions})
+        live = {e["file"] for e in partitions.values()}
+        for entry in old["partitions"].values():
+            if entry["file"] not in live:
+                try: os.remove(os.path.join(self.directory, entry["file"]))
+                except FileNotFoundError: pass
+
+
+class PartitionStream:
+    """
+    One attachment being written to a temporary Parquet file, one chunk at a time.
+    Column types come from the first chunk; when a later chunk disagrees they are widened and the row
+    groups already written are streamed into a new file. commit() publishes it in the manifest.
+    """
+    def __init__(self, store, attachment_id):
+        self.store, self.aid = store, str(attachment_id)
+        self.name = store._partition_name(self.aid)
+        self.path = os.path.join(store.directory, self.name)
+        self.tmp = f"{self.path}.{uuid.uuid4().hex[:8]}.tmp"
+        self.writer, self.schema, self.rows = None, None, 0
+        self.filled = set()  # columns that have had a value so far; an all-empty column doesn't fix its type
+
+    def write(self, chunk: pd.DataFrame):
+        typed = _typed_for_parquet(type_percent_columns(chunk, raw=False))
+        typed["Attachment ID"] = self.aid
+        self.write_table(pyarrow.Table.from_pandas(typed, preserve_index=False).replace_schema_metadata(None))
+
+    def write_table(self, table):
+        present = {f.name for f, c in zip(table.schema, table.columns) if c.null_count < len(c)}
+        if self.writer is None:
+            self.schema = table.schema
+            self.writer = pq.ParquetWriter(self.tmp, self.schema)
+        elif not table.schema.equals(self.schema):
+            wider = pyarrow.schema([
+                pyarrow.field(f.name, f.type if f.name not in present
+                              else table.schema.field(f.name).type if f.name not in self.filled
+                              else _widen_type(f.type, table.schema.field(f.name).type))
+                for f in self.schema
+            ])
+            if not wider.equals(self.schema):
+                self.writer.close()
+                self.writer = self._restream(self.tmp, wider)
+                self.schema = wider
+            table = _conform(table, self.schema)
+        self.writer.write_table(table)
+        self.filled |= present
+        self.rows += table.num_rows
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def commit(self) -> int:
+        """Publish the attachment; returns the number of rows written."""
+        self.close()
+        with _locked(self.store.manifest_path):
+            os.replace(self.tmp, self.path)
+            manifest = self.store._read_manifest() or {"partitions": {}}
+            manifest["partitions"][self.aid] = {"file": self.name, "rows": int(self.rows)}
+            self.store._write_manifest(manifest)
+        return self.rows
+
+    def abort(self):
+        self.close()
+        try: os.remove(self.tmp)
+        except FileNotFoundError: pass
+
+    @staticmethod
+    def _restream(path, schema):
+        """Rewrite `path` with a widened schema one row group at a time; returns a writer open on it."""
+        old = f"{path}.old"
+        os.replace(path, old)
+        writer = pq.ParquetWriter(path, schema)
         try:
-            v = float(s)
-            return f"{round(v*100 if v <= 1.5 else v, 2)}%"
-        except:
-            return x
-    for col in cols_to_convert:
-        df[col] = df[col].apply(to_percent_str)
-    return df
+            source = pq.ParquetFile(old)
+            for i in range(source.num_row_groups):
+                writer.write_table(_conform(source.read_row_group(i), schema))
+        except BaseException:
+            writer.close()
+            raise
+        finally:
+            os.remove(old)
+        return writer
+
+
+def make_combined_store(directory, xlsx_path, csv_path):
+    if STORAGE_BACKEND == "excel" or pyarrow is None:
+        return ExcelCombinedStore(xlsx_path, csv_path)
+    return ParquetCombinedStore(directory, xlsx_path, csv_path)
+
+COMBINED_STORES = {
+    "Associates": make_combined_store(COMBINED_DIR, COMBINED_FILE, COMBINED_FILE_CSV),
+    "BA": make_combined_store(BA_COMBINED_DIR, BA_COMBINED_FILE, BA_COMBINED_FILE_CSV),
+    "PE": make_combined_store(PE_COMBINED_DIR, PE_COMBINED_FILE, PE_COMBINED_FILE_CSV),
+    "TL": make_combined_store(TL_COMBINED_DIR, TL_COMBINED_FILE, TL_COMBINED_FILE_CSV),
+    "PL": make_combined_store(PL_COMBINED_DIR, PL_COMBINED_FILE, PL_COMBINED_FILE_CSV),
+}
 
-def add_numeric_percent_columns(df: pd.DataFrame) -> pd.DataFrame:
-    if df is None or df.empty:
-        return df
-    def looks_like_percent_col(name: str) -> bool:
-        n = name.strip().lower()
-        return ("target" in n or "actual" in n or "rating" in n or "final score" in n
-                or n.endswith("_t") or n.endswith("_a") or n.endswith("_r"))
-    for col in df.columns:
-        if not looks_like_percent_col(str(col)):
+def load_combined():
+    return COMBINED_STORES["Associates"].load()
+
+def save_combined(df):
+    COMBINED_STORES["Associates"].save(df)
+
+def _derive_saved_path(dataset, month, name):
+    return os.path.join(ATTACHMENT_DIRS[dataset], f"{month}_{name.replace('/', '_').replace(chr(92), '_')}")
+
+def derive_saved_path(month, name):
+    return _derive_saved_path("Associates", month, name)
+
+def supersede_existing_month(conn, dataset, month, new_id):
+    """Deactivate the month's active attachments inside the caller's transaction; returns their saved paths."""
+    table = HISTORY_TABLES[dataset]
+    old_paths = [r[0] for r in conn.execute(
+        f"SELECT saved_path FROM {_q(table)} WHERE reporting_month = ? AND active = 1", (month,)
+    )]
+    conn.execute(
+        f"UPDATE {_q(table)} SET active = 0, superseded_by = ? WHERE reporting_month = ? AND active = 1", (new_id, month)
+    )
+    return old_paths
+
+def record_uploads(dataset, rows):
+    """Supersede each month's active file and insert the new history rows in one transaction.
+    Superseded saved files are removed only once it has committed (never one of the new rows' own paths)."""
+    with closing(_meta_connect()) as conn, conn:
+        old_paths = [
+            path for row in rows
+            for path in supersede_existing_month(conn, dataset, row["reporting_month"], row["id"])
+        ]
+        _meta_insert(conn, HISTORY_TABLES[dataset], rows)
+    new_paths = {row["saved_path"] for row in rows}
+    for path in old_paths:
+        if not path or path in new_paths:
             continue
-        s = df[col].astype(str).str.strip().str.replace(" ", "", regex=False).str.replace(",", ".", regex=False)
-        s = s.str.replace("%", "", regex=False)
-        num = pd.to_numeric(s, errors="coerce")
-        if num.notna().any():
-            num = num.where(num > 1.5, num * 100)
-            df[f"{col}_num"] = num
+        try: os.remove(path)
+        except FileNotFoundError: pass
+        except OSError as e:  # the upload has committed; a leftover file only costs disk space
+            logging.getLogger(__name__).warning("%s: could not remove superseded file %s: %s", dataset, path, e)
+
+def record_upload(dataset, row):
+    record_uploads(dataset, [row])
+
+def _place_saved_copies(source, paths):
+    """Give each path the contents of `source` (hard links where the filesystem allows), consuming `source`."""
+    *others, last = paths
+    for path in others:
+        tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        try: os.link(source, tmp)
+        except OSError: shutil.copyfile(source, tmp)
+        os.replace(tmp, path)
+    os.replace(source, last)
+
+def _keep_saved_copies(dataset, source, paths, file_bytes=None) -> str:
+    """
+    _place_saved_copies() once the upload is committed (writing `file_bytes` to `source` first, when given):
+    a failure only costs later rebuilds from the saved file, so it is logged and returned as a note for
+    the result message instead of raised.
+    """
+    try:
+        if file_bytes is not None:
+            with open(source, "wb") as f:
+                f.write(file_bytes)
+        _place_saved_copies(source, paths)
+        return ""
+    except OSError as e:
+        logging.getLogger(__name__).warning("%s: could not keep saved copies %s: %s", dataset, paths, e)
+        try: os.remove(source)
+        except OSError: pass
+        return f" The file itself could not be kept for later rebuilds ({e})."
+
+# Percentage conversion & numeric companions live in ingest.py (shared with worker processes)
+
+
+# ---- Versioned data cache (shared across sessions) ----
+class VersionedCache:
+    """Latest (version, value) per key. A version change reloads only that key; while one caller
+    loads the new version, concurrent callers keep getting the previous one instead of blocking."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (version, value, nbytes)
+        self._loading = {}  # key -> threading.Event set when the in-flight load finishes
+
+    def get(self, key, version, loader):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+            done = self._loading.get(key)
+            owner = done is None
+            if owner:
+                done = self._loading[key] = threading.Event()
+        if not owner:
+            if entry is not None:
+                return entry[1]
+            done.wait()
+            return self.get(key, version, loader)
+        try:
+            value = self.put(key, version, loader())
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+            done.set()
+        return value
+
+    def put(self, key, version, value):
+        """Hold `value` as the key's latest version, replacing the cached one; returns it."""
+        nbytes = int(value.memory_usage(deep=True).sum()) if isinstance(value, pd.DataFrame) else getattr(value, "nbytes", 0)
+        with self._lock:
+            self._entries[key] = (version, value, nbytes)
+        return value
+
+    def stats(self):
+        """Memory accounting: one row per cached key (only the latest version of each is held)."""
+        with self._lock:
+            return [
+                {"key": " / ".join(map(str, key)), "rows": len(value) if hasattr(value, "__len__") else None,
+                 "MB": round(nbytes / (1024 * 1024), 2), "loading": key in self._loading}
+                for key, (version, value, nbytes) in sorted(self._entries.items())
+            ]
+
+@st.cache_resource(show_spinner=False)
+def get_data_cache() -> VersionedCache:
+    return VersionedCache()
+
+# Arrow-backed text with NaN for missing values: masks and comparisons behave like object columns
+try:
+    SHARED_STR_DTYPE = pd.StringDtype("pyarrow", na_value=float("nan")) if pyarrow is not None else None
+except TypeError:  # pandas < 2.3
+    SHARED_STR_DTYPE = None
+
+def _as_shared_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compact a freshly loaded frame before it is shared: dimension columns become categoricals
+    (integer codes + one copy of each label), other pure-text object columns become Arrow strings.
+    The normalized month is computed here, once per load, as the MONTH_KEY column.
+    """
+    for i, col in enumerate(df.columns):
+        s = df.iloc[:, i]
+        if col in DIMENSION_COLUMNS:
+            df.isetitem(i, as_dimension(s))
+        elif SHARED_STR_DTYPE is not None and s.dtype == object and pd.api.types.infer_dtype(s, skipna=True) == "string":
+            df.isetitem(i, s.astype(SHARED_STR_DTYPE))
+    df[MONTH_KEY] = normalized_month(df)
     return df
 
+def history_version(dataset):
+    return meta_table_version(HISTORY_TABLES[dataset])
+
+def combined_version(dataset):
+    return COMBINED_STORES[dataset].version()
+
+# The frames below are shared by every session and returned without copying: treat them as read-only
+# (filter/merge into new frames; .copy() before assigning into one).
+def _load_history_cached(dataset) -> pd.DataFrame:
+    return get_data_cache().get(("history", dataset), history_version(dataset), lambda: _load_history(dataset))
+
+def _view_version(dataset, view):
+    """Version the shared `view` frame of `dataset` is cached under ("combined", or "ytd" which also
+    depends on which attachments are active)."""
+    if view == "ytd":
+        return combined_version(dataset), history_version(dataset)
+    return combined_version(dataset)
+
+def _load_combined_cached(dataset) -> pd.DataFrame:
+    store = COMBINED_STORES[dataset]
+    return get_data_cache().get(
+        ("combined", dataset), _view_version(dataset, "combined"), lambda: _as_shared_frame(store.load())
+    )
+
+def stored_columns(dataset) -> dict:
+    """Stored column -> whether it holds numbers (Parquet: read from the file footers, no data)."""
+    store = COMBINED_STORES[dataset]
+    return get_data_cache().get(("columns", dataset), combined_version(dataset), store.columns)
+
+def stored_metric_columns(dataset) -> list:
+    return [c for c, numeric in stored_columns(dataset).items() if numeric and looks_like_percent_col(str(c))]
+
+def summary_columns(dataset) -> list:
+    """What the YTD views read up front: every stored column but the metrics, Final Score excepted."""
+    metrics = set(stored_metric_columns(dataset)) - {"Final Score"}
+    return [c for c in stored_columns(dataset) if c not in metrics]
+
+def load_view(dataset, columns=None, active_only=True, months=None) -> pd.DataFrame:
+    """
+    Rows of `dataset` read with a projection and a row predicate pushed down to storage: only `columns`
+    (None for all), only active attachments, and of those only the ones reporting one of `months`.
+    """
+    attachment_ids = None
+    if active_only or months:
+        history = _load_history_cached(dataset)
+        keep = _coerce_active_bool(history["active"]) if active_only else pd.Series(True, index=history.index)
+        if months:
+            keep &= isin_text(history["reporting_month"], months)
+        attachment_ids = history.loc[keep, "id"]
+    return _as_shared_frame(COMBINED_STORES[dataset].load(columns=columns, attachment_ids=attachment_ids))
+
+def _load_ytd_view_cached(dataset) -> pd.DataFrame:
+    return get_data_cache().get(
+        ("ytd_view", dataset), _view_version(dataset, "ytd"),
+        lambda: load_view(dataset, columns=summary_columns(dataset)),
+    )
+
+def load_view_columns(dataset, view: pd.DataFrame, rows: pd.DataFrame, columns=None) -> pd.DataFrame:
+    """
+    `rows` (taken from `view`, a load_view() frame, row labels kept) with the stored `columns` they lack,
+    or all of them when None, read for the attachments those rows come from only. An attachment rewritten
+    since `view` was loaded is left blank: the next rerun reloads the view.
+    """
+    stored = stored_columns(dataset)
+    wanted = [c for c in (stored if columns is None else columns) if c in stored and c not in rows.columns]
+    if not wanted or rows.empty:
+        return rows
+    aids = view["Attachment ID"].astype(str)
+    sizes = aids.value_counts()
+    ordinal = aids.groupby(aids, sort=False).cumcount()  # row position within its partition
+    needed = aids.loc[rows.index]
+    loaded = COMBINED_STORES[dataset].load(columns=wanted, attachment_ids=needed.unique())
+    parts = dict(iter(loaded.groupby(loaded["Attachment ID"].astype(str), sort=False)))
+    pieces = []
+    for aid, labels in needed.groupby(needed, sort=False).groups.items():
+        part = parts.get(aid)
+        if part is not None and len(part) == sizes[aid]:
+            part = part.reindex(columns=wanted).iloc[ordinal.loc[labels].to_numpy()]
+            pieces.append(part.set_axis(labels))
+    added = pd.concat(pieces) if pieces else pd.DataFrame(columns=wanted)
+    out = pd.concat([rows, added.reindex(rows.index)], axis=1)
+    return out[[c for c in stored if c in out.columns] + [c for c in out.columns if c not in stored]]
 
 
 # ---- Cached loaders (Associates) ----
-@st.cache_data(ttl=3600, show_spinner=False)
 def load_history_cached() -> pd.DataFrame:
-    try:
-        return pd.read_excel(HISTORY_FILE)
-    except Exception:
-        # Return empty frame with expected columns if first run
-        return pd.DataFrame(columns=[
-            "id","filename","saved_path","uploader","upload_dt","reporting_month",
-            "rows_count","source_url","status","message","active","superseded_by","validation_status"
-        ])
+    return _load_history_cached("Associates")
 
-@st.cache_data(ttl=3600, show_spinner=False)
 def load_combined_cached() -> pd.DataFrame:
-    try:
-        return pd.read_excel(COMBINED_FILE)
-    except Exception:
-        try:
-            return pd.read_csv(COMBINED_FILE_CSV)
-        except Exception:
-            return pd.DataFrame(columns=["Attachment ID"])
+    return _load_combined_cached("Associates")
+
+def load_ytd_view_cached() -> pd.DataFrame:
+    return _load_ytd_view_cached("Associates")
 
 
 # ---- Cached loaders (BA) ----
-@st.cache_data(ttl=3600, show_spinner=False)
 def ba_load_history_cached() -> pd.DataFrame:
-    try:
-        return pd.read_excel(BA_HISTORY_FILE)
-    except Exception:
-        return pd.DataFrame(columns=[
-            "id","filename","saved_path","uploader","upload_dt","reporting_month",
-            "rows_count","source_url","status","message","active","superseded_by","validation_status"
-        ])
+    return _load_history_cached("BA")
 
-@st.cache_data(ttl=3600, show_spinner=False)
 def ba_load_combined_cached() -> pd.DataFrame:
-    try:
-        return pd.read_excel(BA_COMBINED_FILE)
-    except Exception:
-        try:
-            return pd.read_csv(BA_COMBINED_FILE_CSV)
-        except Exception:
-            return pd.DataFrame(columns=["Attachment ID"])
+    return _load_combined_cached("BA")
+
+def ba_load_ytd_view_cached() -> pd.DataFrame:
+    return _load_ytd_view_cached("BA")
 
 
 # ---- Cached loaders (PE) ----
-@st.cache_data(ttl=3600, show_spinner=False)
 def pe_load_history_cached() -> pd.DataFrame:
-    try:
-        return pd.read_excel(PE_HISTORY_FILE)
-    except Exception:
-        return pd.DataFrame(columns=[
-            "id","filename","saved_path","uploader","upload_dt","reporting_month",
-            "rows_count","source_url","status","message","active","superseded_by","validation_status"
-        ])
+    return _load_history_cached("PE")
 
-@st.cache_data(ttl=3600, show_spinner=False)
 def pe_load_combined_cached() -> pd.DataFrame:
-    try:
-        return pd.read_excel(PE_COMBINED_FILE)
-    except Exception:
-        try:
-            return pd.read_csv(PE_COMBINED_FILE_CSV)
-        except Exception:
-            return pd.DataFrame(columns=["Attachment ID"])
+    return _load_combined_cached("PE")
+
+def pe_load_ytd_view_cached() -> pd.DataFrame:
+    return _load_ytd_view_cached("PE")
 
 
 # ---- Cached loaders (TL) ----
-@st.cache_data(ttl=3600, show_spinner=False)
 def tl_load_history_cached() -> pd.DataFrame:
-    try:
-        return pd.read_excel(TL_HISTORY_FILE)
-    except Exception:
-        return pd.DataFrame(columns=[
-            "id","filename","saved_path","uploader","upload_dt","reporting_month",
-            "rows_count","source_url","status","message","active","superseded_by","validation_status"
-        ])
+    return _load_history_cached("TL")
 
-@st.cache_data(ttl=3600, show_spinner=False)
 def tl_load_combined_cached() -> pd.DataFrame:
-    try:
-        return pd.read_excel(TL_COMBINED_FILE)
-    except Exception:
-        try:
-            return pd.read_csv(TL_COMBINED_FILE_CSV)
-        except Exception:
-            return pd.DataFrame(columns=["Attachment ID"])
+    return _load_combined_cached("TL")
+
+def tl_load_ytd_view_cached() -> pd.DataFrame:
+    return _load_ytd_view_cached("TL")
 
 
 # ---- Cached loaders (PL) ----
-@st.cache_data(ttl=3600, show_spinner=False)
 def pl_load_history_cached() -> pd.DataFrame:
-    try:
-        return pd.read_excel(PL_HISTORY_FILE)
-    except Exception:
-        return pd.DataFrame(columns=[
-            "id","filename","saved_path","uploader","upload_dt","reporting_month",
-            "rows_count","source_url","status","message","active","superseded_by","validation_status"
-        ])
+    return _load_history_cached("PL")
 
-@st.cache_data(ttl=3600, show_spinner=False)
 def pl_load_combined_cached() -> pd.DataFrame:
-    try:
-        return pd.read_excel(PL_COMBINED_FILE)
-    except Exception:
-        try:
-            return pd.read_csv(PL_COMBINED_FILE_CSV)
-        except Exception:
-            return pd.DataFrame(columns=["Attachment ID"])
-
+    return _load_combined_cached("PL")
 
-# ---- Cached transforms ----
-@st.cache_data(ttl=3600, show_spinner=False)
-def convert_percentage_cached(df: pd.DataFrame) -> pd.DataFrame:
-    return convert_percentage_columns(df)
-
-@st.cache_data(ttl=3600, show_spinner=False)
-def add_numeric_cached(df: pd.DataFrame) -> pd.DataFrame:
-    return add_numeric_percent_columns(df)
-
-
-def invalidate_data_caches():
-    # Clear all data caches (global)
-    st.cache_data.clear()
+def pl_load_ytd_view_cached() -> pd.DataFrame:
+    return _load_ytd_view_cached("PL")
 
 
 # -------------------------------------
 # Month normalization for filtering (YYYY-MM)
 # -------------------------------------
 def _to_month_str_series(df: pd.DataFrame) -> pd.Series:
-    candidates = [c for c in ["Month", "Reporting Month", "Report Month", "Date"] if c in df.columns]
-    if not candidates:
-        return pd.Series(dtype="object", index=df.index)
-    s = df[candidates[0]]
-    dt_series = pd.to_datetime(s, errors="coerce")
-    out = dt_series.dt.strftime("%Y-%m")
-    if out.isna().all():
-        out = s.astype(str).str.strip()
-    return out
+    """The frame's MONTH_KEY column (cached frames carry it), else the same values computed now."""
+    return df[MONTH_KEY] if MONTH_KEY in df.columns else normalized_month(df)
 
 # -------------------------------------
 # Display Cleaner (drop 'Unnamed...' & fully empty columns)
@@ -487,6 +1290,12 @@ def clean_dataframe_for_display(df: pd.DataFrame, hide_cols: bool) -> pd.DataFra
     empty_cols = [c for c in df.columns if _is_empty_col(df[c])]
     return df.drop(columns=empty_cols) if empty_cols else df
 
+def editable_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Admin editor input: metrics as "97.5%" text, dimensions as free text rather than a fixed choice list."""
+    out = format_percent_columns(df)
+    dims = [c for c in out.columns if isinstance(out[c].dtype, pd.CategoricalDtype)]
+    return out.astype({c: object for c in dims}) if dims else out
+
 # -------------------------------------
 # Excel size limits handling
 # -------------------------------------
@@ -500,156 +1309,234 @@ def exceeds_excel_limits(df):
 # -------------------------------------
 # Audit Logging
 # -------------------------------------
-def log_audit(action, attachment_id, filename, user):
-    audit_df = pd.read_excel(AUDIT_LOG_FILE)
-    audit_df = pd.concat([audit_df, pd.DataFrame([{
+def _audit_journal_path(dataset):
+    return os.path.join(AUDIT_DIR, f"{AUDIT_JOURNALS[dataset]}.jsonl")
+
+def _audit_segments(dataset):
+    """Rotated segments (oldest first) followed by the live journal, if present."""
+    path = _audit_journal_path(dataset)
+    rotated = sorted(glob.glob(path[:-len(".jsonl")] + ".*.jsonl"))
+    return rotated + ([path] if os.path.exists(path) else [])
+
+def _append_audit_lines(dataset, entries):
+    path = _audit_journal_path(dataset)
+    payload = "".join(json.dumps(e, ensure_ascii=False, default=str) + "\n" for e in entries).encode("utf-8")
+    with _locked(path):
+        if os.path.exists(path) and os.path.getsize(path) >= AUDIT_ROTATE_MB * 1024 * 1024:
+            os.replace(path, path[:-len(".jsonl")] + dt.datetime.now().strftime(".%Y%m%dT%H%M%S%f.jsonl"))
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, payload)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+def ensure_audit_journal():
+    # Seed each journal once: from the interim SQLite audit table if present, else from the legacy workbook
+    os.makedirs(AUDIT_DIR, exist_ok=True)
+    for ds in DATASET_KEYS:
+        if _audit_segments(ds):
+            continue
+        table = AUDIT_JOURNALS[ds]
+        seed = pd.DataFrame(columns=AUDIT_COLUMNS)
+        with closing(_meta_connect()) as conn:
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone():
+                seed = pd.read_sql_query(f"SELECT * FROM {_q(table)} ORDER BY rowid", conn)
+        if seed.empty and os.path.exists(LEGACY_AUDIT_FILES[ds]):
+            try:
+                seed = pd.read_excel(LEGACY_AUDIT_FILES[ds])
+            except Exception:
+                pass
+        seed = seed.reindex(columns=AUDIT_COLUMNS).astype(object)
+        _append_audit_lines(ds, seed.where(seed.notna(), None).to_dict("records"))
+        with closing(_meta_connect()) as conn, conn:
+            conn.execute(f"DROP TABLE IF EXISTS {_q(table)}")
+
+def _log_audit(dataset, action, attachment_id, filename, user):
+    _append_audit_lines(dataset, [{
         "timestamp": dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "action": action, "attachment_id": attachment_id, "filename": filename, "performed_by": user
-    }])], ignore_index=True)
-    audit_df.to_excel(AUDIT_LOG_FILE, index=False)
+    }])
+
+def load_audit(dataset) -> pd.DataFrame:
+    rows = []
+    for seg in _audit_segments(dataset):
+        with open(seg, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    continue  # torn trailing line from a crash mid-append
+    return pd.DataFrame(rows, columns=AUDIT_COLUMNS)
+
+def export_audit_xlsx(dataset) -> bytes:
+    """Compacted spreadsheet view of every journal segment, newest action first."""
+    audit = load_audit(dataset).sort_values("timestamp", ascending=False, kind="stable")
+    return make_excel_bytes_from_df(audit, hide_cols=False)
+
+def log_audit(action, attachment_id, filename, user):
+    _log_audit("Associates", action, attachment_id, filename, user)
 
 # BA audit
 def ba_log_audit(action, attachment_id, filename, user):
-    audit_df = pd.read_excel(BA_AUDIT_LOG_FILE)
-    audit_df = pd.concat([audit_df, pd.DataFrame([{
-        "timestamp": dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "action": action, "attachment_id": attachment_id, "filename": filename, "performed_by": user
-    }])], ignore_index=True)
-    audit_df.to_excel(BA_AUDIT_LOG_FILE, index=False)
+    _log_audit("BA", action, attachment_id, filename, user)
 
 
 # PE audit
 def pe_log_audit(action, attachment_id, filename, user):
-    audit_df = pd.read_excel(PE_AUDIT_LOG_FILE)
-    audit_df = pd.concat([audit_df, pd.DataFrame([{
-        "timestamp": dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "action": action, "attachment_id": attachment_id, "filename": filename, "performed_by": user
-    }])], ignore_index=True)
-    audit_df.to_excel(PE_AUDIT_LOG_FILE, index=False)
+    _log_audit("PE", action, attachment_id, filename, user)
 
 
 # TL audit
 def tl_log_audit(action, attachment_id, filename, user):
-    audit_df = pd.read_excel(TL_AUDIT_LOG_FILE)
-    audit_df = pd.concat([audit_df, pd.DataFrame([{
-        "timestamp": dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "action": action, "attachment_id": attachment_id, "filename": filename, "performed_by": user
-    }])], ignore_index=True)
-    audit_df.to_excel(TL_AUDIT_LOG_FILE, index=False)
+    _log_audit("TL", action, attachment_id, filename, user)
 
 # PL audit
 def pl_log_audit(action, attachment_id, filename, user):
-    audit_df = pd.read_excel(PL_AUDIT_LOG_FILE)
-    audit_df = pd.concat([audit_df, pd.DataFrame([{
-        "timestamp": dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "action": action, "attachment_id": attachment_id, "filename": filename, "performed_by": user
-    }])], ignore_index=True)
-    audit_df.to_excel(PL_AUDIT_LOG_FILE, index=False)
+    _log_audit("PL", action, attachment_id, filename, user)
 
 
 # -------------------------------------
 # Monthly Feedback helpers (upsert)
 # -------------------------------------
+def _load_feedback(dataset) -> pd.DataFrame:
+    return _meta_read(FEEDBACK_TABLES[dataset])
+
+def upsert_feedback_many(dataset, rows, entered_by):
+    """Point-upsert many comments (dicts with Domain ID, Name, Month, Team Lead, Feedback) in one transaction."""
+    table = FEEDBACK_TABLES[dataset]
+    stamp = dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    cols = FEEDBACK_COLUMNS
+    with closing(_meta_connect()) as conn, conn:
+        conn.executemany(
+            f"INSERT INTO {_q(table)} ({', '.join(_q(c) for c in cols)}) VALUES ({', '.join('?' for _ in cols)}) "
+            f'ON CONFLICT("Domain ID", "Month") DO UPDATE SET '
+            + ", ".join(f"{_q(c)} = excluded.{_q(c)}" for c in cols if c not in ("Domain ID", "Month")),
+            [
+                tuple(_to_sql_value(c, v) for c, v in zip(cols, (
+                    r["Domain ID"], r["Name"], r["Month"], r["Team Lead"], r["Feedback"], stamp, entered_by
+                )))
+                for r in rows
+            ],
+        )
+    get_feedback_index().invalidate(table)
+    return True
+
+def _upsert_feedback(dataset, domain_id, name, month, team_lead, feedback, entered_by):
+    return upsert_feedback_many(dataset, [{
+        "Domain ID": domain_id, "Name": name, "Month": month, "Team Lead": team_lead, "Feedback": feedback
+    }], entered_by)
+
+class FeedbackIndex:
+    """(Domain ID, Month) -> feedback row lookups, reloaded only when the table's version moves."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables = {}  # table -> (version, {(domain_id, month): row})
+
+    def _snapshot(self, table):
+        version = meta_table_version(table)
+        with self._lock:
+            cached = self._tables.get(table)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+        fb = _meta_read(table)
+        entries = {(str(r["Domain ID"]), str(r["Month"])): r for r in fb.to_dict("records")}
+        with self._lock:
+            self._tables[table] = (version, entries)
+        return entries
+
+    def get(self, dataset, domain_id, month):
+        return self._snapshot(FEEDBACK_TABLES[dataset]).get((str(domain_id), str(month)))
+
+    def invalidate(self, table):
+        with self._lock:
+            self._tables.pop(table, None)
+
+@st.cache_resource(show_spinner=False)
+def get_feedback_index() -> FeedbackIndex:
+    return FeedbackIndex()
+
+def render_feedback_entry(dataset, df, d_ids, months):
+    # Feedback entry for one Month and one or more Domain IDs (same comment saved for each)
+    if not (d_ids and months and len(months) == 1):
+        return
+    sel_domains = [str(d) for d in d_ids]
+    sel_month = str(months[0])
+    st.markdown("**Monthly feedback/feedforward** (max 500 characters)")
+    existing_text = ""
+    if len(sel_domains) == 1:
+        existing = get_feedback_index().get(dataset, sel_domains[0], sel_month)
+        existing_text = existing["Feedback"] if existing else ""
+    comment = st.text_area(
+        "Enter feedback for the selected Domain ID & Month" if len(sel_domains) == 1
+        else f"Enter feedback for the {len(sel_domains)} selected Domain IDs & Month",
+        value=str(existing_text),
+        max_chars=MAX_FEEDBACK_CHARS,
+        height=120
+    )
+    password = st.text_input("Enter Team Lead password to confirm", type="password")
+    if st.button("Submit Comment"):
+        if password != FEEDBACK_PASSWORD:
+            st.error("Incorrect password. Feedback not saved.")
+            return
+        people = df.assign(_did=df["Domain ID"].astype(str)).drop_duplicates("_did").set_index("_did")
+        found = [d for d in sel_domains if d in people.index]
+        if not found:
+            st.error("Selected Domain ID not found in current dataset.")
+            return
+        if not (comment and comment.strip()):
+            st.warning("Please enter a feedback comment before submitting.")
+            return
+        upsert_feedback_many(dataset, [{
+            "Domain ID": d,
+            "Name": str(people.at[d, "Name"]) if "Name" in people.columns else d,
+            "Month": sel_month,
+            "Team Lead": str(people.at[d, "Team Lead"]) if "Team Lead" in people.columns else "",
+            "Feedback": comment.strip(),
+        } for d in found], st.session_state.username or "user")
+        st.success("Feedback saved." if len(found) == 1 else f"Feedback saved for {len(found)} Domain IDs.")
+        missing = sorted(set(sel_domains) - set(found))
+        if missing:
+            st.warning(f"Not found in current dataset (skipped): {', '.join(missing)}")
+
 def load_feedback():
-    try:
-        return pd.read_excel(FEEDBACK_FILE)
-    except Exception:
-        return pd.DataFrame(columns=["Domain ID","Name","Month","Team Lead","Feedback","timestamp","entered_by"])
+    return _load_feedback("Associates")
 
 def upsert_feedback(domain_id: str, name: str, month: str, team_lead: str, feedback: str, entered_by: str):
-    fb = load_feedback()
-    # Remove existing for same Domain ID + Month (edit semantics)
-    mask = (fb["Domain ID"].astype(str) == str(domain_id)) & (fb["Month"].astype(str) == str(month))
-    fb = fb[~mask]
-    new_row = {
-        "Domain ID": domain_id, "Name": name, "Month": month, "Team Lead": team_lead,
-        "Feedback": feedback, "timestamp": dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "entered_by": entered_by
-    }
-    fb = pd.concat([fb, pd.DataFrame([new_row])], ignore_index=True)
-    fb.to_excel(FEEDBACK_FILE, index=False)
-    return True
+    return _upsert_feedback("Associates", domain_id, name, month, team_lead, feedback, entered_by)
 
 
 # BA feedback
 def ba_load_feedback():
-    try:
-        return pd.read_excel(BA_FEEDBACK_FILE)
-    except Exception:
-        return pd.DataFrame(columns=["Domain ID","Name","Month","Team Lead","Feedback","timestamp","entered_by"])
+    return _load_feedback("BA")
 
 def ba_upsert_feedback(domain_id: str, name: str, month: str, team_lead: str, feedback: str, entered_by: str):
-    fb = ba_load_feedback()
-    mask = (fb["Domain ID"].astype(str) == str(domain_id)) & (fb["Month"].astype(str) == str(month))
-    fb = fb[~mask]
-    new_row = {
-        "Domain ID": domain_id, "Name": name, "Month": month, "Team Lead": team_lead,
-        "Feedback": feedback, "timestamp": dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "entered_by": entered_by
-    }
-    fb = pd.concat([fb, pd.DataFrame([new_row])], ignore_index=True)
-    fb.to_excel(BA_FEEDBACK_FILE, index=False)
-    return True
+    return _upsert_feedback("BA", domain_id, name, month, team_lead, feedback, entered_by)
+
 
 # PE feedback
 def pe_load_feedback():
-    try:
-        return pd.read_excel(PE_FEEDBACK_FILE)
-    except Exception:
-        return pd.DataFrame(columns=["Domain ID","Name","Month","Team Lead","Feedback","timestamp","entered_by"])
+    return _load_feedback("PE")
 
 def pe_upsert_feedback(domain_id: str, name: str, month: str, team_lead: str, feedback: str, entered_by: str):
-    fb = pe_load_feedback()
-    mask = (fb["Domain ID"].astype(str) == str(domain_id)) & (fb["Month"].astype(str) == str(month))
-    fb = fb[~mask]
-    new_row = {
-        "Domain ID": domain_id, "Name": name, "Month": month, "Team Lead": team_lead,
-        "Feedback": feedback, "timestamp": dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "entered_by": entered_by
-    }
-    fb = pd.concat([fb, pd.DataFrame([new_row])], ignore_index=True)
-    fb.to_excel(PE_FEEDBACK_FILE, index=False)
-    return True
+    return _upsert_feedback("PE", domain_id, name, month, team_lead, feedback, entered_by)
+
 
 # TL feedback
 def tl_load_feedback():
-    try:
-        return pd.read_excel(TL_FEEDBACK_FILE)
-    except Exception:
-        return pd.DataFrame(columns=["Domain ID","Name","Month","Team Lead","Feedback","timestamp","entered_by"])
+    return _load_feedback("TL")
 
 def tl_upsert_feedback(domain_id: str, name: str, month: str, team_lead: str, feedback: str, entered_by: str):
-    fb = tl_load_feedback()
-    mask = (fb["Domain ID"].astype(str) == str(domain_id)) & (fb["Month"].astype(str) == str(month))
-    fb = fb[~mask]
-    new_row = {
-        "Domain ID": domain_id, "Name": name, "Month": month, "Team Lead": team_lead,
-        "Feedback": feedback, "timestamp": dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "entered_by": entered_by
-    }
-    fb = pd.concat([fb, pd.DataFrame([new_row])], ignore_index=True)
-    fb.to_excel(TL_FEEDBACK_FILE, index=False)
-    return True
+    return _upsert_feedback("TL", domain_id, name, month, team_lead, feedback, entered_by)
+
 
 # PL feedback
 def pl_load_feedback():
-    try:
-        return pd.read_excel(PL_FEEDBACK_FILE)
-    except Exception:
-        return pd.DataFrame(columns=["Domain ID","Name","Month","Team Lead","Feedback","timestamp","entered_by"])
+    return _load_feedback("PL")
 
 def pl_upsert_feedback(domain_id: str, name: str, month: str, team_lead: str, feedback: str, entered_by: str):
-    fb = pl_load_feedback()
-    mask = (fb["Domain ID"].astype(str) == str(domain_id)) & (fb["Month"].astype(str) == str(month))
-    fb = fb[~mask]
-    new_row = {
-        "Domain ID": domain_id, "Name": name, "Month": month, "Team Lead": team_lead,
-        "Feedback": feedback, "timestamp": dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "entered_by": entered_by
-    }
-    fb = pd.concat([fb, pd.DataFrame([new_row])], ignore_index=True)
-    fb.to_excel(PL_FEEDBACK_FILE, index=False)
-    return True
+    return _upsert_feedback("PL", domain_id, name, month, team_lead, feedback, entered_by)
 
 
 # -------------------------------------
@@ -680,27 +1567,26 @@ def monthly_metrics_table(latest_df: pd.DataFrame, report_month: str, group_by:
           .drop_duplicates(subset=["Domain ID","Month"], keep="first")
           .rename(columns={"Feedback": "Monthly feedback/feedforward"})
     )
+    # Feedback Domain IDs are stored as text; match on the string form
+    df["_domain_merge"] = df["Domain ID"].astype(str)
+    fb_latest["_domain_merge"] = fb_latest["Domain ID"].astype(str)
     df = df.merge(
-        fb_latest[["Domain ID","Month","Monthly feedback/feedforward","timestamp"]],
-        left_on=["Domain ID","_month_norm_merge"],
-        right_on=["Domain ID","Month"],
+        fb_latest[["_domain_merge","Month","Monthly feedback/feedforward","timestamp"]],
+        left_on=["_domain_merge","_month_norm_merge"],
+        right_on=["_domain_merge","Month"],
         how="left"
     )
     df = df.rename(columns={"timestamp": "Feedback timestamp"})
-    df = df.drop(columns=["Month_y","_month_norm_merge"], errors="ignore")
+    df = df.drop(columns=["Month_y","_month_norm_merge","_domain_merge"], errors="ignore")
     df = df.rename(columns={"Month_x": "Month"})
     present = [c for c in desired_cols if c in df.columns]
     out = df[present].copy()
     if "Rank" not in out.columns:
         if "Rank" in df.columns:
             out["Rank"] = df["Rank"]
-        elif "Final Score_num" in df.columns:
-            out["Rank"] = df["Final Score_num"].rank(method="dense", ascending=False).astype("Int64")
-        else:
-            if "Final Score" in df.columns:
-                s = df["Final Score"].astype(str).str.replace('%','', regex=False).str.replace(',', '.', regex=False)
-                num = pd.to_numeric(s, errors='coerce')
-                out["Rank"] = num.rank(method="dense", ascending=False).astype("Int64")
+        elif "Final Score" in df.columns:
+            num = pd.to_numeric(df["Final Score"], errors="coerce")
+            out["Rank"] = num.rank(method="dense", ascending=False).astype("Int64")
     return out
 
 # BA Monthly metrics
@@ -723,27 +1609,26 @@ def monthly_metrics_table_ba(latest_df: pd.DataFrame, report_month: str, group_b
           .drop_duplicates(subset=["Domain ID","Month"], keep="first")
           .rename(columns={"Feedback": "Monthly feedback/feedforward"})
     )
+    # Feedback Domain IDs are stored as text; match on the string form
+    df["_domain_merge"] = df["Domain ID"].astype(str)
+    fb_latest["_domain_merge"] = fb_latest["Domain ID"].astype(str)
     df = df.merge(
-        fb_latest[["Domain ID","Month","Monthly feedback/feedforward","timestamp"]],
-        left_on=["Domain ID","_month_norm_merge"],
-        right_on=["Domain ID","Month"],
+        fb_latest[["_domain_merge","Month","Monthly feedback/feedforward","timestamp"]],
+        left_on=["_domain_merge","_month_norm_merge"],
+        right_on=["_domain_merge","Month"],
         how="left"
     )
     df = df.rename(columns={"timestamp": "Feedback timestamp"})
-    df = df.drop(columns=["Month_y","_month_norm_merge"], errors="ignore")
+    df = df.drop(columns=["Month_y","_month_norm_merge","_domain_merge"], errors="ignore")
     df = df.rename(columns={"Month_x": "Month"})
     present = [c for c in desired_cols if c in df.columns]
     out = df[present].copy()
     if "Rank" not in out.columns:
         if "Rank" in df.columns:
             out["Rank"] = df["Rank"]
-        elif "Final Score_num" in df.columns:
-            out["Rank"] = df["Final Score_num"].rank(method="dense", ascending=False).astype("Int64")
-        else:
-            if "Final Score" in df.columns:
-                s = df["Final Score"].astype(str).str.replace('%','', regex=False).str.replace(',', '.', regex=False)
-                num = pd.to_numeric(s, errors='coerce')
-                out["Rank"] = num.rank(method="dense", ascending=False).astype("Int64")
+        elif "Final Score" in df.columns:
+            num = pd.to_numeric(df["Final Score"], errors="coerce")
+            out["Rank"] = num.rank(method="dense", ascending=False).astype("Int64")
     return out
 
 # PE Monthly metrics
@@ -766,27 +1651,26 @@ def monthly_metrics_table_pe(latest_df: pd.DataFrame, report_month: str, group_b
           .drop_duplicates(subset=["Domain ID","Month"], keep="first")
           .rename(columns={"Feedback": "Monthly feedback/feedforward"})
     )
+    # Feedback Domain IDs are stored as text; match on the string form
+    df["_domain_merge"] = df["Domain ID"].astype(str)
+    fb_latest["_domain_merge"] = fb_latest["Domain ID"].astype(str)
     df = df.merge(
-        fb_latest[["Domain ID","Month","Monthly feedback/feedforward","timestamp"]],
-        left_on=["Domain ID","_month_norm_merge"],
-        right_on=["Domain ID","Month"],
+        fb_latest[["_domain_merge","Month","Monthly feedback/feedforward","timestamp"]],
+        left_on=["_domain_merge","_month_norm_merge"],
+        right_on=["_domain_merge","Month"],
         how="left"
     )
     df = df.rename(columns={"timestamp": "Feedback timestamp"})
-    df = df.drop(columns=["Month_y","_month_norm_merge"], errors="ignore")
+    df = df.drop(columns=["Month_y","_month_norm_merge","_domain_merge"], errors="ignore")
     df = df.rename(columns={"Month_x": "Month"})
     present = [c for c in desired_cols if c in df.columns]
     out = df[present].copy()
     if "Rank" not in out.columns:
         if "Rank" in df.columns:
             out["Rank"] = df["Rank"]
-        elif "Final Score_num" in df.columns:
-            out["Rank"] = df["Final Score_num"].rank(method="dense", ascending=False).astype("Int64")
-        else:
-            if "Final Score" in df.columns:
-                s = df["Final Score"].astype(str).str.replace('%','', regex=False).str.replace(',', '.', regex=False)
-                num = pd.to_numeric(s, errors='coerce')
-                out["Rank"] = num.rank(method="dense", ascending=False).astype("Int64")
+        elif "Final Score" in df.columns:
+            num = pd.to_numeric(df["Final Score"], errors="coerce")
+            out["Rank"] = num.rank(method="dense", ascending=False).astype("Int64")
     return out
 
 # TL Monthly metrics
@@ -809,27 +1693,26 @@ def monthly_metrics_table_tl(latest_df: pd.DataFrame, report_month: str, group_b
           .drop_duplicates(subset=["Domain ID","Month"], keep="first")
           .rename(columns={"Feedback": "Monthly feedback/feedforward"})
     )
+    # Feedback Domain IDs are stored as text; match on the string form
+    df["_domain_merge"] = df["Domain ID"].astype(str)
+    fb_latest["_domain_merge"] = fb_latest["Domain ID"].astype(str)
     df = df.merge(
-        fb_latest[["Domain ID","Month","Monthly feedback/feedforward","timestamp"]],
-        left_on=["Domain ID","_month_norm_merge"],
-        right_on=["Domain ID","Month"],
+        fb_latest[["_domain_merge","Month","Monthly feedback/feedforward","timestamp"]],
+        left_on=["_domain_merge","_month_norm_merge"],
+        right_on=["_domain_merge","Month"],
         how="left"
     )
     df = df.rename(columns={"timestamp": "Feedback timestamp"})
-    df = df.drop(columns=["Month_y","_month_norm_merge"], errors="ignore")
+    df = df.drop(columns=["Month_y","_month_norm_merge","_domain_merge"], errors="ignore")
     df = df.rename(columns={"Month_x": "Month"})
     present = [c for c in desired_cols if c in df.columns]
     out = df[present].copy()
     if "Rank" not in out.columns:
         if "Rank" in df.columns:
             out["Rank"] = df["Rank"]
-        elif "Final Score_num" in df.columns:
-            out["Rank"] = df["Final Score_num"].rank(method="dense", ascending=False).astype("Int64")
-        else:
-            if "Final Score" in df.columns:
-                s = df["Final Score"].astype(str).str.replace('%','', regex=False).str.replace(',', '.', regex=False)
-                num = pd.to_numeric(s, errors='coerce')
-                out["Rank"] = num.rank(method="dense", ascending=False).astype("Int64")
+        elif "Final Score" in df.columns:
+            num = pd.to_numeric(df["Final Score"], errors="coerce")
+            out["Rank"] = num.rank(method="dense", ascending=False).astype("Int64")
     return out
 
 
@@ -853,27 +1736,26 @@ def monthly_metrics_table_pl(latest_df: pd.DataFrame, report_month: str, group_b
           .drop_duplicates(subset=["Domain ID","Month"], keep="first")
           .rename(columns={"Feedback": "Monthly feedback/feedforward"})
     )
+    # Feedback Domain IDs are stored as text; match on the string form
+    df["_domain_merge"] = df["Domain ID"].astype(str)
+    fb_latest["_domain_merge"] = fb_latest["Domain ID"].astype(str)
     df = df.merge(
-        fb_latest[["Domain ID","Month","Monthly feedback/feedforward","timestamp"]],
-        left_on=["Domain ID","_month_norm_merge"],
-        right_on=["Domain ID","Month"],
+        fb_latest[["_domain_merge","Month","Monthly feedback/feedforward","timestamp"]],
+        left_on=["_domain_merge","_month_norm_merge"],
+        right_on=["_domain_merge","Month"],
         how="left"
     )
     df = df.rename(columns={"timestamp": "Feedback timestamp"})
-    df = df.drop(columns=["Month_y","_month_norm_merge"], errors="ignore")
+    df = df.drop(columns=["Month_y","_month_norm_merge","_domain_merge"], errors="ignore")
     df = df.rename(columns={"Month_x": "Month"})
     present = [c for c in desired_cols if c in df.columns]
     out = df[present].copy()
     if "Rank" not in out.columns:
         if "Rank" in df.columns:
             out["Rank"] = df["Rank"]
-        elif "Final Score_num" in df.columns:
-            out["Rank"] = df["Final Score_num"].rank(method="dense", ascending=False).astype("Int64")
-        else:
-            if "Final Score" in df.columns:
-                s = df["Final Score"].astype(str).str.replace('%','', regex=False).str.replace(',', '.', regex=False)
-                num = pd.to_numeric(s, errors='coerce')
-                out["Rank"] = num.rank(method="dense", ascending=False).astype("Int64")
+        elif "Final Score" in df.columns:
+            num = pd.to_numeric(df["Final Score"], errors="coerce")
+            out["Rank"] = num.rank(method="dense", ascending=False).astype("Int64")
     return out
 
 
@@ -881,586 +1763,766 @@ def monthly_metrics_table_pl(latest_df: pd.DataFrame, report_month: str, group_b
 # -------------------------------------
 # Invalidation & Cleanup / Restore
 # -------------------------------------
-def mark_invalid_and_cleanup(attachment_id, user):
-    history_df = load_history()
-    row = history_df[history_df["id"] == attachment_id]
-    if row.empty: return False, "Attachment not found"
-    filename = row.iloc[0]["filename"]
-    saved_path = row.iloc[0]["saved_path"]
-    history_df.loc[history_df["id"] == attachment_id, ["validation_status","active"]] = ["Invalid", False]
-    save_history(history_df)
-    combined_df = load_combined()
-    combined_df = combined_df[combined_df["Attachment ID"] != attachment_id]
-    save_combined(combined_df)
-    invalidate_data_caches()  # ensure next UI run fetches fresh files
+def _mark_invalid_and_cleanup(dataset, attachment_id, user):
+    row = get_history_row(dataset, attachment_id)
+    if row is None: return False, "Attachment not found"
+    filename = row["filename"]
+    saved_path = row["saved_path"]
+    update_history(dataset, attachment_id, validation_status="Invalid", active=False)
+    COMBINED_STORES[dataset].drop_partition(attachment_id)
     try: os.remove(saved_path)
     except FileNotFoundError: pass
-    log_audit("Invalidation & Cleanup", attachment_id, filename, user)
+    _log_audit(dataset, "Invalidation & Cleanup", attachment_id, filename, user)
     return True, f"Attachment {attachment_id} marked invalid, deactivated, and data removed."
 
-def mark_valid_and_rebuild(attachment_id, make_active: bool, user: str):
-    history_df = load_history()
-    row = history_df[history_df["id"] == attachment_id]
-    if row.empty: return False, "Attachment not found"
-    filename = row.iloc[0]["filename"]
-    saved_path = row.iloc[0]["saved_path"]
-    month = row.iloc[0]["reporting_month"]
+def _mark_valid_and_rebuild(dataset, attachment_id, make_active: bool, user: str):
+    row = get_history_row(dataset, attachment_id)
+    if row is None: return False, "Attachment not found"
+    filename = row["filename"]
+    saved_path = row["saved_path"]
+    month = row["reporting_month"]
     if not os.path.exists(saved_path):
         return False, "Saved file not found on disk. Re-upload the Excel to restore."
     try:
         with open(saved_path, "rb") as f:
             file_bytes = f.read()
-        data_df = read_excel_bytes(file_bytes)
-        data_df = convert_percentage_columns(data_df)
-        data_df["Attachment ID"] = attachment_id
-        combined_df = load_combined()
-        combined_df = combined_df[combined_df["Attachment ID"] != attachment_id]
-        combined_df = pd.concat([combined_df, data_df], ignore_index=True)
-        save_combined(combined_df)
+        data_df = parse_upload(file_bytes)
+        parts = dict(split_by_month(data_df))
+        # A workbook covering several months was stored as one attachment per month (unless it was filed whole,
+        # before uploads were split, in which case its row count is the file's)
+        filed_whole = pd.notna(row["rows_count"]) and int(row["rows_count"]) == len(data_df)
+        if len(parts) > 1 and not filed_whole:
+            data_df = parts.get(month)
+            if data_df is None:
+                return False, f"Saved file has no rows for month {month}."
+        data_df = data_df.assign(**{"Attachment ID": attachment_id})
+        COMBINED_STORES[dataset].write_partition(attachment_id, data_df)
     except Exception as e:
         return False, f"Failed to rebuild data from saved file: {e}"
-    history_df.loc[history_df["id"] == attachment_id, "validation_status"] = "Valid"
-    if make_active:
-        mask = (history_df["reporting_month"] == month) & (history_df["active"] == True) & (history_df["id"] != attachment_id)
-        history_df.loc[mask, "active"] = False
-        history_df.loc[history_df["id"] == attachment_id, "active"] = True
-        history_df.loc[history_df["id"] == attachment_id, "superseded_by"] = ""
-    save_history(history_df)
+    table = HISTORY_TABLES[dataset]
+    with closing(_meta_connect()) as conn, conn:
+        conn.execute(f"UPDATE {_q(table)} SET validation_status = 'Valid' WHERE id = ?", (attachment_id,))
+        if make_active:
+            conn.execute(
+                f"UPDATE {_q(table)} SET active = 0 WHERE reporting_month = ? AND active = 1 AND id != ?",
+                (month, attachment_id),
+            )
+            conn.execute(f"UPDATE {_q(table)} SET active = 1, superseded_by = '' WHERE id = ?", (attachment_id,))
     action = "Restore Valid (active)" if make_active else "Restore Valid"
-    log_audit(action, attachment_id, filename, user)
+    _log_audit(dataset, action, attachment_id, filename, user)
     msg = f"Attachment {attachment_id} marked Valid and indexes rebuilt."
     if make_active: msg += " It is now the active file for the month."
     return True, msg
 
+def mark_invalid_and_cleanup(attachment_id, user):
+    return _mark_invalid_and_cleanup("Associates", attachment_id, user)
+
+def mark_valid_and_rebuild(attachment_id, make_active: bool, user: str):
+    return _mark_valid_and_rebuild("Associates", attachment_id, make_active, user)
+
+
 # BA invalidation & restore
 def ba_load_history():
-    return pd.read_excel(BA_HISTORY_FILE)
+    return _load_history("BA")
 
 def ba_save_history(df):
-    df.to_excel(BA_HISTORY_FILE, index=False)
+    _save_history("BA", df)
 
 
 def ba_load_combined():
-    try:
-        return pd.read_excel(BA_COMBINED_FILE)
-    except Exception:
-        try:
-            return pd.read_csv(BA_COMBINED_FILE_CSV)
-        except Exception:
-            return pd.DataFrame(columns=["Attachment ID"])
+    return COMBINED_STORES["BA"].load()
 
 
 def ba_save_combined(df):
-    if not exceeds_excel_limits(df):
-        df.to_excel(BA_COMBINED_FILE, index=False)
-    else:
-        df.to_csv(BA_COMBINED_FILE_CSV, index=False)
+    COMBINED_STORES["BA"].save(df)
 
 
 def ba_mark_invalid_and_cleanup(attachment_id, user):
-    history_df = ba_load_history_cached()
-    row = history_df[history_df["id"] == attachment_id]
-    if row.empty: return False, "Attachment not found"
-    filename = row.iloc[0]["filename"]
-    saved_path = row.iloc[0]["saved_path"]
-    history_df.loc[history_df["id"] == attachment_id, ["validation_status","active"]] = ["Invalid", False]
-    ba_save_history(history_df)
-    combined_df = ba_load_combined_cached()
-    combined_df = combined_df[combined_df["Attachment ID"] != attachment_id]
-    ba_save_combined(combined_df)
-    invalidate_data_caches()  # ensure next UI run fetches fresh files
-    try: os.remove(saved_path)
-    except FileNotFoundError: pass
-    ba_log_audit("Invalidation & Cleanup", attachment_id, filename, user)
-    return True, f"Attachment {attachment_id} marked invalid, deactivated, and data removed."
+    return _mark_invalid_and_cleanup("BA", attachment_id, user)
 
 
 def ba_mark_valid_and_rebuild(attachment_id, make_active: bool, user: str):
-    history_df = ba_load_history_cached()
-    row = history_df[history_df["id"] == attachment_id]
-    if row.empty: return False, "Attachment not found"
-    filename = row.iloc[0]["filename"]
-    saved_path = row.iloc[0]["saved_path"]
-    month = row.iloc[0]["reporting_month"]
-    if not os.path.exists(saved_path):
-        return False, "Saved file not found on disk. Re-upload the Excel to restore."
-    try:
-        with open(saved_path, "rb") as f:
-            file_bytes = f.read()
-        data_df = read_excel_bytes(file_bytes)
-        data_df = convert_percentage_columns(data_df)
-        data_df["Attachment ID"] = attachment_id
-        combined_df = ba_load_combined_cached()
-        combined_df = combined_df[combined_df["Attachment ID"] != attachment_id]
-        combined_df = pd.concat([combined_df, data_df], ignore_index=True)
-        ba_save_combined(combined_df)
-    except Exception as e:
-        return False, f"Failed to rebuild data from saved file: {e}"
-    history_df.loc[history_df["id"] == attachment_id, "validation_status"] = "Valid"
-    if make_active:
-        mask = (history_df["reporting_month"] == month) & (history_df["active"] == True) & (history_df["id"] != attachment_id)
-        history_df.loc[mask, "active"] = False
-        history_df.loc[history_df["id"] == attachment_id, "active"] = True
-        history_df.loc[history_df["id"] == attachment_id, "superseded_by"] = ""
-    ba_save_history(history_df)
-    action = "Restore Valid (active)" if make_active else "Restore Valid"
-    ba_log_audit(action, attachment_id, filename, user)
-    msg = f"Attachment {attachment_id} marked Valid and indexes rebuilt."
-    if make_active: msg += " It is now the active file for the month."
-    return True, msg
-
+    return _mark_valid_and_rebuild("BA", attachment_id, make_active, user)
 
 
 # PE invalidation & restore
 def pe_load_history():
-    return pd.read_excel(PE_HISTORY_FILE)
+    return _load_history("PE")
 
 def pe_save_history(df):
-    df.to_excel(PE_HISTORY_FILE, index=False)
+    _save_history("PE", df)
 
 
 def pe_load_combined():
-    try:
-        return pd.read_excel(PE_COMBINED_FILE)
-    except Exception:
-        try:
-            return pd.read_csv(PE_COMBINED_FILE_CSV)
-        except Exception:
-            return pd.DataFrame(columns=["Attachment ID"])
+    return COMBINED_STORES["PE"].load()
 
 
 def pe_save_combined(df):
-    if not exceeds_excel_limits(df):
-        df.to_excel(PE_COMBINED_FILE, index=False)
-    else:
-        df.to_csv(PE_COMBINED_FILE_CSV, index=False)
+    COMBINED_STORES["PE"].save(df)
 
 
 def pe_mark_invalid_and_cleanup(attachment_id, user):
-    history_df = pe_load_history_cached()
-    row = history_df[history_df["id"] == attachment_id]
-    if row.empty: return False, "Attachment not found"
-    filename = row.iloc[0]["filename"]
-    saved_path = row.iloc[0]["saved_path"]
-    history_df.loc[history_df["id"] == attachment_id, ["validation_status","active"]] = ["Invalid", False]
-    pe_save_history(history_df)
-    combined_df = pe_load_combined_cached()
-    combined_df = combined_df[combined_df["Attachment ID"] != attachment_id]
-    pe_save_combined(combined_df)
-    invalidate_data_caches()  # ensure next UI run fetches fresh files
-    try: os.remove(saved_path)
-    except FileNotFoundError: pass
-    pe_log_audit("Invalidation & Cleanup", attachment_id, filename, user)
-    return True, f"Attachment {attachment_id} marked invalid, deactivated, and data removed."
+    return _mark_invalid_and_cleanup("PE", attachment_id, user)
 
 
 def pe_mark_valid_and_rebuild(attachment_id, make_active: bool, user: str):
-    history_df = pe_load_history_cached()
-    row = history_df[history_df["id"] == attachment_id]
-    if row.empty: return False, "Attachment not found"
-    filename = row.iloc[0]["filename"]
-    saved_path = row.iloc[0]["saved_path"]
-    month = row.iloc[0]["reporting_month"]
-    if not os.path.exists(saved_path):
-        return False, "Saved file not found on disk. Re-upload the Excel to restore."
-    try:
-        with open(saved_path, "rb") as f:
-            file_bytes = f.read()
-        data_df = read_excel_bytes(file_bytes)
-        data_df = convert_percentage_columns(data_df)
-        data_df["Attachment ID"] = attachment_id
-        combined_df = pe_load_combined_cached()
-        combined_df = combined_df[combined_df["Attachment ID"] != attachment_id]
-        combined_df = pd.concat([combined_df, data_df], ignore_index=True)
-        pe_save_combined(combined_df)
-    except Exception as e:
-        return False, f"Failed to rebuild data from saved file: {e}"
-    history_df.loc[history_df["id"] == attachment_id, "validation_status"] = "Valid"
-    if make_active:
-        mask = (history_df["reporting_month"] == month) & (history_df["active"] == True) & (history_df["id"] != attachment_id)
-        history_df.loc[mask, "active"] = False
-        history_df.loc[history_df["id"] == attachment_id, "active"] = True
-        history_df.loc[history_df["id"] == attachment_id, "superseded_by"] = ""
-    pe_save_history(history_df)
-    action = "Restore Valid (active)" if make_active else "Restore Valid"
-    pe_log_audit(action, attachment_id, filename, user)
-    msg = f"Attachment {attachment_id} marked Valid and indexes rebuilt."
-    if make_active: msg += " It is now the active file for the month."
-    return True, msg
+    return _mark_valid_and_rebuild("PE", attachment_id, make_active, user)
 
 
 # TL invalidation & restore
 def tl_load_history():
-    return pd.read_excel(TL_HISTORY_FILE)
+    return _load_history("TL")
 
 def tl_save_history(df):
-    df.to_excel(TL_HISTORY_FILE, index=False)
+    _save_history("TL", df)
+
 
 def tl_load_combined():
-    try:
-        return pd.read_excel(TL_COMBINED_FILE)
-    except Exception:
-        try:
-            return pd.read_csv(TL_COMBINED_FILE_CSV)
-        except Exception:
-            return pd.DataFrame(columns=["Attachment ID"])
+    return COMBINED_STORES["TL"].load()
+
 
 def tl_save_combined(df):
-    if not exceeds_excel_limits(df):
-        df.to_excel(TL_COMBINED_FILE, index=False)
-    else:
-        df.to_csv(TL_COMBINED_FILE_CSV, index=False)
+    COMBINED_STORES["TL"].save(df)
+
 
 def tl_mark_invalid_and_cleanup(attachment_id, user):
-    history_df = tl_load_history_cached()
-    row = history_df[history_df["id"] == attachment_id]
-    if row.empty: return False, "Attachment not found"
-    filename = row.iloc[0]["filename"]
-    saved_path = row.iloc[0]["saved_path"]
-    history_df.loc[history_df["id"] == attachment_id, ["validation_status","active"]] = ["Invalid", False]
-    tl_save_history(history_df)
-    combined_df = tl_load_combined_cached()
-    combined_df = combined_df[combined_df["Attachment ID"] != attachment_id]
-    tl_save_combined(combined_df)
-    invalidate_data_caches()  # ensure next UI run fetches fresh files
-    try: os.remove(saved_path)
-    except FileNotFoundError: pass
-    tl_log_audit("Invalidation & Cleanup", attachment_id, filename, user)
-    return True, f"Attachment {attachment_id} marked invalid, deactivated, and data removed."
+    return _mark_invalid_and_cleanup("TL", attachment_id, user)
+
 
 def tl_mark_valid_and_rebuild(attachment_id, make_active: bool, user: str):
-    history_df = tl_load_history_cached()
-    row = history_df[history_df["id"] == attachment_id]
-    if row.empty: return False, "Attachment not found"
-    filename = row.iloc[0]["filename"]
-    saved_path = row.iloc[0]["saved_path"]
-    month = row.iloc[0]["reporting_month"]
-    if not os.path.exists(saved_path):
-        return False, "Saved file not found on disk. Re-upload the Excel to restore."
-    try:
-        with open(saved_path, "rb") as f:
-            file_bytes = f.read()
-        data_df = read_excel_bytes(file_bytes)
-        data_df = convert_percentage_columns(data_df)
-        data_df["Attachment ID"] = attachment_id
-        combined_df = tl_load_combined_cached()
-        combined_df = combined_df[combined_df["Attachment ID"] != attachment_id]
-        combined_df = pd.concat([combined_df, data_df], ignore_index=True)
-        tl_save_combined(combined_df)
-    except Exception as e:
-        return False, f"Failed to rebuild data from saved file: {e}"
-    history_df.loc[history_df["id"] == attachment_id, "validation_status"] = "Valid"
-    if make_active:
-        mask = (history_df["reporting_month"] == month) & (history_df["active"] == True) & (history_df["id"] != attachment_id)
-        history_df.loc[mask, "active"] = False
-        history_df.loc[history_df["id"] == attachment_id, "active"] = True
-        history_df.loc[history_df["id"] == attachment_id, "superseded_by"] = ""
-    tl_save_history(history_df)
-    action = "Restore Valid (active)" if make_active else "Restore Valid"
-    tl_log_audit(action, attachment_id, filename, user)
-    msg = f"Attachment {attachment_id} marked Valid and indexes rebuilt."
-    if make_active: msg += " It is now the active file for the month."
-    return True, msg
+    return _mark_valid_and_rebuild("TL", attachment_id, make_active, user)
 
 
 # PL invalidation & restore
 def pl_load_history():
-    return pd.read_excel(PL_HISTORY_FILE)
+    return _load_history("PL")
 
 def pl_save_history(df):
-    df.to_excel(PL_HISTORY_FILE, index=False)
+    _save_history("PL", df)
+
 
 def pl_load_combined():
-    try:
-        return pd.read_excel(PL_COMBINED_FILE)
-    except Exception:
-        try:
-            return pd.read_csv(PL_COMBINED_FILE_CSV)
-        except Exception:
-            return pd.DataFrame(columns=["Attachment ID"])
+    return COMBINED_STORES["PL"].load()
+
 
 def pl_save_combined(df):
-    if not exceeds_excel_limits(df):
-        df.to_excel(PL_COMBINED_FILE, index=False)
-    else:
-        df.to_csv(PL_COMBINED_FILE_CSV, index=False)
+    COMBINED_STORES["PL"].save(df)
+
 
 def pl_mark_invalid_and_cleanup(attachment_id, user):
-    history_df = pl_load_history_cached()
-    row = history_df[history_df["id"] == attachment_id]
-    if row.empty: return False, "Attachment not found"
-    filename = row.iloc[0]["filename"]
-    saved_path = row.iloc[0]["saved_path"]
-    history_df.loc[history_df["id"] == attachment_id, ["validation_status","active"]] = ["Invalid", False]
-    pl_save_history(history_df)
-    combined_df = pl_load_combined_cached()
-    combined_df = combined_df[combined_df["Attachment ID"] != attachment_id]
-    pl_save_combined(combined_df)
-    invalidate_data_caches()  # ensure next UI run fetches fresh files
-    try: os.remove(saved_path)
-    except FileNotFoundError: pass
-    pl_log_audit("Invalidation & Cleanup", attachment_id, filename, user)
-    return True, f"Attachment {attachment_id} marked invalid, deactivated, and data removed."
+    return _mark_invalid_and_cleanup("PL", attachment_id, user)
 
-def pl_mark_valid_and_rebuild(attachment_id, make_active: bool, user: str):
-    history_df = pl_load_history_cached()
-    row = history_df[history_df["id"] == attachment_id]
-    if row.empty: return False, "Attachment not found"
-    filename = row.iloc[0]["filename"]
-    saved_path = row.iloc[0]["saved_path"]
-    month = row.iloc[0]["reporting_month"]
-    if not os.path.exists(saved_path):
-        return False, "Saved file not found on disk. Re-upload the Excel to restore."
-    try:
-        with open(saved_path, "rb") as f:
-            file_bytes = f.read()
-        data_df = read_excel_bytes(file_bytes)
-        data_df = convert_percentage_columns(data_df)
-        data_df["Attachment ID"] = attachment_id
-        combined_df = pl_load_combined_cached()
-        combined_df = combined_df[combined_df["Attachment ID"] != attachment_id]
-        combined_df = pd.concat([combined_df, data_df], ignore_index=True)
-        pl_save_combined(combined_df)
-    except Exception as e:
-        return False, f"Failed to rebuild data from saved file: {e}"
-    history_df.loc[history_df["id"] == attachment_id, "validation_status"] = "Valid"
-    if make_active:
-        mask = (history_df["reporting_month"] == month) & (history_df["active"] == True) & (history_df["id"] != attachment_id)
-        history_df.loc[mask, "active"] = False
-        history_df.loc[history_df["id"] == attachment_id, "active"] = True
-        history_df.loc[history_df["id"] == attachment_id, "superseded_by"] = ""
-    pl_save_history(history_df)
-    action = "Restore Valid (active)" if make_active else "Restore Valid"
-    pl_log_audit(action, attachment_id, filename, user)
-    msg = f"Attachment {attachment_id} marked Valid and indexes rebuilt."
-    if make_active: msg += " It is now the active file for the month."
-    return True, msg
 
+def pl_mark_valid_and_rebuild(attachment_id, make_active: bool, user: str):
+    return _mark_valid_and_rebuild("PL", attachment_id, make_active, user)
 
 
 
 # -------------------------------------
 # Upload Processing
 # -------------------------------------
-def process_upload(name, file_bytes, uploader, source_url=None):
+# -------------------------------------
+# Staged uploads (parse once: preview, validation and processing share one frame)
+# -------------------------------------
+STAGED_UPLOAD_SLOTS = 4
+
+class StagedUploads:
+    """Parsed uploads keyed by the SHA-256 of the file bytes, least recently used evicted first.
+    Values are (frame, error) and are shared across reruns and sessions: treat frames as read-only."""
+
+    def __init__(self, max_entries=STAGED_UPLOAD_SLOTS):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # digest -> (frame, error)
+
+    def get(self, digest, loader):
+        with self._lock:
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+                return self._entries[digest]
+        value = loader()  # parse outside the lock; a concurrent duplicate parse is harmless
+        with self._lock:
+            self._entries[digest] = value
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return [
+                {"key": f"staged upload / {digest[:12]}", "rows": len(frame) if frame is not None else None,
+                 "MB": round(frame.memory_usage(deep=True).sum() / (1024 * 1024), 2) if frame is not None else 0.0,
+                 "loading": False}
+                for digest, (frame, error) in self._entries.items()
+            ]
+
+@st.cache_resource(show_spinner=False)
+def get_staged_uploads() -> StagedUploads:
+    return StagedUploads()
+
+def parse_upload(file_bytes) -> pd.DataFrame:
+    """Read the Data sheet and type its percent metrics; raises ValueError for an unreadable file."""
+    return type_percent_columns(read_excel_bytes(file_bytes))
+
+def upload_digest(file_bytes) -> str:
+    return hashlib.sha256(file_bytes).hexdigest()
+
+def stage_upload(file_bytes, digest=None):
+    """(frame, error) for an upload, parsed at most once per distinct content."""
+    return get_staged_uploads().get(
+        digest or upload_digest(file_bytes), lambda: parse_upload_file(file_bytes, REQUIRED_COLS, EXCEL_READER_ENGINE)
+    )
+
+def detect_dataset(filename):
+    """Dataset key for an upload, from the terms in its filename (None when nothing matches)."""
+    name = filename.lower()
+    return next((dataset for term, dataset in UPLOAD_ROUTES if term in name), None)
+
+def _process_upload(dataset, name, file_bytes, uploader, source_url=None, on_state=None, parsed=None):
+    """
+    Parse, validate and store one upload, as one attachment per reporting month it covers. The new
+    partitions and saved files are written first and the history rows (which supersede those months'
+    active files) are committed last, in one transaction, so a failure at any step rolls back to storage
+    as it was. Files above STREAM_UPLOAD_MB are streamed into storage chunk by chunk. `on_state(state)`
+    reports "parsing" / "writing" to the ingest queue; `parsed` is an already computed (frame, error)
+    for the file, as bulk uploads pass in.
+    """
+    on_state = on_state or (lambda state: None)
     if len(file_bytes) > MAX_UPLOAD_MB*1024*1024:
         return False, f"File exceeds {MAX_UPLOAD_MB}MB", None
+    digest = upload_digest(file_bytes)
+    existing = find_uploads_by_digest(dataset, digest)
+    if not existing.empty:
+        on_state("writing")
+        return _reuse_upload(dataset, existing, file_bytes, uploader)
+    store = COMBINED_STORES[dataset]
+    streamed = parsed is None and is_large_upload(file_bytes) and store.supports_streaming
+    if not streamed:
+        on_state("parsing")
+        data_df, error = parsed or stage_upload(file_bytes, digest)
+        if error:
+            return False, error, None
+        missing_data = validate_required_columns(data_df)
+        if missing_data:
+            return False, f"Missing required columns in Data sheet: {', '.join(missing_data)}", None
+    partial = os.path.join(ATTACHMENT_DIRS[dataset], f".{uuid.uuid4()}.part")
+    stored, written = {}, []  # month -> (attachment id, rows, change summary); ids to drop on failure
+    try:
+        with open(partial, "wb") as f:
+            f.write(file_bytes)
+        if streamed:
+            on_state("parsing")  # chunks are parsed and written in turn, from the copy on disk
+            streams, preview = _stream_upload_rows(store, partial)
+            stored = {month: (aid, rows, "") for month, (aid, rows) in streams.items()}
+            written = [aid for aid, _, _ in stored.values()]
+        else:
+            on_state("writing")
+            heads = []
+            for month, part in split_by_month(data_df):
+                attach_id = str(uuid.uuid4())
+                part = part.assign(**{"Attachment ID": attach_id})  # the staged frame is shared
+                written.append(attach_id)
+                stored[month] = (attach_id, len(part), _write_upload_rows(dataset, month, attach_id, part))
+                heads.append(part.head(20))
+            preview = pd.concat(heads).sort_index().head(20) if len(heads) > 1 else heads[0]
+        on_state("writing")
+        now = dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        paths = [_derive_saved_path(dataset, month, name) for month in stored]
+        # Supersede any active file for the same months and record the new ones
+        record_uploads(dataset, [{
+            "id": attach_id, "filename": name, "saved_path": path, "uploader": uploader,
+            "upload_dt": now, "reporting_month": month,
+            "rows_count": rows, "source_url": source_url or "", "status": "success",
+            "message": changes, "active": True, "superseded_by": "", "validation_status": "Valid",
+            "content_sha256": digest,
+        } for path, (month, (attach_id, rows, changes)) in zip(paths, stored.items())])
+    except BaseException as e:
+        for attach_id in written:
+            store.drop_partition(attach_id)
+        try: os.remove(partial)
+        except FileNotFoundError: pass
+        if streamed and isinstance(e, ValueError):  # unreadable workbook or missing columns, found mid-stream
+            return False, str(e), None
+        raise
+    note = _keep_saved_copies(dataset, partial, paths)
+    msg = f"Uploaded and processed for {_months_text(list(stored))}."
+    for month, (_, _, changes) in stored.items():
+        if changes.startswith("delta"):
+            label = "Changes" if len(stored) == 1 else f"{month} changes"
+            msg += f" {label} {changes[len('delta '):]} (only these rows were stored)."
+    return True, msg + note, preview
+
+def _months_text(months) -> str:
+    return f"month {months[0]}" if len(months) == 1 else f"{len(months)} months ({', '.join(months)})"
+
+def is_large_upload(file_bytes) -> bool:
+    return len(file_bytes) > STREAM_UPLOAD_MB * 1024 * 1024
+
+def _stream_upload_rows(store, source):
+    """
+    Stream an upload's data sheet into the store chunk by chunk, one new attachment per reporting month.
+    Rows are placed as split_by_month() would place them. Returns ({month: (attachment id, rows)}, preview).
+    """
+    streams, first, preview = {}, None, None  # streams[""]: rows seen before any month was
     try:
-        data_df = read_excel_bytes(file_bytes)
-    except ValueError as e:
-        return False, str(e), None
-    missing_data = validate_required_columns(data_df)
-    if missing_data:
-        return False, f"Missing required columns in Data sheet: {', '.join(missing_data)}", None
-    data_df = convert_percentage_columns(data_df)
-    month = safe_month_from_columns(data_df)
-    attach_id = str(uuid.uuid4())
-    path = derive_saved_path(month, name)
-    with open(path, "wb") as f:
-        f.write(file_bytes)
-    history_df = load_history()
-    history_df = supersede_existing_month(month, attach_id, history_df)
-    history_df = pd.concat([history_df, pd.DataFrame([{
-        "id": attach_id, "filename": name, "saved_path": path, "uploader": uploader,
-        "upload_dt": dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "reporting_month": month,
-        "rows_count": len(data_df), "source_url": source_url or "", "status": "success",
-        "message": "", "active": True, "superseded_by": "", "validation_status": "Valid"
-    }])], ignore_index=True)
-    save_history(history_df)
-    data_df["Attachment ID"] = attach_id
-    combined_df = load_combined()
-    combined_df = pd.concat([combined_df, data_df], ignore_index=True)
-    save_combined(combined_df)
-    invalidate_data_caches()  # ensure next UI run fetches fresh files
-    return True, f"Uploaded and processed for month {month}.", data_df.head(20)
+        with open(source, "rb") as fh:  # a file object: openpyxl judges paths by their extension
+            for chunk in iter_data_sheet(fh, REQUIRED_COLS, chunk_rows=INGEST_CHUNK_ROWS):
+                if preview is None:
+                    missing = validate_required_columns(chunk)
+                    if missing:
+                        raise ValueError(f"Missing required columns in Data sheet: {', '.join(missing)}")
+                chunk = type_percent_columns(chunk)
+                keys = month_keys(chunk)
+                if first is None and keys.notna().any():
+                    first = keys.dropna().iloc[0]
+                    if "" in streams:  # the rows so far belong to the first month
+                        streams[first] = streams.pop("")
+                keys = keys.fillna(first or "")
+                for month, part in chunk.groupby(keys, sort=False):
+                    if month not in streams:
+                        streams[month] = store.open_stream(uuid.uuid4())
+                    streams[month].write(part)
+                if preview is None:
+                    preview = chunk.head(20).assign(**{"Attachment ID": [streams[m].aid for m in keys.head(20)]})
+        if "" in streams:  # no row has a month
+            streams[current_month()] = streams.pop("")
+        committed = {}
+        for month in sorted(streams):
+            committed[month] = (streams[month].aid, streams[month].commit())
+    except BaseException:
+        for stream in streams.values():
+            stream.abort()
+            store.drop_partition(stream.aid)
+        raise
+    return committed, preview
+
+def preview_upload(file_bytes, digest=None):
+    """(frame, error) for the upload preview: the staged parse, or only the first rows of a file that will be streamed."""
+    if not is_large_upload(file_bytes):
+        return stage_upload(file_bytes, digest)
+
+    def head():
+        chunks = iter_data_sheet(io.BytesIO(file_bytes), REQUIRED_COLS, chunk_rows=20)
+        try:
+            return type_percent_columns(next(chunks)), None
+        except ValueError as e:
+            return None, str(e)
+        finally:
+            chunks.close()
+    return get_staged_uploads().get(f"{digest or upload_digest(file_bytes)}:head", head)
+
+def active_attachment_id(dataset, month):
+    table = HISTORY_TABLES[dataset]
+    with closing(_meta_connect()) as conn:
+        row = conn.execute(
+            f"SELECT id FROM {_q(table)} WHERE reporting_month = ? AND active = 1 ORDER BY rowid DESC LIMIT 1", (month,)
+        ).fetchone()
+    return row[0] if row else None
+
+def _write_upload_rows(dataset, month, attach_id, data_df) -> str:
+    """
+    Store an upload's rows. A corrected file for a month that already has an active attachment is
+    diffed against it by Domain ID and, when few rows differ, stored as a delta on that attachment.
+    Returns the change summary kept in the history row's message ("" when there was nothing to compare).
+    """
+    store = COMBINED_STORES[dataset]
+    base_id = active_attachment_id(dataset, month) if DELTA_UPLOADS and store.supports_deltas else None
+    new = _typed_for_parquet(data_df)  # compare in stored form
+    diff = diff_rows(store.load_partition(base_id), new) if base_id else None
+    if diff is None:
+        store.write_partition(attach_id, data_df)
+        return ""
+    rows, changed, added, removed = diff
+    summary = f"vs {base_id}: {len(changed)} changed, {len(added)} added, {len(removed)} removed"
+    small = len(rows) + len(removed) <= DELTA_MAX_FRACTION * max(len(new), 1)
+    if small and store.delta_depth(base_id) < DELTA_MAX_CHAIN:
+        store.write_delta(attach_id, base_id, rows, removed, len(new))
+        return f"delta {summary}"
+    store.write_partition(attach_id, data_df)
+    return f"full {summary}"
+
+def _reuse_upload(dataset, rows, file_bytes, uploader):
+    """
+    An identical file was uploaded before: its rows are already stored, so nothing is parsed or written.
+    Any of its monthly attachments that is no longer active becomes that month's active file again.
+    """
+    store = COMBINED_STORES[dataset]
+    ids, months = ", ".join(rows["id"]), _months_text(list(rows["reporting_month"]))
+    preview = pd.concat([store.load_partition(aid).head(20) for aid in rows["id"]]).head(20)
+    stale = rows[~rows["active"].astype(bool)]
+    if stale.empty:
+        return True, f"Identical file already uploaded as attachment {ids} (active for {months}); nothing changed.", preview
+    table = HISTORY_TABLES[dataset]
+    with closing(_meta_connect()) as conn, conn:
+        old_paths = []
+        for _, row in stale.iterrows():
+            old_paths += supersede_existing_month(conn, dataset, row["reporting_month"], row["id"])
+            conn.execute(f"UPDATE {_q(table)} SET active = 1, superseded_by = '' WHERE id = ?", (row["id"],))
+    # Superseding removed the saved copies; put them back so the attachments can still be rebuilt later
+    partial = os.path.join(ATTACHMENT_DIRS[dataset], f".{uuid.uuid4()}.part")
+    restored = list(stale["saved_path"])
+    note = _keep_saved_copies(dataset, partial, restored, file_bytes)
+    for path in old_paths:
+        if not path or path in restored:
+            continue
+        try: os.remove(path)
+        except FileNotFoundError: pass
+        except OSError as e:
+            logging.getLogger(__name__).warning("%s: could not remove superseded file %s: %s", dataset, path, e)
+    for _, row in stale.iterrows():
+        _log_audit(dataset, "Re-activate (identical re-upload)", row["id"], row["filename"], uploader)
+    ids, months = ", ".join(stale["id"]), _months_text(list(stale["reporting_month"]))
+    return True, f"Identical to earlier attachment {ids}; it is the active file for {months} again.{note}", preview
+
+def process_upload(name, file_bytes, uploader, source_url=None):
+    return _process_upload("Associates", name, file_bytes, uploader, source_url)
 
 # BA Upload Processing
 def ba_process_upload(name, file_bytes, uploader, source_url=None):
-    if len(file_bytes) > MAX_UPLOAD_MB*1024*1024:
-        return False, f"File exceeds {MAX_UPLOAD_MB}MB", None
-    try:
-        data_df = read_excel_bytes(file_bytes)
-    except ValueError as e:
-        return False, str(e), None
-    missing_data = validate_required_columns(data_df)
-    if missing_data:
-        return False, f"Missing required columns in Data sheet: {', '.join(missing_data)}", None
-    data_df = convert_percentage_columns(data_df)
-    month = safe_month_from_columns(data_df)
-    attach_id = str(uuid.uuid4())
-    path = os.path.join(BA_ATTACHMENTS_DIR, f"{month}_{name.replace('/', '_').replace(chr(92), '_')}")
-    with open(path, "wb") as f:
-        f.write(file_bytes)
-    history_df = ba_load_history_cached()
-    mask = (history_df["reporting_month"] == month) & (history_df["active"] == True)
-    for idx in history_df[mask].index:
-        try: os.remove(history_df.at[idx, "saved_path"])
-        except: pass
-        history_df.at[idx, "active"] = False
-        history_df.at[idx, "superseded_by"] = attach_id
-    history_df = pd.concat([history_df, pd.DataFrame([{
-        "id": attach_id, "filename": name, "saved_path": path, "uploader": uploader,
-        "upload_dt": dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "reporting_month": month,
-        "rows_count": len(data_df), "source_url": source_url or "", "status": "success",
-        "message": "", "active": True, "superseded_by": "", "validation_status": "Valid"
-    }])], ignore_index=True)
-    ba_save_history(history_df)
-    data_df["Attachment ID"] = attach_id
-    combined_df = ba_load_combined_cached()
-    combined_df = pd.concat([combined_df, data_df], ignore_index=True)
-    ba_save_combined(combined_df)
-    invalidate_data_caches()  # ensure next UI run fetches fresh files
-    return True, f"Uploaded and processed for month {month}.", data_df.head(20)
+    return _process_upload("BA", name, file_bytes, uploader, source_url)
 
 # PE Upload Processing
 def pe_process_upload(name, file_bytes, uploader, source_url=None):
-    if len(file_bytes) > MAX_UPLOAD_MB*1024*1024:
-        return False, f"File exceeds {MAX_UPLOAD_MB}MB", None
-    try:
-        data_df = read_excel_bytes(file_bytes)
-    except ValueError as e:
-        return False, str(e), None
-    missing_data = validate_required_columns(data_df)
-    if missing_data:
-        return False, f"Missing required columns in Data sheet: {', '.join(missing_data)}", None
-    data_df = convert_percentage_columns(data_df)
-    month = safe_month_from_columns(data_df)
-    attach_id = str(uuid.uuid4())
-    path = os.path.join(PE_ATTACHMENTS_DIR, f"{month}_{name.replace('/', '_').replace(chr(92), '_')}")
-    with open(path, "wb") as f:
-        f.write(file_bytes)
-    history_df = pe_load_history_cached()
-    # Supersede any active file for the same month
-    mask = (history_df["reporting_month"] == month) & (history_df["active"] == True)
-    for idx in history_df[mask].index:
-        try: os.remove(history_df.at[idx, "saved_path"])
-        except: pass
-        history_df.at[idx, "active"] = False
-        history_df.at[idx, "superseded_by"] = attach_id
-    history_df = pd.concat([history_df, pd.DataFrame([{
-        "id": attach_id, "filename": name, "saved_path": path, "uploader": uploader,
-        "upload_dt": dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "reporting_month": month,
-        "rows_count": len(data_df), "source_url": source_url or "", "status": "success",
-        "message": "", "active": True, "superseded_by": "", "validation_status": "Valid"
-    }])], ignore_index=True)
-    pe_save_history(history_df)
-    data_df["Attachment ID"] = attach_id
-    combined_df = pe_load_combined_cached()
-    combined_df = pd.concat([combined_df, data_df], ignore_index=True)
-    pe_save_combined(combined_df)
-    invalidate_data_caches()  # ensure next UI run fetches fresh files
-    return True, f"Uploaded and processed for month {month}.", data_df.head(20)
+    return _process_upload("PE", name, file_bytes, uploader, source_url)
 
 # TL Upload Processing
 def tl_process_upload(name, file_bytes, uploader, source_url=None):
-    if len(file_bytes) > MAX_UPLOAD_MB*1024*1024:
-        return False, f"File exceeds {MAX_UPLOAD_MB}MB", None
-    try:
-        data_df = read_excel_bytes(file_bytes)
-    except ValueError as e:
-        return False, str(e), None
-    missing_data = validate_required_columns(data_df)
-    if missing_data:
-        return False, f"Missing required columns in Data sheet: {', '.join(missing_data)}", None
-    data_df = convert_percentage_columns(data_df)
-    month = safe_month_from_columns(data_df)
-    attach_id = str(uuid.uuid4())
-    path = os.path.join(TL_ATTACHMENTS_DIR, f"{month}_{name.replace('/', '_').replace(chr(92), '_')}")
-    with open(path, "wb") as f:
-        f.write(file_bytes)
-    history_df = tl_load_history_cached()
-    # Supersede any active file for the same month
-    mask = (history_df["reporting_month"] == month) & (history_df["active"] == True)
-    for idx in history_df[mask].index:
-        try: os.remove(history_df.at[idx, "saved_path"])
-        except: pass
-        history_df.at[idx, "active"] = False
-        history_df.at[idx, "superseded_by"] = attach_id
-    history_df = pd.concat([history_df, pd.DataFrame([{
-        "id": attach_id, "filename": name, "saved_path": path, "uploader": uploader,
-        "upload_dt": dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "reporting_month": month,
-        "rows_count": len(data_df), "source_url": source_url or "", "status": "success",
-        "message": "", "active": True, "superseded_by": "", "validation_status": "Valid"
-    }])], ignore_index=True)
-    tl_save_history(history_df)
-    data_df["Attachment ID"] = attach_id
-    combined_df = tl_load_combined_cached()
-    combined_df = pd.concat([combined_df, data_df], ignore_index=True)
-    tl_save_combined(combined_df)
-    invalidate_data_caches()  # ensure next UI run fetches fresh files
-    return True, f"Uploaded and processed for month {month}.", data_df.head(20)
-
+    return _process_upload("TL", name, file_bytes, uploader, source_url)
 
 # PL Upload Processing
 def pl_process_upload(name, file_bytes, uploader, source_url=None):
-    if len(file_bytes) > MAX_UPLOAD_MB*1024*1024:
-        return False, f"File exceeds {MAX_UPLOAD_MB}MB", None
+    return _process_upload("PL", name, file_bytes, uploader, source_url)
+
+
+# -------------------------------------
+# Background ingestion
+# -------------------------------------
+INGEST_WORKERS = 1         # uploads are applied one at a time (each supersedes its month's active file)
+INGEST_JOBS_KEPT = 50      # finished jobs listed on the admin page
+INGEST_ACTIVE_STATES = ("queued", "parsing", "writing")
+INGEST_POLL_SECONDS = 2    # admin page refresh interval while jobs are in flight
+# Bulk uploads parse in separate processes (parsing holds the GIL); default: one per dataset, up to the core count
+INGEST_PARSE_PROCESSES = int(os.getenv("INGEST_PARSE_PROCESSES", "0")) or min(len(DATASET_KEYS), os.cpu_count() or 1)
+
+@st.cache_resource(show_spinner=False)
+def get_parse_pool() -> ProcessPoolExecutor:
+    # spawn rather than fork: the server process is multi-threaded
+    return ProcessPoolExecutor(max_workers=INGEST_PARSE_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+
+def parse_in_pool(file_bytes) -> Future:
+    """Future (frame, error) for an upload parsed in the process pool, or parsed here if the pool is unusable."""
+    try:
+        return get_parse_pool().submit(parse_upload_file, file_bytes, REQUIRED_COLS, EXCEL_READER_ENGINE)
+    except (BrokenProcessPool, RuntimeError):  # a worker died or the pool was shut down: start a new one next time
+        get_parse_pool.clear()
+        done = Future()
+        done.set_result(parse_upload_file(file_bytes, REQUIRED_COLS, EXCEL_READER_ENGINE))
+        return done
+
+def parsed_result(future, file_bytes):
+    """The (frame, error) of a parse_in_pool() future; parsed here instead if its worker died after submission."""
     try:
-        data_df = read_excel_bytes(file_bytes)
-    except ValueError as e:
-        return False, str(e), None
-    missing_data = validate_required_columns(data_df)
-    if missing_data:
-        return False, f"Missing required columns in Data sheet: {', '.join(missing_data)}", None
-    data_df = convert_percentage_columns(data_df)
-    month = safe_month_from_columns(data_df)
-    attach_id = str(uuid.uuid4())
-    path = os.path.join(PL_ATTACHMENTS_DIR, f"{month}_{name.replace('/', '_').replace(chr(92), '_')}")
-    with open(path, "wb") as f:
-        f.write(file_bytes)
-    history_df = pl_load_history_cached()
-    # Supersede any active file for the same month
-    mask = (history_df["reporting_month"] == month) & (history_df["active"] == True)
-    for idx in history_df[mask].index:
-        try: os.remove(history_df.at[idx, "saved_path"])
-        except: pass
-        history_df.at[idx, "active"] = False
-        history_df.at[idx, "superseded_by"] = attach_id
-    history_df = pd.concat([history_df, pd.DataFrame([{
-        "id": attach_id, "filename": name, "saved_path": path, "uploader": uploader,
-        "upload_dt": dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "reporting_month": month,
-        "rows_count": len(data_df), "source_url": source_url or "", "status": "success",
-        "message": "", "active": True, "superseded_by": "", "validation_status": "Valid"
-    }])], ignore_index=True)
-    pl_save_history(history_df)
-    data_df["Attachment ID"] = attach_id
-    combined_df = pl_load_combined_cached()
-    combined_df = pd.concat([combined_df, data_df], ignore_index=True)
-    pl_save_combined(combined_df)
-    invalidate_data_caches()  # ensure next UI run fetches fresh files
-    return True, f"Uploaded and processed for month {month}.", data_df.head(20)
+        return future.result()
+    except BrokenProcessPool:  # every future of a broken pool fails this way; the next batch starts a new pool
+        get_parse_pool.clear()
+        return parse_upload_file(file_bytes, REQUIRED_COLS, EXCEL_READER_ENGINE)
+
+class IngestQueue:
+    """
+    Uploads submitted as jobs and processed by a background worker, so the admin's session stays
+    responsive. A job moves queued -> parsing -> writing -> done / failed; a failed job leaves
+    storage as it was (see _process_upload).
+    """
+
+    def __init__(self, max_workers=INGEST_WORKERS, keep=INGEST_JOBS_KEPT):
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()  # job id -> job dict, oldest first
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+
+    def submit(self, dataset, name, file_bytes, uploader, source_url=None, on_done=None) -> str:
+        """Queue one upload; `on_done(job)` is called on the worker with the finished job."""
+        job_id = self._new_job(dataset, name, uploader)
+        self._executor.submit(self._run, job_id, dataset, name, file_bytes, uploader, source_url, None, on_done)
+        return job_id
+
+    def submit_batch(self, uploads, uploader) -> list:
+        """
+        Queue several (dataset, name, file_bytes) uploads as one batch: all files are parsed in parallel
+        in the process pool, then committed one by one in the given order.
+        """
+        job_ids = [self._new_job(dataset, name, uploader) for dataset, name, _ in uploads]
+        self._executor.submit(self._run_batch, list(zip(job_ids, uploads)), uploader)
+        return job_ids
+
+    def _new_job(self, dataset, name, uploader) -> str:
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            "job": job_id, "dataset": dataset, "filename": name, "uploader": uploader, "state": "queued",
+            "message": "", "submitted": dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "finished": "", "preview": None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._trim()
+        return job_id
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _run_batch(self, items, uploader):
+        futures = []
+        for job_id, (dataset, name, file_bytes) in items:
+            self._update(job_id, state="parsing")
+            futures.append(None if is_large_upload(file_bytes) else parse_in_pool(file_bytes))
+        for (job_id, (dataset, name, file_bytes)), future in zip(items, futures):
+            self._run(job_id, dataset, name, file_bytes, uploader, None, future)
+
+    def _run(self, job_id, dataset, name, file_bytes, uploader, source_url, parsed=None, on_done=None):
+        try:
+            ok, msg, preview = _process_upload(
+                dataset, name, file_bytes, uploader, source_url,
+                on_state=lambda state: self._update(job_id, state=state),
+                parsed=parsed_result(parsed, file_bytes) if parsed is not None else None,
+            )
+        except Exception as e:
+            ok, msg, preview = False, f"Processing failed: {e}", None
+        self._update(
+            job_id, state="done" if ok else "failed", message=msg, preview=preview,
+            finished=dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        )
+        if on_done is not None:
+            on_done(self.job(job_id))
+
+    def _trim(self):
+        finished = [k for k, j in self._jobs.items() if j["state"] not in INGEST_ACTIVE_STATES]
+        for job_id in finished[:max(0, len(finished) - self.keep)]:
+            del self._jobs[job_id]
+
+    def job(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def jobs(self) -> list:
+        """Snapshot of the jobs, newest first."""
+        with self._lock:
+            return [dict(j) for j in reversed(self._jobs.values())]
+
+    def busy(self) -> bool:
+        with self._lock:
+            return any(j["state"] in INGEST_ACTIVE_STATES for j in self._jobs.values())
+
+@st.cache_resource(show_spinner=False)
+def get_ingest_queue() -> IngestQueue:
+    return IngestQueue()
+
+
+# -------------------------------------
+# Drop-folder ingestion
+# -------------------------------------
+DROP_UPLOADER = "drop-folder"
+
+def dropped_file_seen(digest) -> bool:
+    with closing(_meta_connect()) as conn:
+        return conn.execute("SELECT 1 FROM dropped_files WHERE sha256 = ?", (digest,)).fetchone() is not None
+
+def record_dropped_file(digest, name, dataset, job_id):
+    with closing(_meta_connect()) as conn, conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO dropped_files VALUES (?, ?, ?, ?, ?)",
+            (digest, name, dataset, job_id, dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+        )
+
+class DropFolderWatcher:
+    """
+    Polls a folder for .xlsx files and ingests them through the ingest queue like a manual upload,
+    then moves each one to processed/ or failed/ (with a .txt note saying why). Polling only lists the
+    folder and compares (size, mtime); a file is read once it is unchanged across two polls, so
+    half-copied files are left alone. Content already ingested from the folder is not loaded again.
+    """
+
+    def __init__(self, directory, queue: IngestQueue, interval=DROP_POLL_SECONDS):
+        self.directory = directory
+        self.interval = interval
+        self.queue = queue
+        self.processed_dir = os.path.join(directory, "processed")
+        self.failed_dir = os.path.join(directory, "failed")
+        self.last_poll = ""
+        self.last_error = ""  # why the latest poll failed, "" once one succeeds again
+        self._signatures = {}   # name -> (size, mtime_ns) at the previous poll
+        self._in_flight = set()  # names submitted and not yet moved away
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="drop-folder", daemon=True)
+
+    def start(self):
+        for d in (self.directory, self.processed_dir, self.failed_dir):
+            os.makedirs(d, exist_ok=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+                self.last_error = ""
+            except Exception as e:  # an unreadable share must not kill the watcher; try again next round
+                logging.getLogger(__name__).exception("drop folder %s: poll failed", self.directory)
+                self.last_error = f"{dt.datetime.now():%Y-%m-%d %H:%M:%S}: {e}"
+            self._stop.wait(self.interval)
+
+    def _candidates(self) -> dict:
+        found = {}
+        with os.scandir(self.directory) as entries:
+            for e in entries:
+                if e.is_file() and e.name.lower().endswith(".xlsx") and not e.name.startswith(("~$", ".")):
+                    info = e.stat()
+                    found[e.name] = (info.st_size, info.st_mtime_ns)
+        return found
+
+    def poll(self) -> list:
+        """One pass over the folder; returns the names handed to the ingest queue (or set aside)."""
+        current = self._candidates()
+        with self._lock:
+            ready = [n for n, sig in current.items() if self._signatures.get(n) == sig and n not in self._in_flight]
+            self._signatures = current
+            self._in_flight.update(ready)
+        self.last_poll = dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        for name in sorted(ready):
+            try:
+                self._ingest(name)
+            except Exception as e:  # locked or vanished file, metadata db unavailable: set it aside, go on
+                try:
+                    self._finish(name, self.failed_dir, f"Could not be read for ingestion: {e}")
+                except OSError:
+                    pass  # the file is gone or still locked; _finish has released the name either way
+        return ready
+
+    def _ingest(self, name):
+        path = os.path.join(self.directory, name)
+        dataset = detect_dataset(name)
+        if dataset is None:
+            self._finish(name, self.failed_dir, "Filename does not include 'Associate', 'Business Analyst', "
+                                                "'Process Expert', 'Team Lead' or 'Project Lead'.")
+            return
+        with open(path, "rb") as f:
+            file_bytes = f.read()
+        digest = upload_digest(file_bytes)
+        if dropped_file_seen(digest):
+            self._finish(name, self.processed_dir, "Already ingested (same content); skipped.")
+            return
+
+        def on_done(job):
+            if job["state"] == "done":
+                record_dropped_file(digest, name, dataset, job["job"])
+                self._finish(name, self.processed_dir)
+            else:
+                self._finish(name, self.failed_dir, job["message"])
+        self.queue.submit(dataset, name, file_bytes, DROP_UPLOADER, source_url=path, on_done=on_done)
+
+    def _finish(self, name, target_dir, note=None):
+        stamped = f"{dt.datetime.now().strftime('%Y%m%d-%H%M%S')}_{name}"
+        try:
+            os.replace(os.path.join(self.directory, name), os.path.join(target_dir, stamped))
+            if note:
+                with open(os.path.join(target_dir, stamped + ".txt"), "w", encoding="utf-8") as f:
+                    f.write(note + "\n")
+        finally:
+            with self._lock:
+                self._in_flight.discard(name)
+                self._signatures.pop(name, None)
+
+@st.cache_resource(show_spinner=False)
+def get_drop_watcher():
+    """The process-wide watcher on DROP_DIR, started on first use; None when DROP_FOLDER is not set."""
+    if not DROP_DIR:
+        return None
+    return DropFolderWatcher(DROP_DIR, get_ingest_queue()).start()
 
 
 
 # -------------------------------------
 # Filtering & Search (shared helpers)
 # -------------------------------------
-def filter_combined(df, d_ids, funcs, f_leads, t_leads, months=None):
+def _dimension_options(df: pd.DataFrame, col: str) -> list:
+    """Sorted distinct text values of a column (for multiselects); categoricals answer from their codes."""
+    if col not in df.columns:
+        return []
+    s = df[col]
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        codes = np.unique(s.cat.codes.to_numpy())
+        return sorted(s.cat.categories[codes[codes >= 0]].astype(str))
+    return sorted(s.dropna().astype(str).unique())
+
+def _get_frame_index(cls, dataset, frame: pd.DataFrame, view="combined"):
+    """
+    The `cls` index of `frame`, the shared `view` frame of `dataset` (_load_combined_cached or
+    _load_ytd_view_cached), built once per data version. A cached index over another frame (the view
+    was reloaded in between, or another session's build is still in flight) is rebuilt for this one.
+    """
+    key, version = (cls.cache_key, dataset, view), _view_version(dataset, view)
+    index = get_data_cache().get(key, version, lambda: cls(frame))
+    return index if index.indexes(frame) else get_data_cache().put(key, version, cls(frame))
+
+def get_filter_index(dataset, frame: pd.DataFrame, view="combined") -> FilterIndex:
+    return _get_frame_index(FilterIndex, dataset, frame, view)
+
+def get_search_index(dataset, frame: pd.DataFrame, view="combined") -> SearchIndex:
+    return _get_frame_index(SearchIndex, dataset, frame, view)
+
+def active_rows(combined: pd.DataFrame, active_ids: pd.DataFrame) -> pd.DataFrame:
+    """
+    `combined.merge(active_ids, on="Attachment ID", how="inner")` (rows of active attachments with their
+    reporting_month), keeping combined's row labels so a FilterIndex of it still applies.
+    """
+    months = active_ids.set_index("Attachment ID")["reporting_month"]
+    rows = combined[isin_text(combined["Attachment ID"], months.index)]
+    return rows.assign(reporting_month=rows["Attachment ID"].astype(str).map(months))
+
+def filter_combined(df, d_ids, funcs, f_leads, t_leads, months=None, index=None):
+    """
+    Rows of `df` matching every non-empty selection. `index` is the FilterIndex of the shared frame that
+    `df`'s rows were taken from (row labels kept); the selection is then answered from it.
+    """
+    selected = {"Domain ID": d_ids, "Function": funcs, "Function Lead": f_leads, "Team Lead": t_leads, MONTH_KEY: months}
+    selected = {c: v for c, v in selected.items() if v and (c in df.columns or c == MONTH_KEY)}
+    if index is not None and all(c in index.columns for c in selected):
+        if not selected:
+            return df
+        masks = [index.mask(c, v) for c, v in selected.items()]
+        return df[np.logical_and.reduce(masks)[index.positions(df.index)]]
     if d_ids and "Domain ID" in df.columns:
-        df = df[df["Domain ID"].astype(str).isin(d_ids)]
+        df = df[isin_text(df["Domain ID"], d_ids)]
     if funcs and "Function" in df.columns:
-        df = df[df["Function"].astype(str).isin(funcs)]
+        df = df[isin_text(df["Function"], funcs)]
     if f_leads and "Function Lead" in df.columns:
-        df = df[df["Function Lead"].astype(str).isin(f_leads)]
+        df = df[isin_text(df["Function Lead"], f_leads)]
     if t_leads and "Team Lead" in df.columns:
-        df = df[df["Team Lead"].astype(str).isin(t_leads)]
+        df = df[isin_text(df["Team Lead"], t_leads)]
     if months:
         m = _to_month_str_series(df)
         if not m.empty:
-            df = df[m.isin(months)]
+            df = df[isin_text(m, months)]
     return df
 
-def apply_search(df, q):
+def apply_search(df, q, index=None):
+    """
+    Rows of `df` where any text column contains `q` (case-insensitive, plain text). `index` is the
+    SearchIndex of the shared frame `df`'s rows were taken from (row labels kept); without it `df`
+    is indexed on the spot.
+    """
     q = q.strip()
     if not q:
         return df
-    mask = pd.Series(False, index=df.index)
-    for col in df.columns:
-        try:
-            mask = df[col].astype(str).str.contains(q, case=False, na=False)
-        except Exception:
-            continue
-    return df[mask]
+    if index is None:
+        return df[SearchIndex(df).mask(q, df.columns)]
+    return df[index.mask(q, df.columns)[index.positions(df.index)]]
 
 
 
@@ -1473,32 +2535,27 @@ def apply_final_score_band_filter(df: pd.DataFrame, band: str) -> pd.DataFrame:
       - '< 90'
       - 'All' (no filter)
 
-    Works with both % strings and numeric columns by using Final Score_num.
+    'Final Score' is stored as percentage points (97.5 for 97.5%).
     """
     if df is None or df.empty or not band or band == "All":
         return df
 
-    tmp = df.copy()
-
-    # Ensure numeric companion column exists
-    if "Final Score_num" not in tmp.columns:
-        tmp = add_numeric_percent_columns(tmp)
-
-    if "Final Score_num" not in tmp.columns:
-        # Gracefully skip if still unavailable
+    if "Final Score" not in df.columns:
+        # Gracefully skip if unavailable
         return df
+    score = pd.to_numeric(df["Final Score"], errors="coerce")
 
     if band == ">= 100":
-        mask = tmp["Final Score_num"] >= 100
+        mask = score >= 100
     elif band == "Between 90 and 99.99":
-        mask = (tmp["Final Score_num"] >= 90) & (tmp["Final Score_num"] < 100)
+        mask = (score >= 90) & (score < 100)
     elif band == "< 90":
-        mask = tmp["Final Score_num"] < 90
+        mask = score < 90
     else:
         # Unknown value -> no-op
         return df
 
-    return tmp[mask]
+    return df[mask]
 
 
 
@@ -1690,61 +2747,64 @@ def get_latest_monthly_data():
     active = h[active_mask]
     if active.empty:
         return None, None, None
-    latest_row = active.sort_values("upload_dt", ascending=False).iloc[0]
+    latest_row = active.sort_values(["upload_dt", "reporting_month"], ascending=False).iloc[0]
     latest_id = latest_row["id"]
-    combined_df = load_combined()
-    latest_data = combined_df[combined_df["Attachment ID"] == latest_id]
+    latest_data = COMBINED_STORES["Associates"].load_partition(latest_id)
     return latest_row, latest_id, latest_data
 
 # Helper to fetch latest active monthly data (BA)
-def ba_get_latest_monthly_data():
+def ba_get_latest_monthly_data(combined_df=None):
     h = ba_load_history_cached()
     active_mask = _coerce_active_bool(h.get("active", pd.Series([], dtype="object")))
     active = h[active_mask]
     if active.empty:
         return None, None, None
-    latest_row = active.sort_values("upload_dt", ascending=False).iloc[0]
+    latest_row = active.sort_values(["upload_dt", "reporting_month"], ascending=False).iloc[0]
     latest_id = latest_row["id"]
-    combined_df = ba_load_combined_cached()
+    # rows of the shared frame (labels kept), so its FilterIndex answers the page's filters
+    combined_df = ba_load_combined_cached() if combined_df is None else combined_df
     latest_data = combined_df[combined_df["Attachment ID"] == latest_id]
     return latest_row, latest_id, latest_data
 
 # Helper to fetch latest active monthly data (PE)
-def pe_get_latest_monthly_data():
+def pe_get_latest_monthly_data(combined_df=None):
     h = pe_load_history_cached()
     active_mask = _coerce_active_bool(h.get("active", pd.Series([], dtype="object")))
     active = h[active_mask]
     if active.empty:
         return None, None, None
-    latest_row = active.sort_values("upload_dt", ascending=False).iloc[0]
+    latest_row = active.sort_values(["upload_dt", "reporting_month"], ascending=False).iloc[0]
     latest_id = latest_row["id"]
-    combined_df = pe_load_combined_cached()
+    # rows of the shared frame (labels kept), so its FilterIndex answers the page's filters
+    combined_df = pe_load_combined_cached() if combined_df is None else combined_df
     latest_data = combined_df[combined_df["Attachment ID"] == latest_id]
     return latest_row, latest_id, latest_data
 
 # Helper to fetch latest active monthly data (TL)
-def tl_get_latest_monthly_data():
+def tl_get_latest_monthly_data(combined_df=None):
     h = tl_load_history_cached()
     active_mask = _coerce_active_bool(h.get("active", pd.Series([], dtype="object")))
     active = h[active_mask]
     if active.empty:
         return None, None, None
-    latest_row = active.sort_values("upload_dt", ascending=False).iloc[0]
+    latest_row = active.sort_values(["upload_dt", "reporting_month"], ascending=False).iloc[0]
     latest_id = latest_row["id"]
-    combined_df = tl_load_combined_cached()
+    # rows of the shared frame (labels kept), so its FilterIndex answers the page's filters
+    combined_df = tl_load_combined_cached() if combined_df is None else combined_df
     latest_data = combined_df[combined_df["Attachment ID"] == latest_id]
     return latest_row, latest_id, latest_data
 
 # Helper to fetch latest active monthly data (PL)
-def pl_get_latest_monthly_data():
+def pl_get_latest_monthly_data(combined_df=None):
     h = pl_load_history_cached()
     active_mask = _coerce_active_bool(h.get("active", pd.Series([], dtype="object")))
     active = h[active_mask]
     if active.empty:
         return None, None, None
-    latest_row = active.sort_values("upload_dt", ascending=False).iloc[0]
+    latest_row = active.sort_values(["upload_dt", "reporting_month"], ascending=False).iloc[0]
     latest_id = latest_row["id"]
-    combined_df = pl_load_combined_cached()
+    # rows of the shared frame (labels kept), so its FilterIndex answers the page's filters
+    combined_df = pl_load_combined_cached() if combined_df is None else combined_df
     latest_data = combined_df[combined_df["Attachment ID"] == latest_id]
     return latest_row, latest_id, latest_data
 
@@ -1784,16 +2844,19 @@ def enable_altair_theme():
     alt.themes.enable("scorecard_theme")
 
 def get_numeric_metric_options(df: pd.DataFrame):
-    return [c for c in df.columns if c.endswith("_num")]
+    return metric_columns(df)
+
+def metric_label(metric: str) -> str:
+    return f"{metric} (%)"
 
 def aggregate_df(df: pd.DataFrame, dim: str, metric: str, method: str = "mean"):
     if dim not in df.columns or metric not in df.columns:
         return pd.DataFrame(columns=[dim, metric])
     tmp = df.dropna(subset=[dim, metric]).copy()
     if method == "median":
-        out = tmp.groupby(dim, as_index=False)[metric].median()
+        out = tmp.groupby(dim, as_index=False, observed=True)[metric].median()
     else:
-        out = tmp.groupby(dim, as_index=False)[metric].mean()
+        out = tmp.groupby(dim, as_index=False, observed=True)[metric].mean()
     return out
 
 def add_rank_and_topN(agg: pd.DataFrame, dim: str, metric: str, top_n: int = 15, ascending: bool = False):
@@ -1811,10 +2874,10 @@ def bar_chart(agg: pd.DataFrame, dim: str, metric: str, title: str, palette: str
     elif palette in PALETTES and isinstance(PALETTES[palette], str):
         color_enc = alt.Color(f"{dim}:N", scale=alt.Scale(scheme=PALETTES[palette]), legend=alt.Legend(title=dim))
     base = alt.Chart(agg).mark_bar().encode(
-        x=alt.X(f"{metric}:Q", title=metric.replace("_num", " (%)")),
+        x=alt.X(f"{metric}:Q", title=metric_label(metric)),
         y=alt.Y(f"{dim}:N", sort="-x", title=dim),
         color=color_enc,
-        tooltip=[alt.Tooltip(f"{dim}:N", title=dim), alt.Tooltip(f"{metric}:Q", format=".1f", title=metric.replace("_num", " (%)"))]
+        tooltip=[alt.Tooltip(f"{dim}:N", title=dim), alt.Tooltip(f"{metric}:Q", format=".1f", title=metric_label(metric))]
     ).properties(title=title)
     if show_labels:
         text = alt.Chart(agg).mark_text(dx=4, color="#333", align="left").encode(
@@ -1830,9 +2893,9 @@ def histogram(df: pd.DataFrame, metric: str, bin_step: int = 5, title: str = "",
         return alt.Chart(pd.DataFrame())
     clean = df.dropna(subset=[metric])
     hist = alt.Chart(clean).mark_bar().encode(
-        x=alt.X(f"{metric}:Q", bin=alt.Bin(step=bin_step), title=metric.replace("_num", " (%)")),
+        x=alt.X(f"{metric}:Q", bin=alt.Bin(step=bin_step), title=metric_label(metric)),
         y=alt.Y("count():Q", title="Count"),
-        tooltip=[alt.Tooltip(f"{metric}:Q", title=metric.replace("_num", " (%)")), alt.Tooltip("count():Q", title="Count")]
+        tooltip=[alt.Tooltip(f"{metric}:Q", title=metric_label(metric)), alt.Tooltip("count():Q", title="Count")]
     ).properties(title=title)
     ref_val = None
     if reference == "median":
@@ -1852,7 +2915,7 @@ def boxplot(df: pd.DataFrame, dim: str, metric: str, title: str):
         return alt.Chart(pd.DataFrame())
     bp = alt.Chart(df.dropna(subset=[dim, metric])).mark_boxplot(size=22).encode(
         y=alt.Y(f"{dim}:N", title=dim, sort="-x"),
-        x=alt.X(f"{metric}:Q", title=metric.replace("_num", " (%)")),
+        x=alt.X(f"{metric}:Q", title=metric_label(metric)),
         tooltip=[dim, metric]
     ).properties(title=title)
     return bp
@@ -1861,11 +2924,11 @@ def heatmap(df: pd.DataFrame, row_dim: str, col_dim: str, metric: str, title: st
     need = [row_dim, col_dim, metric]
     if any(col not in df.columns for col in need):
         return alt.Chart(pd.DataFrame())
-    agg = df.dropna(subset=need).groupby([row_dim, col_dim], as_index=False)[metric].mean()
+    agg = df.dropna(subset=need).groupby([row_dim, col_dim], as_index=False, observed=True)[metric].mean()
     hm = alt.Chart(agg).mark_rect().encode(
         y=alt.Y(f"{row_dim}:N", title=row_dim, sort="ascending"),
         x=alt.X(f"{col_dim}:N", title=col_dim, sort="ascending"),
-        color=alt.Color(f"{metric}:Q", title=metric.replace("_num", " (%)"), scale=alt.Scale(scheme="blues")),
+        color=alt.Color(f"{metric}:Q", title=metric_label(metric), scale=alt.Scale(scheme="blues")),
         tooltip=[row_dim, col_dim, alt.Tooltip(metric, format=".1f")]
     ).properties(title=title)
     return hm
@@ -1873,10 +2936,10 @@ def heatmap(df: pd.DataFrame, row_dim: str, col_dim: str, metric: str, title: st
 def line_trend(df: pd.DataFrame, metric: str, month_col: str = "reporting_month", title: str = "Trend by Month"):
     if metric not in df.columns or month_col not in df.columns:
         return alt.Chart(pd.DataFrame())
-    agg = df.dropna(subset=[month_col, metric]).groupby(month_col, as_index=False)[metric].mean()
+    agg = df.dropna(subset=[month_col, metric]).groupby(month_col, as_index=False, observed=True)[metric].mean()
     ln = alt.Chart(agg).mark_line(point=True).encode(
         x=alt.X(f"{month_col}:N", title="Month"),
-        y=alt.Y(f"{metric}:Q", title=metric.replace("_num", " (%)")),
+        y=alt.Y(f"{metric}:Q", title=metric_label(metric)),
         tooltip=[month_col, alt.Tooltip(metric, format=".1f")]
     ).properties(title=title)
     return ln
@@ -1891,23 +2954,20 @@ def ytd_aggregated_table(ytd_df: pd.DataFrame, group_by: str = "Name") -> pd.Dat
     """
     if ytd_df is None or ytd_df.empty:
         return pd.DataFrame(columns=["Domain ID","Function","Function Lead","Team Lead","Designation","Name","Final Score","Rank"])
-    df = ytd_df.copy()
-    if "Final Score_num" not in df.columns and "Final Score" in df.columns:
-        s = df["Final Score"].astype(str).str.replace('%','', regex=False).str.replace(',', '.', regex=False)
-        df["Final Score_num"] = pd.to_numeric(s, errors='coerce')
-    if "Final Score_num" not in df.columns:
+    if "Final Score" not in ytd_df.columns:
         return pd.DataFrame(columns=["Domain ID","Function","Function Lead","Team Lead","Designation","Name","Final Score","Rank"])
+    df = ytd_df.assign(**{"Final Score": pd.to_numeric(ytd_df["Final Score"], errors="coerce")})
     cols_lower = df.columns.str.lower().tolist()
     def has(col): return col.lower() in cols_lower
     group_key = group_by if has(group_by) else ("Domain ID" if has("Domain ID") else None)
     if group_key is None:
         return pd.DataFrame(columns=["Domain ID","Function","Function Lead","Team Lead","Designation","Name","Final Score","Rank"])
-    agg_dict = {"Final Score_num": "mean"}
+    agg_dict = {"Final Score": "mean"}
     for c in ["Domain ID","Function","Function Lead","Team Lead","Designation","Name"]:
         if has(c):
             agg_dict[c] = lambda x: x.dropna().iloc[0] if x.dropna().size else None
-    grouped = df.groupby(group_key, as_index=False).agg(agg_dict)
-    grouped["Final Score"] = grouped["Final Score_num"].round(1)
+    grouped = df.groupby(group_key, as_index=False, observed=True).agg(agg_dict)
+    grouped["Final Score"] = grouped["Final Score"].round(1)
     rank_series = grouped["Final Score"].rank(method="dense", ascending=False)
     grouped["Rank"] = rank_series.astype("Int64")
     desired_cols = ["Domain ID","Function","Function Lead","Team Lead","Designation","Name","Final Score","Rank"]
@@ -1917,6 +2977,45 @@ def ytd_aggregated_table(ytd_df: pd.DataFrame, group_by: str = "Name") -> pd.Dat
         result = result.sort_values(["Rank","Final Score"], ascending=[True, False])
     return result
 
+def filtered_ytd_table(dataset, view, rows, every_column=False) -> pd.DataFrame:
+    """
+    The rows of a YTD page's filtered table: as the page's `view` holds them (summary columns only), or
+    with every stored column. The metric columns are then read for those rows once per data version and
+    row set and kept in the data cache, so reruns that leave the filters alone read nothing.
+    """
+    if not every_column:
+        return rows
+    key = ("ytd_table", dataset)
+    version = (_view_version(dataset, "ytd"), hashlib.sha256(rows.index.to_numpy().tobytes()).hexdigest())
+    table = get_data_cache().get(key, version, lambda: load_view_columns(dataset, view, rows))
+    # a concurrent load of another row set hands back that one; read ours instead
+    return table if table.index.equals(rows.index) else get_data_cache().put(
+        key, version, load_view_columns(dataset, view, rows)
+    )
+
+def render_filtered_ytd_table(dataset, view, ytd, ytd_filtered, title, export_prefix):
+    """
+    A YTD page's filtered table: the filtered rows with the columns the page's `view` holds, every
+    stored column when asked for, and their download (always with every column), built when asked for.
+    """
+    st.subheader(title)
+    every_column = st.checkbox("Show every metric column", value=False, key=f"ytd_every_column_{dataset}")
+    table = filtered_ytd_table(dataset, view, ytd_filtered, every_column)
+    table = clean_dataframe_for_display(table, st.session_state.hide_cols)
+    st.caption(f"Showing {len(table)} of {len(ytd)} rows"
+               + ("" if every_column else "; metric columns other than Final Score are read when ticked above"))
+    st.dataframe(format_percent_columns(table), height=480)
+    if st.button("Prepare filtered (YTD) download"):
+        full = clean_dataframe_for_display(filtered_ytd_table(dataset, view, ytd_filtered, True),
+                                           st.session_state.hide_cols)
+        if exceeds_excel_limits(full):
+            st.caption("Note: Filtered result is too wide for Excel; download provided as CSV.")
+        st.download_button(
+            "⬇️ Download filtered (YTD)",
+            make_excel_bytes_from_df(format_percent_columns(full), st.session_state.hide_cols),
+            file_name=f"{export_prefix}ytd_dashboard_filtered.xlsx"
+        )
+
 # -------------------------------------
 # Streamlit UI
 # -------------------------------------
@@ -1926,6 +3025,7 @@ ensure_storage_ba()  # existing
 ensure_storage_pe()  # NEW
 ensure_storage_tl()  # New
 ensure_storage_pl()  # New
+get_drop_watcher()
 
 
 # Session state
@@ -1952,6 +3052,34 @@ def login_block():
         else:
             st.sidebar.error("Invalid credentials")
 
+INGEST_JOB_COLUMNS = ["job", "dataset", "filename", "uploader", "state", "message", "submitted", "finished"]
+
+def ingest_jobs_panel():
+    """Upload jobs; polls while any are in flight (st.fragment where available), then reruns the page once."""
+    busy = get_ingest_queue().busy()
+    fragment = getattr(st, "fragment", None)
+    if fragment is None:
+        _ingest_jobs_table(busy)
+        if busy: st.button("Refresh job status")
+        return
+    fragment(run_every=INGEST_POLL_SECONDS if busy else None)(_ingest_jobs_table)(busy)
+
+def _ingest_jobs_table(was_busy):
+    queue = get_ingest_queue()
+    if was_busy and not queue.busy():
+        st.rerun()  # new data landed: refresh the whole page (attachment lists, caches) and stop polling
+    jobs = queue.jobs()
+    if not jobs:
+        return
+    st.subheader("Upload Jobs")
+    st.dataframe(pd.DataFrame(jobs)[INGEST_JOB_COLUMNS], hide_index=True, use_container_width=True)
+    mine = queue.job(st.session_state.get("ingest_job"))
+    if mine and mine["state"] == "done":
+        st.success(f"{mine['filename']}: {mine['message']}")
+        st.dataframe(clean_dataframe_for_display(format_percent_columns(mine["preview"]), st.session_state.hide_cols))
+    elif mine and mine["state"] == "failed":
+        st.error(f"{mine['filename']}: {mine['message']}")
+
 if not st.session_state.authenticated:
     login_block()
     st.stop()
@@ -1993,7 +3121,7 @@ if page == "Associates Scorecard (Monthly/YTD metrics)":
         if active.empty:
             latest_row, latest_id, latest_data = None, None, None
         else:
-            latest_row = active.sort_values("upload_dt", ascending=False).iloc[0]
+            latest_row = active.sort_values(["upload_dt", "reporting_month"], ascending=False).iloc[0]
             latest_id = latest_row["id"]
             combined_df = load_combined_cached()
             latest_data = combined_df[combined_df["Attachment ID"] == latest_id]
@@ -2002,7 +3130,6 @@ if page == "Associates Scorecard (Monthly/YTD metrics)":
             st.warning("No active file available.")
         else:
             latest_data = clean_dataframe_for_display(latest_data, st.session_state.hide_cols)
-            latest_data = add_numeric_cached(latest_data)
 
 
             def render_shared_filters(df, label="Filters (Monthly)"):
@@ -2010,11 +3137,11 @@ if page == "Associates Scorecard (Monthly/YTD metrics)":
                 month_options = sorted([m for m in month_str.dropna().unique() if m and str(m).strip() != ""])
                 with st.expander(label, expanded=True):
                     c1, c2, c3, c4, c5, c6 = st.columns(6)
-                    domain_options = sorted(df["Domain ID"].dropna().astype(str).unique()) if "Domain ID" in df.columns else []
-                    func_options = sorted(df["Function"].dropna().astype(str).unique()) if "Function" in df.columns else []
-                    flead_options = sorted(df["Function Lead"].dropna().astype(str).unique()) if "Function Lead" in df.columns else []
-                    tlead_options = sorted(df["Team Lead"].dropna().astype(str).unique()) if "Team Lead" in df.columns else []
-                    d_ids = c1.multiselect("Domain ID (select one to comment)", domain_options)
+                    domain_options = _dimension_options(df, "Domain ID")
+                    func_options = _dimension_options(df, "Function")
+                    flead_options = _dimension_options(df, "Function Lead")
+                    tlead_options = _dimension_options(df, "Team Lead")
+                    d_ids = c1.multiselect("Domain ID (select to comment)", domain_options)
                     funcs = c2.multiselect("Function", func_options)
                     f_leads = c3.multiselect("Function Lead", flead_options)
                     t_leads = c4.multiselect("Team Lead", tlead_options)
@@ -2022,37 +3149,7 @@ if page == "Associates Scorecard (Monthly/YTD metrics)":
                     final_score_band = c5.selectbox("Final score",options=["All", ">= 100", "Between 90 and 99.99", "< 90"],index=0 )
                     months = c6.multiselect("Month (YYYY-MM)", month_options)
 
-                    # Feedback entry when exactly one Domain ID and one Month
-                    if d_ids and len(d_ids) == 1 and months and len(months) == 1:
-                        sel_domain = str(d_ids[0])
-                        sel_month = str(months[0])
-                        st.markdown("**Monthly feedback/feedforward** (max 500 characters)")
-                        fb = load_feedback()
-                        existing = fb[(fb["Domain ID"].astype(str) == sel_domain) & (fb["Month"].astype(str) == sel_month)]
-                        existing_text = existing.iloc[0]["Feedback"] if not existing.empty else ""
-                        comment = st.text_area(
-                            "Enter feedback for the selected Domain ID & Month",
-                            value=str(existing_text),
-                            max_chars=MAX_FEEDBACK_CHARS,
-                            height=120
-                        )
-                        password = st.text_input("Enter Team Lead password to confirm", type="password")
-                        if st.button("Submit Comment"):
-                            if password == FEEDBACK_PASSWORD:
-                                sel_df = df[df["Domain ID"].astype(str) == sel_domain]
-                                if not sel_df.empty:
-                                    name_val = sel_df.iloc[0]["Name"] if "Name" in sel_df.columns else sel_domain
-                                    tl_val = sel_df.iloc[0]["Team Lead"] if "Team Lead" in sel_df.columns else ""
-                                    if comment and comment.strip():
-                                        upsert_feedback(sel_domain, str(name_val), sel_month, str(tl_val),
-                                                        comment.strip(), st.session_state.username or "user")
-                                        st.success("Feedback saved.")
-                                    else:
-                                        st.warning("Please enter a feedback comment before submitting.")
-                                else:
-                                    st.error("Selected Domain ID not found in current dataset.")
-                            else:
-                                st.error("Incorrect password. Feedback not saved.")
+                    render_feedback_entry("Associates", df, d_ids, months)
                 return d_ids, funcs, f_leads, t_leads, months, final_score_band, None
 
             # Below 2 lines of code are the older ones.
@@ -2061,7 +3158,8 @@ if page == "Associates Scorecard (Monthly/YTD metrics)":
 
             
             d_ids, funcs, f_leads, t_leads, months, fs_band, _ = render_shared_filters(latest_data)
-            filtered = filter_combined(latest_data, d_ids, funcs, f_leads, t_leads, months)
+            filtered = filter_combined(latest_data, d_ids, funcs, f_leads, t_leads, months,
+                                       index=get_filter_index("Associates", combined_df))
             # 👉 Apply Final score band filter
             filtered = apply_final_score_band_filter(filtered, fs_band)
             filtered = clean_dataframe_for_display(filtered, st.session_state.hide_cols)
@@ -2085,9 +3183,9 @@ if page == "Associates Scorecard (Monthly/YTD metrics)":
             st.caption(f"Showing {len(mon_metrics)} monthly rows (from filtered view)")
             
             # 👉 Styled display (Associates Monthly only)
-            mon_metrics_styled = style_associates_metrics_df(mon_metrics)
+            mon_metrics_styled = style_associates_metrics_df(format_percent_columns(mon_metrics))
             # Before (less reliable for Styler colors)
-            # st.dataframe(mon_metrics, height=420)
+            # st.dataframe(format_percent_columns(mon_metrics), height=420)
 
             st.table(mon_metrics_styled)
             
@@ -2102,11 +3200,11 @@ if page == "Associates Scorecard (Monthly/YTD metrics)":
 
 
             # Simple charts
-            if "Function" in filtered.columns and "Final Score_num" in filtered.columns:
+            if "Function" in filtered.columns and "Final Score" in filtered.columns:
                 final_func = (
-                    filtered.dropna(subset=["Final Score_num", "Function"])
-                            .groupby("Function", as_index=False)["Final Score_num"].mean()
-                            .rename(columns={"Final Score_num":"Avg Final Score (%)"})
+                    filtered.dropna(subset=["Final Score", "Function"])
+                            .groupby("Function", as_index=False, observed=True)["Final Score"].mean()
+                            .rename(columns={"Final Score":"Avg Final Score (%)"})
                 )
                 sel_func = alt.selection_multi(fields=["Function"], bind="legend")
                 chart_a = alt.Chart(final_func).mark_bar().encode(
@@ -2119,14 +3217,14 @@ if page == "Associates Scorecard (Monthly/YTD metrics)":
             else:
                 st.info("Final Score or Function column not found—'Avg Final Score by Function' chart skipped.")
 
-            if "Final Score_num" in filtered.columns:
+            if "Final Score" in filtered.columns:
                 st.altair_chart(
-                    alt.Chart(filtered.dropna(subset=["Final Score_num"]))
+                    alt.Chart(filtered.dropna(subset=["Final Score"]))
                       .mark_bar()
                       .encode(
-                          x=alt.X("Final Score_num:Q", bin=alt.Bin(step=5), title="Final Score (%)"),
+                          x=alt.X("Final Score:Q", bin=alt.Bin(step=5), title="Final Score (%)"),
                           y=alt.Y("count():Q", title="Count"),
-                          tooltip=[alt.Tooltip("Final Score_num:Q", title="Final Score (%)"), alt.Tooltip("count():Q", title="Count")]
+                          tooltip=[alt.Tooltip("Final Score:Q", title="Final Score (%)"), alt.Tooltip("count():Q", title="Count")]
                       ).properties(title="Final Score Distribution (Monthly, 5% bins)"),
                     use_container_width=True
                 )
@@ -2138,8 +3236,8 @@ if page == "Associates Scorecard (Monthly/YTD metrics)":
                 else:
                     cset1, cset2, cset3, cset4 = st.columns([2,2,2,2])
                     metric_options = get_numeric_metric_options(filtered)
-                    default_metric_list = metric_options if metric_options else ["Final Score_num"]
-                    default_index = default_metric_list.index("Final Score_num") if "Final Score_num" in default_metric_list else 0
+                    default_metric_list = metric_options if metric_options else ["Final Score"]
+                    default_index = default_metric_list.index("Final Score") if "Final Score" in default_metric_list else 0
                     sel_metric = cset1.selectbox("Metric (numeric %)", options=default_metric_list, index=default_index)
                     agg_method = cset2.radio("Aggregation", ["mean", "median"], index=0)
                     dim_candidates = [c for c in ["Function","Team Lead","Function Lead","Domain ID"] if c in filtered.columns]
@@ -2154,7 +3252,7 @@ if page == "Associates Scorecard (Monthly/YTD metrics)":
                     agg_df = add_rank_and_topN(agg_df, dim=dim, metric=sel_metric, top_n=top_n, ascending=ascending)
                     st.altair_chart(
                         bar_chart(agg_df, dim=dim, metric=sel_metric,
-                                  title=f"{agg_method.title()} {sel_metric.replace('_num',' (%)')} by {dim} (Monthly)",
+                                  title=f"{agg_method.title()} {metric_label(sel_metric)} by {dim} (Monthly)",
                                   palette=palette, show_labels=show_labels),
                         use_container_width=True
                     )
@@ -2164,7 +3262,7 @@ if page == "Associates Scorecard (Monthly/YTD metrics)":
                     ref = cH2.radio("Reference line", ["mean", "median"], index=0)
                     st.altair_chart(
                         histogram(filtered, metric=sel_metric, bin_step=bin_step,
-                                  title=f"Distribution of {sel_metric.replace('_num',' (%)')} (Monthly)",
+                                  title=f"Distribution of {metric_label(sel_metric)} (Monthly)",
                                   reference=ref),
                         use_container_width=True
                     )
@@ -2183,10 +3281,9 @@ if page == "Associates Scorecard (Monthly/YTD metrics)":
                         monthly_all = load_combined_cached()
                         monthly_active = monthly_all.merge(active_ids, on="Attachment ID", how="inner")
                         monthly_active["reporting_month"] = monthly_active["reporting_month"].astype(str)
-                        monthly_active = add_numeric_percent_columns(monthly_active)
                         st.altair_chart(
                             line_trend(monthly_active, metric=sel_metric, month_col="reporting_month",
-                                       title=f"Trend by Month (active attachments): {sel_metric.replace('_num',' (%)')}"),
+                                       title=f"Trend by Month (active attachments): {metric_label(sel_metric)}"),
                             use_container_width=True
                         )
                     except Exception:
@@ -2194,35 +3291,30 @@ if page == "Associates Scorecard (Monthly/YTD metrics)":
 
             st.subheader("Filtered Table (latest active file)")
             st.caption(f"Showing {len(filtered)} of {len(latest_data)} rows")
-            st.dataframe(filtered if not filtered.empty else pd.DataFrame(), height=480)
+            st.dataframe(format_percent_columns(filtered) if not filtered.empty else pd.DataFrame(), height=480)
             if exceeds_excel_limits(filtered):
                 st.caption("Note: Filtered result is too wide for Excel; download provided as CSV.")
             st.download_button(
                 "⬇️ Download filtered (Monthly)",
-                make_excel_bytes_from_df(filtered, st.session_state.hide_cols),
+                make_excel_bytes_from_df(format_percent_columns(filtered), st.session_state.hide_cols),
                 file_name=f"{EXPORT_PREFIX}monthly_scorecard_filtered.xlsx"
             )
 
             if st.session_state.role == "admin":
                 st.subheader("🛠 Admin — Edit Latest Active Data")
                 st.caption("Edit values directly. Saving replaces the data for the latest active attachment in combined storage (not the original Excel file).")
-                editable = st.data_editor(latest_data.copy(), num_rows="dynamic", use_container_width=True)
+                editable = st.data_editor(editable_frame(latest_data), num_rows="dynamic", use_container_width=True)
                 if st.button("Save Admin Changes", type="primary"):
                     try:
                         edited = editable.copy()
-                        edited = convert_percentage_columns(edited)
-                        edited = add_numeric_percent_columns(edited)
+                        edited = type_percent_columns(edited)
                         edited["Attachment ID"] = latest_id
-                        combined_df = load_combined()
-                        combined_df = combined_df[combined_df["Attachment ID"] != latest_id]
-                        combined_df = pd.concat([combined_df, edited], ignore_index=True)
-                        save_combined(combined_df)
+                        COMBINED_STORES["Associates"].write_partition(latest_id, edited)
                         log_audit("Admin Save Edit",
                                   latest_id,
                                   latest_row["filename"] if "filename" in latest_row else "",
                                   st.session_state.username or "admin")
                         st.success("Admin changes saved to combined storage.")
-                        invalidate_data_caches()  # ensure next UI run fetches fresh files
                     except Exception as e:
                         st.error(f"Failed to save admin changes: {e}")
 
@@ -2234,13 +3326,12 @@ if page == "Associates Scorecard (Monthly/YTD metrics)":
         active_mask = _coerce_active_bool(history.get("active", pd.Series([], dtype="object")))
         active_ids = history[active_mask][["id","reporting_month"]].rename(columns={"id":"Attachment ID"})
         ### monthly_all = load_combined() below is the new  line of code
-        monthly_all = load_combined_cached()
-        ytd = monthly_all.merge(active_ids, on="Attachment ID", how="inner")
+        monthly_all = load_ytd_view_cached()  # active attachments, metrics read on demand
+        ytd = active_rows(monthly_all, active_ids)
         if ytd.empty:
             st.warning("No YTD data.")
             st.stop()
         ytd = clean_dataframe_for_display(ytd, st.session_state.hide_cols)
-        ytd = add_numeric_cached(ytd)
 
         def render_ytd_filters(df, label="Filters (YTD)"):
             month_str = _to_month_str_series(df)
@@ -2255,10 +3346,10 @@ if page == "Associates Scorecard (Monthly/YTD metrics)":
                 return f"FY{fy_start}-{str(fy_end)[-2:]}"
             with st.expander(label, expanded=True):
                 c1, c2, c3, c4, c5, c6 = st.columns(6)
-                domain_options = sorted(df["Domain ID"].dropna().astype(str).unique()) if "Domain ID" in df.columns else []
-                func_options = sorted(df["Function"].dropna().astype(str).unique()) if "Function" in df.columns else []
-                flead_options = sorted(df["Function Lead"].dropna().astype(str).unique()) if "Function Lead" in df.columns else []
-                tlead_options = sorted(df["Team Lead"].dropna().astype(str).unique()) if "Team Lead" in df.columns else []
+                domain_options = _dimension_options(df, "Domain ID")
+                func_options = _dimension_options(df, "Function")
+                flead_options = _dimension_options(df, "Function Lead")
+                tlead_options = _dimension_options(df, "Team Lead")
                 d_ids = c1.multiselect("Domain ID", domain_options)
                 funcs = c2.multiselect("Function", func_options)
                 f_leads = c3.multiselect("Function Lead", flead_options)
@@ -2285,10 +3376,12 @@ if page == "Associates Scorecard (Monthly/YTD metrics)":
         #Now:
         d_ids, funcs, f_leads, t_leads, months, fs_band = render_ytd_filters(ytd)
         search = st.text_input("🔎 Search across all columns (YTD)")  # keep existing search UI
-        ytd_filtered = filter_combined(ytd, d_ids, funcs, f_leads, t_leads, months)
+        ytd_filtered = filter_combined(ytd, d_ids, funcs, f_leads, t_leads, months,
+                                       index=get_filter_index("Associates", monthly_all, view="ytd"))
         # 👉 Apply Final score band (same as Monthly approach)
         ytd_filtered = apply_final_score_band_filter(ytd_filtered, fs_band)
-        ytd_filtered = apply_search(ytd_filtered, search)
+        if search.strip():  # the index is built on the first search of a data version
+            ytd_filtered = apply_search(ytd_filtered, search, index=get_search_index("Associates", monthly_all, view="ytd"))
         ytd_filtered = clean_dataframe_for_display(ytd_filtered, st.session_state.hide_cols)
 
         c1, c2, c3 = st.columns(3)
@@ -2331,9 +3424,9 @@ if page == "Associates Scorecard (Monthly/YTD metrics)":
                 st.info("No YTD data under current filters for advanced visuals.")
             else:
                 cset1, cset2, cset3, cset4 = st.columns([2,2,2,2])
-                metric_options_ytd = get_numeric_metric_options(ytd_filtered)
-                default_metric_list_ytd = metric_options_ytd if metric_options_ytd else ["Final Score_num"]
-                default_index_ytd = default_metric_list_ytd.index("Final Score_num") if "Final Score_num" in default_metric_list_ytd else 0
+                metric_options_ytd = stored_metric_columns("Associates")
+                default_metric_list_ytd = metric_options_ytd if metric_options_ytd else ["Final Score"]
+                default_index_ytd = default_metric_list_ytd.index("Final Score") if "Final Score" in default_metric_list_ytd else 0
                 sel_metric_ytd = cset1.selectbox("Metric (numeric %)", options=default_metric_list_ytd, index=default_index_ytd)
                 agg_method_ytd = cset2.radio("Aggregation", ["mean", "median"], index=0)
                 dim_candidates_ytd = [c for c in ["Function","Team Lead","Function Lead","Domain ID"] if c in ytd_filtered.columns]
@@ -2343,12 +3436,13 @@ if page == "Associates Scorecard (Monthly/YTD metrics)":
                 top_n_ytd = cN1.slider("Top N", min_value=5, max_value=50, value=15, step=5)
                 ascending_ytd = cN2.checkbox("Show lowest first", value=False)
                 show_labels_ytd = cN3.checkbox("Bar labels", value=True)
+                ytd_charted = load_view_columns("Associates", monthly_all, ytd_filtered, [sel_metric_ytd])
 
-                agg_ytd = aggregate_df(ytd_filtered, dim=dim_ytd, metric=sel_metric_ytd, method=agg_method_ytd)
+                agg_ytd = aggregate_df(ytd_charted, dim=dim_ytd, metric=sel_metric_ytd, method=agg_method_ytd)
                 agg_ytd = add_rank_and_topN(agg_ytd, dim=dim_ytd, metric=sel_metric_ytd, top_n=top_n_ytd, ascending=ascending_ytd)
                 st.altair_chart(
                     bar_chart(agg_ytd, dim=dim_ytd, metric=sel_metric_ytd,
-                              title=f"{agg_method_ytd.title()} {sel_metric_ytd.replace('_num',' (%)')} by {dim_ytd} (YTD)",
+                              title=f"{agg_method_ytd.title()} {metric_label(sel_metric_ytd)} by {dim_ytd} (YTD)",
                               palette=palette_ytd, show_labels=show_labels_ytd),
                     use_container_width=True
                 )
@@ -2357,43 +3451,34 @@ if page == "Associates Scorecard (Monthly/YTD metrics)":
                 bin_step_ytd = cH1.slider("Histogram bin step (percentage points)", 1, 20, 5, 1)
                 ref_ytd = cH2.radio("Reference line", ["mean", "median"], index=0)
                 st.altair_chart(
-                    histogram(ytd_filtered, metric=sel_metric_ytd, bin_step=bin_step_ytd,
-                              title=f"Distribution of {sel_metric_ytd.replace('_num',' (%)')} (YTD)",
+                    histogram(ytd_charted, metric=sel_metric_ytd, bin_step=bin_step_ytd,
+                              title=f"Distribution of {metric_label(sel_metric_ytd)} (YTD)",
                               reference=ref_ytd),
                     use_container_width=True
                 )
 
                 st.altair_chart(
-                    boxplot(ytd_filtered, dim=dim_ytd, metric=sel_metric_ytd, title=f"Distribution by {dim_ytd} (YTD)"),
+                    boxplot(ytd_charted, dim=dim_ytd, metric=sel_metric_ytd, title=f"Distribution by {dim_ytd} (YTD)"),
                     use_container_width=True
                 )
 
                 if "Function" in ytd_filtered.columns and "Team Lead" in ytd_filtered.columns:
                     st.altair_chart(
-                        heatmap(ytd_filtered, row_dim="Function", col_dim="Team Lead", metric=sel_metric_ytd,
-                                title=f"Heatmap: {sel_metric_ytd.replace('_num',' (%)')} (Function x Team Lead) - YTD"),
+                        heatmap(ytd_charted, row_dim="Function", col_dim="Team Lead", metric=sel_metric_ytd,
+                                title=f"Heatmap: {metric_label(sel_metric_ytd)} (Function x Team Lead) - YTD"),
                         use_container_width=True
                     )
                 else:
-                    ytd_norm = ytd_filtered.copy()
+                    ytd_norm = ytd_charted.copy()
                     ytd_norm["Month_norm"] = _to_month_str_series(ytd_norm)
                     if "Function" in ytd_norm.columns and "Month_norm" in ytd_norm.columns:
                         st.altair_chart(
                             heatmap(ytd_norm, row_dim="Function", col_dim="Month_norm", metric=sel_metric_ytd,
-                                    title=f"Heatmap: {sel_metric_ytd.replace('_num',' (%)')} (Function x Month) - YTD"),
+                                    title=f"Heatmap: {metric_label(sel_metric_ytd)} (Function x Month) - YTD"),
                             use_container_width=True
                         )
 
-        st.subheader("Filtered YTD Table")
-        st.caption(f"Showing {len(ytd_filtered)} of {len(ytd)} rows")
-        st.dataframe(ytd_filtered, height=480)
-        if exceeds_excel_limits(ytd_filtered):
-            st.caption("Note: Filtered result is too wide for Excel; download provided as CSV.")
-        st.download_button(
-            "⬇️ Download filtered (YTD)",
-            make_excel_bytes_from_df(ytd_filtered, st.session_state.hide_cols),
-            file_name=f"{EXPORT_PREFIX}ytd_dashboard_filtered.xlsx"
-        )
+        render_filtered_ytd_table("Associates", monthly_all, ytd, ytd_filtered, "Filtered YTD Table", EXPORT_PREFIX)
 
 # -------------------------------------
 # New Page: BA Scorecard (Monthly/YTD metrics)
@@ -2403,62 +3488,34 @@ elif page == "BA Scorecard (Monthly/YTD metrics)":
     mode = st.radio("View mode", ["Monthly", "YTD"], index=0, horizontal=True)
 
     if mode == "Monthly":
-        latest_row, latest_id, latest_data = ba_get_latest_monthly_data()
+        combined_df = ba_load_combined_cached()
+        latest_row, latest_id, latest_data = ba_get_latest_monthly_data(combined_df)
         if latest_data is None or latest_data.empty:
             st.warning("No active BA file available.")
         else:
             latest_data = clean_dataframe_for_display(latest_data, st.session_state.hide_cols)
-            latest_data = add_numeric_cached(latest_data)
 
             def render_shared_filters_ba(df, label="Filters (Monthly)"):
                 month_str = _to_month_str_series(df)
                 month_options = sorted([m for m in month_str.dropna().unique() if m and str(m).strip() != ""])
                 with st.expander(label, expanded=True):
                     c1, c2, c3, c4, c5 = st.columns(5)
-                    domain_options = sorted(df["Domain ID"].dropna().astype(str).unique()) if "Domain ID" in df.columns else []
-                    func_options = sorted(df["Function"].dropna().astype(str).unique()) if "Function" in df.columns else []
-                    flead_options = sorted(df["Function Lead"].dropna().astype(str).unique()) if "Function Lead" in df.columns else []
-                    tlead_options = sorted(df["Team Lead"].dropna().astype(str).unique()) if "Team Lead" in df.columns else []
-                    d_ids = c1.multiselect("Domain ID (select one to comment)", domain_options)
+                    domain_options = _dimension_options(df, "Domain ID")
+                    func_options = _dimension_options(df, "Function")
+                    flead_options = _dimension_options(df, "Function Lead")
+                    tlead_options = _dimension_options(df, "Team Lead")
+                    d_ids = c1.multiselect("Domain ID (select to comment)", domain_options)
                     funcs = c2.multiselect("Function", func_options)
                     f_leads = c3.multiselect("Function Lead", flead_options)
                     t_leads = c4.multiselect("Team Lead", tlead_options)
                     months = c5.multiselect("Month (YYYY-MM)", month_options)
 
-                    if d_ids and len(d_ids) == 1 and months and len(months) == 1:
-                        sel_domain = str(d_ids[0])
-                        sel_month = str(months[0])
-                        st.markdown("**Monthly feedback/feedforward** (max 500 characters)")
-                        fb = ba_load_feedback()
-                        existing = fb[(fb["Domain ID"].astype(str) == sel_domain) & (fb["Month"].astype(str) == sel_month)]
-                        existing_text = existing.iloc[0]["Feedback"] if not existing.empty else ""
-                        comment = st.text_area(
-                            "Enter feedback for the selected Domain ID & Month",
-                            value=str(existing_text),
-                            max_chars=MAX_FEEDBACK_CHARS,
-                            height=120
-                        )
-                        password = st.text_input("Enter Team Lead password to confirm", type="password")
-                        if st.button("Submit Comment"):
-                            if password == FEEDBACK_PASSWORD:
-                                sel_df = df[df["Domain ID"].astype(str) == sel_domain]
-                                if not sel_df.empty:
-                                    name_val = sel_df.iloc[0]["Name"] if "Name" in sel_df.columns else sel_domain
-                                    tl_val = sel_df.iloc[0]["Team Lead"] if "Team Lead" in sel_df.columns else ""
-                                    if comment and comment.strip():
-                                        ba_upsert_feedback(sel_domain, str(name_val), sel_month, str(tl_val),
-                                                           comment.strip(), st.session_state.username or "user")
-                                        st.success("Feedback saved.")
-                                    else:
-                                        st.warning("Please enter a feedback comment before submitting.")
-                                else:
-                                    st.error("Selected Domain ID not found in current dataset.")
-                            else:
-                                st.error("Incorrect password. Feedback not saved.")
+                    render_feedback_entry("BA", df, d_ids, months)
                 return d_ids, funcs, f_leads, t_leads, months, None
 
             d_ids, funcs, f_leads, t_leads, months, _ = render_shared_filters_ba(latest_data)
-            filtered = filter_combined(latest_data, d_ids, funcs, f_leads, t_leads, months)
+            filtered = filter_combined(latest_data, d_ids, funcs, f_leads, t_leads, months,
+                                       index=get_filter_index("BA", combined_df))
             filtered = clean_dataframe_for_display(filtered, st.session_state.hide_cols)
 
             c1,c2,c3,c4 = st.columns(4)
@@ -2474,21 +3531,21 @@ elif page == "BA Scorecard (Monthly/YTD metrics)":
 
             mon_metrics = monthly_metrics_table_ba(filtered, report_month=active_month, group_by="Domain ID")
             st.caption(f"Showing {len(mon_metrics)} monthly rows (from filtered view)")
-            st.dataframe(mon_metrics, height=420)
+            st.dataframe(format_percent_columns(mon_metrics), height=420)
 
             if exceeds_excel_limits(mon_metrics):
                 st.caption("Note: Monthly metrics are too wide for Excel; download provided as CSV.")
             st.download_button(
                 "⬇️ Download Monthly Metrics",
-                make_excel_bytes_from_df(mon_metrics, st.session_state.hide_cols),
+                make_excel_bytes_from_df(format_percent_columns(mon_metrics), st.session_state.hide_cols),
                 file_name=f"{BA_EXPORT_PREFIX}monthly_ba_metrics_{active_month}.xlsx"
             )
 
-            if "Function" in filtered.columns and "Final Score_num" in filtered.columns:
+            if "Function" in filtered.columns and "Final Score" in filtered.columns:
                 final_func = (
-                    filtered.dropna(subset=["Final Score_num", "Function"])
-                            .groupby("Function", as_index=False)["Final Score_num"].mean()
-                            .rename(columns={"Final Score_num":"Avg Final Score (%)"})
+                    filtered.dropna(subset=["Final Score", "Function"])
+                            .groupby("Function", as_index=False, observed=True)["Final Score"].mean()
+                            .rename(columns={"Final Score":"Avg Final Score (%)"})
                 )
                 sel_func = alt.selection_multi(fields=["Function"], bind="legend")
                 chart_a = alt.Chart(final_func).mark_bar().encode(
@@ -2501,14 +3558,14 @@ elif page == "BA Scorecard (Monthly/YTD metrics)":
             else:
                 st.info("Final Score or Function column not found—'Avg Final Score by Function' chart skipped.")
 
-            if "Final Score_num" in filtered.columns:
+            if "Final Score" in filtered.columns:
                 st.altair_chart(
-                    alt.Chart(filtered.dropna(subset=["Final Score_num"]))
+                    alt.Chart(filtered.dropna(subset=["Final Score"]))
                       .mark_bar()
                       .encode(
-                          x=alt.X("Final Score_num:Q", bin=alt.Bin(step=5), title="Final Score (%)"),
+                          x=alt.X("Final Score:Q", bin=alt.Bin(step=5), title="Final Score (%)"),
                           y=alt.Y("count():Q", title="Count"),
-                          tooltip=[alt.Tooltip("Final Score_num:Q", title="Final Score (%)"), alt.Tooltip("count():Q", title="Count")]
+                          tooltip=[alt.Tooltip("Final Score:Q", title="Final Score (%)"), alt.Tooltip("count():Q", title="Count")]
                       ).properties(title="Final Score Distribution (Monthly, 5% bins)"),
                     use_container_width=True
                 )
@@ -2520,8 +3577,8 @@ elif page == "BA Scorecard (Monthly/YTD metrics)":
                 else:
                     cset1, cset2, cset3, cset4 = st.columns([2,2,2,2])
                     metric_options = get_numeric_metric_options(filtered)
-                    default_metric_list = metric_options if metric_options else ["Final Score_num"]
-                    default_index = default_metric_list.index("Final Score_num") if "Final Score_num" in default_metric_list else 0
+                    default_metric_list = metric_options if metric_options else ["Final Score"]
+                    default_index = default_metric_list.index("Final Score") if "Final Score" in default_metric_list else 0
                     sel_metric = cset1.selectbox("Metric (numeric %)", options=default_metric_list, index=default_index)
                     agg_method = cset2.radio("Aggregation", ["mean", "median"], index=0)
                     dim_candidates = [c for c in ["Function","Team Lead","Function Lead","Domain ID"] if c in filtered.columns]
@@ -2536,7 +3593,7 @@ elif page == "BA Scorecard (Monthly/YTD metrics)":
                     agg_df = add_rank_and_topN(agg_df, dim=dim, metric=sel_metric, top_n=top_n, ascending=ascending)
                     st.altair_chart(
                         bar_chart(agg_df, dim=dim, metric=sel_metric,
-                                  title=f"{agg_method.title()} {sel_metric.replace('_num',' (%)')} by {dim} (Monthly)",
+                                  title=f"{agg_method.title()} {metric_label(sel_metric)} by {dim} (Monthly)",
                                   palette=palette, show_labels=show_labels),
                         use_container_width=True
                     )
@@ -2546,7 +3603,7 @@ elif page == "BA Scorecard (Monthly/YTD metrics)":
                     ref = cH2.radio("Reference line", ["mean", "median"], index=0)
                     st.altair_chart(
                         histogram(filtered, metric=sel_metric, bin_step=bin_step,
-                                  title=f"Distribution of {sel_metric.replace('_num',' (%)')} (Monthly)",
+                                  title=f"Distribution of {metric_label(sel_metric)} (Monthly)",
                                   reference=ref),
                         use_container_width=True
                     )
@@ -2563,10 +3620,9 @@ elif page == "BA Scorecard (Monthly/YTD metrics)":
                         monthly_all = ba_load_combined_cached()
                         monthly_active = monthly_all.merge(active_ids, on="Attachment ID", how="inner")
                         monthly_active["reporting_month"] = monthly_active["reporting_month"].astype(str)
-                        monthly_active = add_numeric_percent_columns(monthly_active)
                         st.altair_chart(
                             line_trend(monthly_active, metric=sel_metric, month_col="reporting_month",
-                                       title=f"Trend by Month (active attachments): {sel_metric.replace('_num',' (%)')}"),
+                                       title=f"Trend by Month (active attachments): {metric_label(sel_metric)}"),
                             use_container_width=True
                         )
                     except Exception:
@@ -2574,35 +3630,30 @@ elif page == "BA Scorecard (Monthly/YTD metrics)":
 
             st.subheader("Filtered Table (latest active BA file)")
             st.caption(f"Showing {len(filtered)} of {len(latest_data)} rows")
-            st.dataframe(filtered if not filtered.empty else pd.DataFrame(), height=480)
+            st.dataframe(format_percent_columns(filtered) if not filtered.empty else pd.DataFrame(), height=480)
             if exceeds_excel_limits(filtered):
                 st.caption("Note: Filtered result is too wide for Excel; download provided as CSV.")
             st.download_button(
                 "⬇️ Download filtered (Monthly)",
-                make_excel_bytes_from_df(filtered, st.session_state.hide_cols),
+                make_excel_bytes_from_df(format_percent_columns(filtered), st.session_state.hide_cols),
                 file_name=f"{BA_EXPORT_PREFIX}monthly_scorecard_filtered.xlsx"
             )
 
             if st.session_state.role == "admin":
                 st.subheader("🛠 Admin — Edit Latest Active BA Data")
                 st.caption("Edit values directly. Saving replaces the data for the latest active BA attachment in combined storage (not the original Excel file).")
-                editable = st.data_editor(latest_data.copy(), num_rows="dynamic", use_container_width=True)
+                editable = st.data_editor(editable_frame(latest_data), num_rows="dynamic", use_container_width=True)
                 if st.button("Save Admin Changes (BA)", type="primary"):
                     try:
                         edited = editable.copy()
-                        edited = convert_percentage_columns(edited)
-                        edited = add_numeric_percent_columns(edited)
+                        edited = type_percent_columns(edited)
                         edited["Attachment ID"] = latest_id
-                        combined_df = ba_load_combined_cached()
-                        combined_df = combined_df[combined_df["Attachment ID"] != latest_id]
-                        combined_df = pd.concat([combined_df, edited], ignore_index=True)
-                        ba_save_combined(combined_df)
+                        COMBINED_STORES["BA"].write_partition(latest_id, edited)
                         ba_log_audit("Admin Save Edit (BA)",
                                      latest_id,
                                      latest_row["filename"] if "filename" in latest_row else "",
                                      st.session_state.username or "admin")
                         st.success("Admin changes saved to BA combined storage.")
-                        invalidate_data_caches()  # ensure next UI run fetches fresh files
                     except Exception as e:
                         st.error(f"Failed to save admin changes: {e}")
 
@@ -2610,13 +3661,12 @@ elif page == "BA Scorecard (Monthly/YTD metrics)":
         history = ba_load_history_cached()
         active_mask = _coerce_active_bool(history.get("active", pd.Series([], dtype="object")))
         active_ids = history[active_mask][["id","reporting_month"]].rename(columns={"id":"Attachment ID"})
-        monthly_all = ba_load_combined_cached()
-        ytd = monthly_all.merge(active_ids, on="Attachment ID", how="inner")
+        monthly_all = ba_load_ytd_view_cached()  # active attachments, metrics read on demand
+        ytd = active_rows(monthly_all, active_ids)
         if ytd.empty:
             st.warning("No BA YTD data.")
             st.stop()
         ytd = clean_dataframe_for_display(ytd, st.session_state.hide_cols)
-        ytd = add_numeric_cached(ytd)
 
         def render_ytd_filters_ba(df, label="Filters (YTD)"):
             month_str = _to_month_str_series(df)
@@ -2631,10 +3681,10 @@ elif page == "BA Scorecard (Monthly/YTD metrics)":
                 return f"FY{fy_start}-{str(fy_end)[-2:]}"
             with st.expander(label, expanded=True):
                 c1, c2, c3, c4, c5 = st.columns(5)
-                domain_options = sorted(df["Domain ID"].dropna().astype(str).unique()) if "Domain ID" in df.columns else []
-                func_options = sorted(df["Function"].dropna().astype(str).unique()) if "Function" in df.columns else []
-                flead_options = sorted(df["Function Lead"].dropna().astype(str).unique()) if "Function Lead" in df.columns else []
-                tlead_options = sorted(df["Team Lead"].dropna().astype(str).unique()) if "Team Lead" in df.columns else []
+                domain_options = _dimension_options(df, "Domain ID")
+                func_options = _dimension_options(df, "Function")
+                flead_options = _dimension_options(df, "Function Lead")
+                tlead_options = _dimension_options(df, "Team Lead")
                 d_ids = c1.multiselect("Domain ID", domain_options)
                 funcs = c2.multiselect("Function", func_options)
                 f_leads = c3.multiselect("Function Lead", flead_options)
@@ -2651,8 +3701,10 @@ elif page == "BA Scorecard (Monthly/YTD metrics)":
                 return d_ids, funcs, f_leads, t_leads, months, search
 
         d_ids, funcs, f_leads, t_leads, months, search = render_ytd_filters_ba(ytd)
-        ytd_filtered = filter_combined(ytd, d_ids, funcs, f_leads, t_leads, months)
-        ytd_filtered = apply_search(ytd_filtered, search)
+        ytd_filtered = filter_combined(ytd, d_ids, funcs, f_leads, t_leads, months,
+                                       index=get_filter_index("BA", monthly_all, view="ytd"))
+        if search.strip():  # the index is built on the first search of a data version
+            ytd_filtered = apply_search(ytd_filtered, search, index=get_search_index("BA", monthly_all, view="ytd"))
         ytd_filtered = clean_dataframe_for_display(ytd_filtered, st.session_state.hide_cols)
 
         c1, c2, c3 = st.columns(3)
@@ -2680,9 +3732,9 @@ elif page == "BA Scorecard (Monthly/YTD metrics)":
                 st.info("No YTD data under current filters for advanced visuals.")
             else:
                 cset1, cset2, cset3, cset4 = st.columns([2,2,2,2])
-                metric_options_ytd = get_numeric_metric_options(ytd_filtered)
-                default_metric_list_ytd = metric_options_ytd if metric_options_ytd else ["Final Score_num"]
-                default_index_ytd = default_metric_list_ytd.index("Final Score_num") if "Final Score_num" in default_metric_list_ytd else 0
+                metric_options_ytd = stored_metric_columns("BA")
+                default_metric_list_ytd = metric_options_ytd if metric_options_ytd else ["Final Score"]
+                default_index_ytd = default_metric_list_ytd.index("Final Score") if "Final Score" in default_metric_list_ytd else 0
                 sel_metric_ytd = cset1.selectbox("Metric (numeric %)", options=default_metric_list_ytd, index=default_index_ytd)
                 agg_method_ytd = cset2.radio("Aggregation", ["mean", "median"], index=0)
                 dim_candidates_ytd = [c for c in ["Function","Team Lead","Function Lead","Domain ID"] if c in ytd_filtered.columns]
@@ -2692,12 +3744,13 @@ elif page == "BA Scorecard (Monthly/YTD metrics)":
                 top_n_ytd = cN1.slider("Top N", min_value=5, max_value=50, value=15, step=5)
                 ascending_ytd = cN2.checkbox("Show lowest first", value=False)
                 show_labels_ytd = cN3.checkbox("Bar labels", value=True)
+                ytd_charted = load_view_columns("BA", monthly_all, ytd_filtered, [sel_metric_ytd])
 
-                agg_ytd = aggregate_df(ytd_filtered, dim=dim_ytd, metric=sel_metric_ytd, method=agg_method_ytd)
+                agg_ytd = aggregate_df(ytd_charted, dim=dim_ytd, metric=sel_metric_ytd, method=agg_method_ytd)
                 agg_ytd = add_rank_and_topN(agg_ytd, dim=dim_ytd, metric=sel_metric_ytd, top_n=top_n_ytd, ascending=ascending_ytd)
                 st.altair_chart(
                     bar_chart(agg_ytd, dim=dim_ytd, metric=sel_metric_ytd,
-                              title=f"{agg_method_ytd.title()} {sel_metric_ytd.replace('_num',' (%)')} by {dim_ytd} (YTD)",
+                              title=f"{agg_method_ytd.title()} {metric_label(sel_metric_ytd)} by {dim_ytd} (YTD)",
                               palette=palette_ytd, show_labels=show_labels_ytd),
                     use_container_width=True
                 )
@@ -2706,43 +3759,34 @@ elif page == "BA Scorecard (Monthly/YTD metrics)":
                 bin_step_ytd = cH1.slider("Histogram bin step (percentage points)", 1, 20, 5, 1)
                 ref_ytd = cH2.radio("Reference line", ["mean", "median"], index=0)
                 st.altair_chart(
-                    histogram(ytd_filtered, metric=sel_metric_ytd, bin_step=bin_step_ytd,
-                              title=f"Distribution of {sel_metric_ytd.replace('_num',' (%)')} (YTD)",
+                    histogram(ytd_charted, metric=sel_metric_ytd, bin_step=bin_step_ytd,
+                              title=f"Distribution of {metric_label(sel_metric_ytd)} (YTD)",
                               reference=ref_ytd),
                     use_container_width=True
                 )
 
                 st.altair_chart(
-                    boxplot(ytd_filtered, dim=dim_ytd, metric=sel_metric_ytd, title=f"Distribution by {dim_ytd} (YTD)",
+                    boxplot(ytd_charted, dim=dim_ytd, metric=sel_metric_ytd, title=f"Distribution by {dim_ytd} (YTD)",
                     ), use_container_width=True
                 )
 
                 if "Function" in ytd_filtered.columns and "Team Lead" in ytd_filtered.columns:
                     st.altair_chart(
-                        heatmap(ytd_filtered, row_dim="Function", col_dim="Team Lead", metric=sel_metric_ytd,
-                                title=f"Heatmap: {sel_metric_ytd.replace('_num',' (%)')} (Function x Team Lead) - YTD"),
+                        heatmap(ytd_charted, row_dim="Function", col_dim="Team Lead", metric=sel_metric_ytd,
+                                title=f"Heatmap: {metric_label(sel_metric_ytd)} (Function x Team Lead) - YTD"),
                         use_container_width=True
                     )
                 else:
-                    ytd_norm = ytd_filtered.copy()
+                    ytd_norm = ytd_charted.copy()
                     ytd_norm["Month_norm"] = _to_month_str_series(ytd_norm)
                     if "Function" in ytd_norm.columns and "Month_norm" in ytd_norm.columns:
                         st.altair_chart(
                             heatmap(ytd_norm, row_dim="Function", col_dim="Month_norm", metric=sel_metric_ytd,
-                                    title=f"Heatmap: {sel_metric_ytd.replace('_num',' (%)')} (Function x Month) - YTD"),
+                                    title=f"Heatmap: {metric_label(sel_metric_ytd)} (Function x Month) - YTD"),
                             use_container_width=True
                         )
 
-        st.subheader("Filtered YTD Table (BA)")
-        st.caption(f"Showing {len(ytd_filtered)} of {len(ytd)} rows")
-        st.dataframe(ytd_filtered, height=480)
-        if exceeds_excel_limits(ytd_filtered):
-            st.caption("Note: Filtered result is too wide for Excel; download provided as CSV.")
-        st.download_button(
-            "⬇️ Download filtered (YTD)",
-            make_excel_bytes_from_df(ytd_filtered, st.session_state.hide_cols),
-            file_name=f"{BA_EXPORT_PREFIX}ytd_dashboard_filtered.xlsx"
-        )
+        render_filtered_ytd_table("BA", monthly_all, ytd, ytd_filtered, "Filtered YTD Table (BA)", BA_EXPORT_PREFIX)
 
 
 # -------------------------------------
@@ -2753,61 +3797,34 @@ elif page == "PE Scorecard (Monthly/YTD metrics)":
     mode = st.radio("View mode", ["Monthly", "YTD"], index=0, horizontal=True)
 
     if mode == "Monthly":
-        latest_row, latest_id, latest_data = pe_get_latest_monthly_data()
+        combined_df = pe_load_combined_cached()
+        latest_row, latest_id, latest_data = pe_get_latest_monthly_data(combined_df)
         if latest_data is None or latest_data.empty:
             st.warning("No active PE file available.")
         else:
             latest_data = clean_dataframe_for_display(latest_data, st.session_state.hide_cols)
-            latest_data = add_numeric_cached(latest_data)
 
             def render_shared_filters_pe(df, label="Filters (Monthly)"):
                 month_str = _to_month_str_series(df)
                 month_options = sorted([m for m in month_str.dropna().unique() if m and str(m).strip() != ""])
                 with st.expander(label, expanded=True):
                     c1, c2, c3, c4, c5 = st.columns(5)
-                    domain_options = sorted(df["Domain ID"].dropna().astype(str).unique()) if "Domain ID" in df.columns else []
-                    func_options = sorted(df["Function"].dropna().astype(str).unique()) if "Function" in df.columns else []
-                    flead_options = sorted(df["Function Lead"].dropna().astype(str).unique()) if "Function Lead" in df.columns else []
-                    tlead_options = sorted(df["Team Lead"].dropna().astype(str).unique()) if "Team Lead" in df.columns else []
-                    d_ids = c1.multiselect("Domain ID (select one to comment)", domain_options)
+                    domain_options = _dimension_options(df, "Domain ID")
+                    func_options = _dimension_options(df, "Function")
+                    flead_options = _dimension_options(df, "Function Lead")
+                    tlead_options = _dimension_options(df, "Team Lead")
+                    d_ids = c1.multiselect("Domain ID (select to comment)", domain_options)
                     funcs = c2.multiselect("Function", func_options)
                     f_leads = c3.multiselect("Function Lead", flead_options)
                     t_leads = c4.multiselect("Team Lead", tlead_options)
                     months = c5.multiselect("Month (YYYY-MM)", month_options)
 
-                    if d_ids and len(d_ids) == 1 and months and len(months) == 1:
-                        sel_domain = str(d_ids[0]); sel_month = str(months[0])
-                        st.markdown("**Monthly feedback/feedforward** (max 500 characters)")
-                        fb = pe_load_feedback()
-                        existing = fb[(fb["Domain ID"].astype(str) == sel_domain) & (fb["Month"].astype(str) == sel_month)]
-                        existing_text = existing.iloc[0]["Feedback"] if not existing.empty else ""
-                        comment = st.text_area(
-                            "Enter feedback for the selected Domain ID & Month",
-                            value=str(existing_text),
-                            max_chars=MAX_FEEDBACK_CHARS,
-                            height=120
-                        )
-                        password = st.text_input("Enter Team Lead password to confirm", type="password")
-                        if st.button("Submit Comment"):
-                            if password == FEEDBACK_PASSWORD:
-                                sel_df = df[df["Domain ID"].astype(str) == sel_domain]
-                                if not sel_df.empty:
-                                    name_val = sel_df.iloc[0]["Name"] if "Name" in sel_df.columns else sel_domain
-                                    tl_val = sel_df.iloc[0]["Team Lead"] if "Team Lead" in sel_df.columns else ""
-                                    if comment and comment.strip():
-                                        pe_upsert_feedback(sel_domain, str(name_val), sel_month, str(tl_val),
-                                                          comment.strip(), st.session_state.username or "user")
-                                        st.success("Feedback saved.")
-                                    else:
-                                        st.warning("Please enter a feedback comment before submitting.")
-                                else:
-                                    st.error("Selected Domain ID not found in current dataset.")
-                            else:
-                                st.error("Incorrect password. Feedback not saved.")
+                    render_feedback_entry("PE", df, d_ids, months)
                     return d_ids, funcs, f_leads, t_leads, months, None
 
             d_ids, funcs, f_leads, t_leads, months, _ = render_shared_filters_pe(latest_data)
-            filtered = filter_combined(latest_data, d_ids, funcs, f_leads, t_leads, months)
+            filtered = filter_combined(latest_data, d_ids, funcs, f_leads, t_leads, months,
+                                       index=get_filter_index("PE", combined_df))
             filtered = clean_dataframe_for_display(filtered, st.session_state.hide_cols)
 
             c1, c2, c3, c4 = st.columns(4)
@@ -2823,21 +3840,21 @@ elif page == "PE Scorecard (Monthly/YTD metrics)":
 
             mon_metrics = monthly_metrics_table_pe(filtered, report_month=active_month, group_by="Domain ID")
             st.caption(f"Showing {len(mon_metrics)} monthly rows (from filtered view)")
-            st.dataframe(mon_metrics, height=420)
+            st.dataframe(format_percent_columns(mon_metrics), height=420)
             if exceeds_excel_limits(mon_metrics):
                 st.caption("Note: Monthly metrics are too wide for Excel; download provided as CSV.")
             st.download_button(
                 "⬇️ Download Monthly Metrics",
-                make_excel_bytes_from_df(mon_metrics, st.session_state.hide_cols),
+                make_excel_bytes_from_df(format_percent_columns(mon_metrics), st.session_state.hide_cols),
                 file_name=f"{PE_EXPORT_PREFIX}monthly_pe_metrics_{active_month}.xlsx"
             )
 
             # Simple charts (same as BA/Associates)
-            if "Function" in filtered.columns and "Final Score_num" in filtered.columns:
+            if "Function" in filtered.columns and "Final Score" in filtered.columns:
                 final_func = (
-                    filtered.dropna(subset=["Final Score_num", "Function"])
-                            .groupby("Function", as_index=False)["Final Score_num"].mean()
-                            .rename(columns={"Final Score_num": "Avg Final Score (%)"})
+                    filtered.dropna(subset=["Final Score", "Function"])
+                            .groupby("Function", as_index=False, observed=True)["Final Score"].mean()
+                            .rename(columns={"Final Score": "Avg Final Score (%)"})
                 )
                 sel_func = alt.selection_multi(fields=["Function"], bind="legend")
                 chart_a = alt.Chart(final_func).mark_bar().encode(
@@ -2849,14 +3866,14 @@ elif page == "PE Scorecard (Monthly/YTD metrics)":
                 st.altair_chart(chart_a, use_container_width=True)
             else:
                 st.info("Final Score or Function column not found—'Avg Final Score by Function' chart skipped.")
-            if "Final Score_num" in filtered.columns:
+            if "Final Score" in filtered.columns:
                 st.altair_chart(
-                    alt.Chart(filtered.dropna(subset=["Final Score_num"]))
+                    alt.Chart(filtered.dropna(subset=["Final Score"]))
                        .mark_bar()
                        .encode(
-                           x=alt.X("Final Score_num:Q", bin=alt.Bin(step=5), title="Final Score (%)"),
+                           x=alt.X("Final Score:Q", bin=alt.Bin(step=5), title="Final Score (%)"),
                            y=alt.Y("count():Q", title="Count"),
-                           tooltip=[alt.Tooltip("Final Score_num:Q", title="Final Score (%)"), alt.Tooltip("count():Q", title="Count")]
+                           tooltip=[alt.Tooltip("Final Score:Q", title="Final Score (%)"), alt.Tooltip("count():Q", title="Count")]
                        ).properties(title="Final Score Distribution (Monthly, 5% bins)"),
                     use_container_width=True
                 )
@@ -2869,8 +3886,8 @@ elif page == "PE Scorecard (Monthly/YTD metrics)":
                 else:
                     cset1, cset2, cset3, cset4 = st.columns([2,2,2,2])
                     metric_options = get_numeric_metric_options(filtered)
-                    default_metric_list = metric_options if metric_options else ["Final Score_num"]
-                    default_index = default_metric_list.index("Final Score_num") if "Final Score_num" in default_metric_list else 0
+                    default_metric_list = metric_options if metric_options else ["Final Score"]
+                    default_index = default_metric_list.index("Final Score") if "Final Score" in default_metric_list else 0
                     sel_metric = cset1.selectbox("Metric (numeric %)", options=default_metric_list, index=default_index)
                     agg_method = cset2.radio("Aggregation", ["mean", "median"], index=0)
                     dim_candidates = [c for c in ["Function","Team Lead","Function Lead","Domain ID"] if c in filtered.columns]
@@ -2884,7 +3901,7 @@ elif page == "PE Scorecard (Monthly/YTD metrics)":
                     agg_df = add_rank_and_topN(agg_df, dim=dim, metric=sel_metric, top_n=top_n, ascending=ascending)
                     st.altair_chart(
                         bar_chart(agg_df, dim=dim, metric=sel_metric,
-                                  title=f"{agg_method.title()} {sel_metric.replace('_num',' (%)')} by {dim} (Monthly)",
+                                  title=f"{agg_method.title()} {metric_label(sel_metric)} by {dim} (Monthly)",
                                   palette=palette, show_labels=show_labels),
                         use_container_width=True
                     )
@@ -2893,7 +3910,7 @@ elif page == "PE Scorecard (Monthly/YTD metrics)":
                     ref = cH2.radio("Reference line", ["mean", "median"], index=0)
                     st.altair_chart(
                         histogram(filtered, metric=sel_metric, bin_step=bin_step,
-                                  title=f"Distribution of {sel_metric.replace('_num',' (%)')} (Monthly)",
+                                  title=f"Distribution of {metric_label(sel_metric)} (Monthly)",
                                   reference=ref),
                         use_container_width=True
                     )
@@ -2908,10 +3925,9 @@ elif page == "PE Scorecard (Monthly/YTD metrics)":
                         monthly_all = pe_load_combined_cached()
                         monthly_active = monthly_all.merge(active_ids, on="Attachment ID", how="inner")
                         monthly_active["reporting_month"] = monthly_active["reporting_month"].astype(str)
-                        monthly_active = add_numeric_percent_columns(monthly_active)
                         st.altair_chart(
                             line_trend(monthly_active, metric=sel_metric, month_col="reporting_month",
-                                       title=f"Trend by Month (active attachments): {sel_metric.replace('_num',' (%)')}"),
+                                       title=f"Trend by Month (active attachments): {metric_label(sel_metric)}"),
                             use_container_width=True
                         )
                     except Exception:
@@ -2919,34 +3935,29 @@ elif page == "PE Scorecard (Monthly/YTD metrics)":
 
             st.subheader("Filtered Table (latest active PE file)")
             st.caption(f"Showing {len(filtered)} of {len(latest_data)} rows")
-            st.dataframe(filtered if not filtered.empty else pd.DataFrame(), height=480)
+            st.dataframe(format_percent_columns(filtered) if not filtered.empty else pd.DataFrame(), height=480)
             if exceeds_excel_limits(filtered):
                 st.caption("Note: Filtered result is too wide for Excel; download provided as CSV.")
             st.download_button(
                 "⬇️ Download filtered (Monthly)",
-                make_excel_bytes_from_df(filtered, st.session_state.hide_cols),
+                make_excel_bytes_from_df(format_percent_columns(filtered), st.session_state.hide_cols),
                 file_name=f"{PE_EXPORT_PREFIX}monthly_scorecard_filtered.xlsx"
             )
 
             if st.session_state.role == "admin":
                 st.subheader("🛠 Admin — Edit Latest Active PE Data")
                 st.caption("Edit values directly. Saving replaces the data for the latest active PE attachment in combined storage (not the original Excel file).")
-                editable = st.data_editor(latest_data.copy(), num_rows="dynamic", use_container_width=True)
+                editable = st.data_editor(editable_frame(latest_data), num_rows="dynamic", use_container_width=True)
                 if st.button("Save Admin Changes (PE)", type="primary"):
                     try:
                         edited = editable.copy()
-                        edited = convert_percentage_columns(edited)
-                        edited = add_numeric_percent_columns(edited)
+                        edited = type_percent_columns(edited)
                         edited["Attachment ID"] = latest_id
-                        combined_df = pe_load_combined_cached()
-                        combined_df = combined_df[combined_df["Attachment ID"] != latest_id]
-                        combined_df = pd.concat([combined_df, edited], ignore_index=True)
-                        pe_save_combined(combined_df)
+                        COMBINED_STORES["PE"].write_partition(latest_id, edited)
                         pe_log_audit("Admin Save Edit (PE)", latest_id,
                                      latest_row["filename"] if "filename" in latest_row else "",
                                      st.session_state.username or "admin")
                         st.success("Admin changes saved to PE combined storage.")
-                        invalidate_data_caches()  # ensure next UI run fetches fresh files
                     except Exception as e:
                         st.error(f"Failed to save admin changes: {e}")
 
@@ -2955,13 +3966,12 @@ elif page == "PE Scorecard (Monthly/YTD metrics)":
         history = pe_load_history_cached()
         active_mask = _coerce_active_bool(history.get("active", pd.Series([], dtype="object")))
         active_ids = history[active_mask][["id","reporting_month"]].rename(columns={"id":"Attachment ID"})
-        monthly_all = pe_load_combined_cached()
-        ytd = monthly_all.merge(active_ids, on="Attachment ID", how="inner")
+        monthly_all = pe_load_ytd_view_cached()  # active attachments, metrics read on demand
+        ytd = active_rows(monthly_all, active_ids)
         if ytd.empty:
             st.warning("No PE YTD data.")
             st.stop()
         ytd = clean_dataframe_for_display(ytd, st.session_state.hide_cols)
-        ytd = add_numeric_cached(ytd)
 
         def render_ytd_filters_pe(df, label="Filters (YTD)"):
             month_str = _to_month_str_series(df)
@@ -2976,10 +3986,10 @@ elif page == "PE Scorecard (Monthly/YTD metrics)":
                 return f"FY{fy_start}-{str(fy_end)[-2:]}"
             with st.expander(label, expanded=True):
                 c1, c2, c3, c4, c5 = st.columns(5)
-                domain_options = sorted(df["Domain ID"].dropna().astype(str).unique()) if "Domain ID" in df.columns else []
-                func_options = sorted(df["Function"].dropna().astype(str).unique()) if "Function" in df.columns else []
-                flead_options = sorted(df["Function Lead"].dropna().astype(str).unique()) if "Function Lead" in df.columns else []
-                tlead_options = sorted(df["Team Lead"].dropna().astype(str).unique()) if "Team Lead" in df.columns else []
+                domain_options = _dimension_options(df, "Domain ID")
+                func_options = _dimension_options(df, "Function")
+                flead_options = _dimension_options(df, "Function Lead")
+                tlead_options = _dimension_options(df, "Team Lead")
                 d_ids = c1.multiselect("Domain ID", domain_options)
                 funcs = c2.multiselect("Function", func_options)
                 f_leads = c3.multiselect("Function Lead", flead_options)
@@ -2996,8 +4006,10 @@ elif page == "PE Scorecard (Monthly/YTD metrics)":
                 return d_ids, funcs, f_leads, t_leads, months, search
 
         d_ids, funcs, f_leads, t_leads, months, search = render_ytd_filters_pe(ytd)
-        ytd_filtered = filter_combined(ytd, d_ids, funcs, f_leads, t_leads, months)
-        ytd_filtered = apply_search(ytd_filtered, search)
+        ytd_filtered = filter_combined(ytd, d_ids, funcs, f_leads, t_leads, months,
+                                       index=get_filter_index("PE", monthly_all, view="ytd"))
+        if search.strip():  # the index is built on the first search of a data version
+            ytd_filtered = apply_search(ytd_filtered, search, index=get_search_index("PE", monthly_all, view="ytd"))
         ytd_filtered = clean_dataframe_for_display(ytd_filtered, st.session_state.hide_cols)
 
         c1, c2, c3 = st.columns(3)
@@ -3025,9 +4037,9 @@ elif page == "PE Scorecard (Monthly/YTD metrics)":
                 st.info("No YTD data under current filters for advanced visuals.")
             else:
                 cset1, cset2, cset3, cset4 = st.columns([2,2,2,2])
-                metric_options_ytd = get_numeric_metric_options(ytd_filtered)
-                default_metric_list_ytd = metric_options_ytd if metric_options_ytd else ["Final Score_num"]
-                default_index_ytd = default_metric_list_ytd.index("Final Score_num") if "Final Score_num" in default_metric_list_ytd else 0
+                metric_options_ytd = stored_metric_columns("PE")
+                default_metric_list_ytd = metric_options_ytd if metric_options_ytd else ["Final Score"]
+                default_index_ytd = default_metric_list_ytd.index("Final Score") if "Final Score" in default_metric_list_ytd else 0
                 sel_metric_ytd = cset1.selectbox("Metric (numeric %)", options=default_metric_list_ytd, index=default_index_ytd)
                 agg_method_ytd = cset2.radio("Aggregation", ["mean", "median"], index=0)
                 dim_candidates_ytd = [c for c in ["Function","Team Lead","Function Lead","Domain ID"] if c in ytd_filtered.columns]
@@ -3037,11 +4049,13 @@ elif page == "PE Scorecard (Monthly/YTD metrics)":
                 top_n_ytd = cN1.slider("Top N", min_value=5, max_value=50, value=15, step=5)
                 ascending_ytd = cN2.checkbox("Show lowest first", value=False)
                 show_labels_ytd = cN3.checkbox("Bar labels", value=True)
-                agg_ytd = aggregate_df(ytd_filtered, dim=dim_ytd, metric=sel_metric_ytd, method=agg_method_ytd)
+                ytd_charted = load_view_columns("PE", monthly_all, ytd_filtered, [sel_metric_ytd])
+
+                agg_ytd = aggregate_df(ytd_charted, dim=dim_ytd, metric=sel_metric_ytd, method=agg_method_ytd)
                 agg_ytd = add_rank_and_topN(agg_ytd, dim=dim_ytd, metric=sel_metric_ytd, top_n=top_n_ytd, ascending=ascending_ytd)
                 st.altair_chart(
                     bar_chart(agg_ytd, dim=dim_ytd, metric=sel_metric_ytd,
-                              title=f"{agg_method_ytd.title()} {sel_metric_ytd.replace('_num',' (%)')} by {dim_ytd} (YTD)",
+                              title=f"{agg_method_ytd.title()} {metric_label(sel_metric_ytd)} by {dim_ytd} (YTD)",
                               palette=palette_ytd, show_labels=show_labels_ytd),
                     use_container_width=True
                 )
@@ -3049,41 +4063,32 @@ elif page == "PE Scorecard (Monthly/YTD metrics)":
                 bin_step_ytd = cH1.slider("Histogram bin step (percentage points)", 1, 20, 5, 1)
                 ref_ytd = cH2.radio("Reference line", ["mean", "median"], index=0)
                 st.altair_chart(
-                    histogram(ytd_filtered, metric=sel_metric_ytd, bin_step=bin_step_ytd,
-                              title=f"Distribution of {sel_metric_ytd.replace('_num',' (%)')} (YTD)",
+                    histogram(ytd_charted, metric=sel_metric_ytd, bin_step=bin_step_ytd,
+                              title=f"Distribution of {metric_label(sel_metric_ytd)} (YTD)",
                               reference=ref_ytd),
                     use_container_width=True
                 )
                 st.altair_chart(
-                    boxplot(ytd_filtered, dim=dim_ytd, metric=sel_metric_ytd, title=f"Distribution by {dim_ytd} (YTD)"),
+                    boxplot(ytd_charted, dim=dim_ytd, metric=sel_metric_ytd, title=f"Distribution by {dim_ytd} (YTD)"),
                     use_container_width=True
                 )
                 if "Function" in ytd_filtered.columns and "Team Lead" in ytd_filtered.columns:
                     st.altair_chart(
-                        heatmap(ytd_filtered, row_dim="Function", col_dim="Team Lead", metric=sel_metric_ytd,
-                                title=f"Heatmap: {sel_metric_ytd.replace('_num',' (%)')} (Function x Team Lead) - YTD"),
+                        heatmap(ytd_charted, row_dim="Function", col_dim="Team Lead", metric=sel_metric_ytd,
+                                title=f"Heatmap: {metric_label(sel_metric_ytd)} (Function x Team Lead) - YTD"),
                         use_container_width=True
                     )
                 else:
-                    ytd_norm = ytd_filtered.copy()
+                    ytd_norm = ytd_charted.copy()
                     ytd_norm["Month_norm"] = _to_month_str_series(ytd_norm)
                     if "Function" in ytd_norm.columns and "Month_norm" in ytd_norm.columns:
                         st.altair_chart(
                             heatmap(ytd_norm, row_dim="Function", col_dim="Month_norm", metric=sel_metric_ytd,
-                                    title=f"Heatmap: {sel_metric_ytd.replace('_num',' (%)')} (Function x Month) - YTD"),
+                                    title=f"Heatmap: {metric_label(sel_metric_ytd)} (Function x Month) - YTD"),
                             use_container_width=True
                         )
 
-        st.subheader("Filtered YTD Table (PE)")
-        st.caption(f"Showing {len(ytd_filtered)} of {len(ytd)} rows")
-        st.dataframe(ytd_filtered, height=480)
-        if exceeds_excel_limits(ytd_filtered):
-            st.caption("Note: Filtered result is too wide for Excel; download provided as CSV.")
-        st.download_button(
-            "⬇️ Download filtered (YTD)",
-            make_excel_bytes_from_df(ytd_filtered, st.session_state.hide_cols),
-            file_name=f"{PE_EXPORT_PREFIX}ytd_dashboard_filtered.xlsx"
-        )
+        render_filtered_ytd_table("PE", monthly_all, ytd, ytd_filtered, "Filtered YTD Table (PE)", PE_EXPORT_PREFIX)
 
 
 # -------------------------------------
@@ -3094,61 +4099,34 @@ elif page == "TL Scorecard (Monthly/YTD metrics)":
     mode = st.radio("View mode", ["Monthly", "YTD"], index=0, horizontal=True)
 
     if mode == "Monthly":
-        latest_row, latest_id, latest_data = tl_get_latest_monthly_data()
+        combined_df = tl_load_combined_cached()
+        latest_row, latest_id, latest_data = tl_get_latest_monthly_data(combined_df)
         if latest_data is None or latest_data.empty:
             st.warning("No active TL file available.")
         else:
             latest_data = clean_dataframe_for_display(latest_data, st.session_state.hide_cols)
-            latest_data = add_numeric_cached(latest_data)
 
             def render_shared_filters_tl(df, label="Filters (Monthly)"):
                 month_str = _to_month_str_series(df)
                 month_options = sorted([m for m in month_str.dropna().unique() if m and str(m).strip() != ""])
                 with st.expander(label, expanded=True):
                     c1, c2, c3, c4, c5 = st.columns(5)
-                    domain_options = sorted(df["Domain ID"].dropna().astype(str).unique()) if "Domain ID" in df.columns else []
-                    func_options = sorted(df["Function"].dropna().astype(str).unique()) if "Function" in df.columns else []
-                    flead_options = sorted(df["Function Lead"].dropna().astype(str).unique()) if "Function Lead" in df.columns else []
-                    tlead_options = sorted(df["Team Lead"].dropna().astype(str).unique()) if "Team Lead" in df.columns else []
-                    d_ids = c1.multiselect("Domain ID (select one to comment)", domain_options)
+                    domain_options = _dimension_options(df, "Domain ID")
+                    func_options = _dimension_options(df, "Function")
+                    flead_options = _dimension_options(df, "Function Lead")
+                    tlead_options = _dimension_options(df, "Team Lead")
+                    d_ids = c1.multiselect("Domain ID (select to comment)", domain_options)
                     funcs = c2.multiselect("Function", func_options)
                     f_leads = c3.multiselect("Function Lead", flead_options)
                     t_leads = c4.multiselect("Team Lead", tlead_options)
                     months = c5.multiselect("Month (YYYY-MM)", month_options)
 
-                    if d_ids and len(d_ids) == 1 and months and len(months) == 1:
-                        sel_domain = str(d_ids[0]); sel_month = str(months[0])
-                        st.markdown("**Monthly feedback/feedforward** (max 500 characters)")
-                        fb = tl_load_feedback()
-                        existing = fb[(fb["Domain ID"].astype(str) == sel_domain) & (fb["Month"].astype(str) == sel_month)]
-                        existing_text = existing.iloc[0]["Feedback"] if not existing.empty else ""
-                        comment = st.text_area(
-                            "Enter feedback for the selected Domain ID & Month",
-                            value=str(existing_text),
-                            max_chars=MAX_FEEDBACK_CHARS,
-                            height=120
-                        )
-                        password = st.text_input("Enter Team Lead password to confirm", type="password")
-                        if st.button("Submit Comment"):
-                            if password == FEEDBACK_PASSWORD:
-                                sel_df = df[df["Domain ID"].astype(str) == sel_domain]
-                                if not sel_df.empty:
-                                    name_val = sel_df.iloc[0]["Name"] if "Name" in sel_df.columns else sel_domain
-                                    tl_val = sel_df.iloc[0]["Team Lead"] if "Team Lead" in sel_df.columns else ""
-                                    if comment and comment.strip():
-                                        tl_upsert_feedback(sel_domain, str(name_val), sel_month, str(tl_val),
-                                                          comment.strip(), st.session_state.username or "user")
-                                        st.success("Feedback saved.")
-                                    else:
-                                        st.warning("Please enter a feedback comment before submitting.")
-                                else:
-                                    st.error("Selected Domain ID not found in current dataset.")
-                            else:
-                                st.error("Incorrect password. Feedback not saved.")
+                    render_feedback_entry("TL", df, d_ids, months)
                     return d_ids, funcs, f_leads, t_leads, months, None
 
             d_ids, funcs, f_leads, t_leads, months, _ = render_shared_filters_tl(latest_data)
-            filtered = filter_combined(latest_data, d_ids, funcs, f_leads, t_leads, months)
+            filtered = filter_combined(latest_data, d_ids, funcs, f_leads, t_leads, months,
+                                       index=get_filter_index("TL", combined_df))
             filtered = clean_dataframe_for_display(filtered, st.session_state.hide_cols)
 
             c1, c2, c3, c4 = st.columns(4)
@@ -3164,21 +4142,21 @@ elif page == "TL Scorecard (Monthly/YTD metrics)":
 
             mon_metrics = monthly_metrics_table_tl(filtered, report_month=active_month, group_by="Domain ID")
             st.caption(f"Showing {len(mon_metrics)} monthly rows (from filtered view)")
-            st.dataframe(mon_metrics, height=420)
+            st.dataframe(format_percent_columns(mon_metrics), height=420)
             if exceeds_excel_limits(mon_metrics):
                 st.caption("Note: Monthly metrics are too wide for Excel; download provided as CSV.")
             st.download_button(
                 "⬇️ Download Monthly Metrics",
-                make_excel_bytes_from_df(mon_metrics, st.session_state.hide_cols),
+                make_excel_bytes_from_df(format_percent_columns(mon_metrics), st.session_state.hide_cols),
                 file_name=f"{TL_EXPORT_PREFIX}monthly_tl_metrics_{active_month}.xlsx"
             )
 
             # Simple charts (same as BA/Associates)
-            if "Function" in filtered.columns and "Final Score_num" in filtered.columns:
+            if "Function" in filtered.columns and "Final Score" in filtered.columns:
                 final_func = (
-                    filtered.dropna(subset=["Final Score_num", "Function"])
-                            .groupby("Function", as_index=False)["Final Score_num"].mean()
-                            .rename(columns={"Final Score_num": "Avg Final Score (%)"})
+                    filtered.dropna(subset=["Final Score", "Function"])
+                            .groupby("Function", as_index=False, observed=True)["Final Score"].mean()
+                            .rename(columns={"Final Score": "Avg Final Score (%)"})
                 )
                 sel_func = alt.selection_multi(fields=["Function"], bind="legend")
                 chart_a = alt.Chart(final_func).mark_bar().encode(
@@ -3190,14 +4168,14 @@ elif page == "TL Scorecard (Monthly/YTD metrics)":
                 st.altair_chart(chart_a, use_container_width=True)
             else:
                 st.info("Final Score or Function column not found—'Avg Final Score by Function' chart skipped.")
-            if "Final Score_num" in filtered.columns:
+            if "Final Score" in filtered.columns:
                 st.altair_chart(
-                    alt.Chart(filtered.dropna(subset=["Final Score_num"]))
+                    alt.Chart(filtered.dropna(subset=["Final Score"]))
                        .mark_bar()
                        .encode(
-                           x=alt.X("Final Score_num:Q", bin=alt.Bin(step=5), title="Final Score (%)"),
+                           x=alt.X("Final Score:Q", bin=alt.Bin(step=5), title="Final Score (%)"),
                            y=alt.Y("count():Q", title="Count"),
-                           tooltip=[alt.Tooltip("Final Score_num:Q", title="Final Score (%)"), alt.Tooltip("count():Q", title="Count")]
+                           tooltip=[alt.Tooltip("Final Score:Q", title="Final Score (%)"), alt.Tooltip("count():Q", title="Count")]
                        ).properties(title="Final Score Distribution (Monthly, 5% bins)"),
                     use_container_width=True
                 )
@@ -3210,8 +4188,8 @@ elif page == "TL Scorecard (Monthly/YTD metrics)":
                 else:
                     cset1, cset2, cset3, cset4 = st.columns([2,2,2,2])
                     metric_options = get_numeric_metric_options(filtered)
-                    default_metric_list = metric_options if metric_options else ["Final Score_num"]
-                    default_index = default_metric_list.index("Final Score_num") if "Final Score_num" in default_metric_list else 0
+                    default_metric_list = metric_options if metric_options else ["Final Score"]
+                    default_index = default_metric_list.index("Final Score") if "Final Score" in default_metric_list else 0
                     sel_metric = cset1.selectbox("Metric (numeric %)", options=default_metric_list, index=default_index)
                     agg_method = cset2.radio("Aggregation", ["mean", "median"], index=0)
                     dim_candidates = [c for c in ["Function","Team Lead","Function Lead","Domain ID"] if c in filtered.columns]
@@ -3225,7 +4203,7 @@ elif page == "TL Scorecard (Monthly/YTD metrics)":
                     agg_df = add_rank_and_topN(agg_df, dim=dim, metric=sel_metric, top_n=top_n, ascending=ascending)
                     st.altair_chart(
                         bar_chart(agg_df, dim=dim, metric=sel_metric,
-                                  title=f"{agg_method.title()} {sel_metric.replace('_num',' (%)')} by {dim} (Monthly)",
+                                  title=f"{agg_method.title()} {metric_label(sel_metric)} by {dim} (Monthly)",
                                   palette=palette, show_labels=show_labels),
                         use_container_width=True
                     )
@@ -3234,7 +4212,7 @@ elif page == "TL Scorecard (Monthly/YTD metrics)":
                     ref = cH2.radio("Reference line", ["mean", "median"], index=0)
                     st.altair_chart(
                         histogram(filtered, metric=sel_metric, bin_step=bin_step,
-                                  title=f"Distribution of {sel_metric.replace('_num',' (%)')} (Monthly)",
+                                  title=f"Distribution of {metric_label(sel_metric)} (Monthly)",
                                   reference=ref),
                         use_container_width=True
                     )
@@ -3249,10 +4227,9 @@ elif page == "TL Scorecard (Monthly/YTD metrics)":
                         monthly_all = tl_load_combined_cached()
                         monthly_active = monthly_all.merge(active_ids, on="Attachment ID", how="inner")
                         monthly_active["reporting_month"] = monthly_active["reporting_month"].astype(str)
-                        monthly_active = add_numeric_percent_columns(monthly_active)
                         st.altair_chart(
                             line_trend(monthly_active, metric=sel_metric, month_col="reporting_month",
-                                       title=f"Trend by Month (active attachments): {sel_metric.replace('_num',' (%)')}"),
+                                       title=f"Trend by Month (active attachments): {metric_label(sel_metric)}"),
                             use_container_width=True
                         )
                     except Exception:
@@ -3260,34 +4237,29 @@ elif page == "TL Scorecard (Monthly/YTD metrics)":
 
             st.subheader("Filtered Table (latest active TL file)")
             st.caption(f"Showing {len(filtered)} of {len(latest_data)} rows")
-            st.dataframe(filtered if not filtered.empty else pd.DataFrame(), height=480)
+            st.dataframe(format_percent_columns(filtered) if not filtered.empty else pd.DataFrame(), height=480)
             if exceeds_excel_limits(filtered):
                 st.caption("Note: Filtered result is too wide for Excel; download provided as CSV.")
             st.download_button(
                 "⬇️ Download filtered (Monthly)",
-                make_excel_bytes_from_df(filtered, st.session_state.hide_cols),
+                make_excel_bytes_from_df(format_percent_columns(filtered), st.session_state.hide_cols),
                 file_name=f"{TL_EXPORT_PREFIX}monthly_scorecard_filtered.xlsx"
             )
 
             if st.session_state.role == "admin":
                 st.subheader("🛠 Admin — Edit Latest Active TL Data")
                 st.caption("Edit values directly. Saving replaces the data for the latest active TL attachment in combined storage (not the original Excel file).")
-                editable = st.data_editor(latest_data.copy(), num_rows="dynamic", use_container_width=True)
+                editable = st.data_editor(editable_frame(latest_data), num_rows="dynamic", use_container_width=True)
                 if st.button("Save Admin Changes (TL)", type="primary"):
                     try:
                         edited = editable.copy()
-                        edited = convert_percentage_columns(edited)
-                        edited = add_numeric_percent_columns(edited)
+                        edited = type_percent_columns(edited)
                         edited["Attachment ID"] = latest_id
-                        combined_df = tl_load_combined_cached()
-                        combined_df = combined_df[combined_df["Attachment ID"] != latest_id]
-                        combined_df = pd.concat([combined_df, edited], ignore_index=True)
-                        tl_save_combined(combined_df)
+                        COMBINED_STORES["TL"].write_partition(latest_id, edited)
                         tl_log_audit("Admin Save Edit (TL)", latest_id,
                                      latest_row["filename"] if "filename" in latest_row else "",
                                      st.session_state.username or "admin")
                         st.success("Admin changes saved to TL combined storage.")
-                        invalidate_data_caches()  # ensure next UI run fetches fresh files
                     except Exception as e:
                         st.error(f"Failed to save admin changes: {e}")
 
@@ -3296,13 +4268,12 @@ elif page == "TL Scorecard (Monthly/YTD metrics)":
         history = tl_load_history_cached()
         active_mask = _coerce_active_bool(history.get("active", pd.Series([], dtype="object")))
         active_ids = history[active_mask][["id","reporting_month"]].rename(columns={"id":"Attachment ID"})
-        monthly_all = tl_load_combined_cached()
-        ytd = monthly_all.merge(active_ids, on="Attachment ID", how="inner")
+        monthly_all = tl_load_ytd_view_cached()  # active attachments, metrics read on demand
+        ytd = active_rows(monthly_all, active_ids)
         if ytd.empty:
             st.warning("No TL YTD data.")
             st.stop()
         ytd = clean_dataframe_for_display(ytd, st.session_state.hide_cols)
-        ytd = add_numeric_cached(ytd)
 
         def render_ytd_filters_tl(df, label="Filters (YTD)"):
             month_str = _to_month_str_series(df)
@@ -3317,10 +4288,10 @@ elif page == "TL Scorecard (Monthly/YTD metrics)":
                 return f"FY{fy_start}-{str(fy_end)[-2:]}"
             with st.expander(label, expanded=True):
                 c1, c2, c3, c4, c5 = st.columns(5)
-                domain_options = sorted(df["Domain ID"].dropna().astype(str).unique()) if "Domain ID" in df.columns else []
-                func_options = sorted(df["Function"].dropna().astype(str).unique()) if "Function" in df.columns else []
-                flead_options = sorted(df["Function Lead"].dropna().astype(str).unique()) if "Function Lead" in df.columns else []
-                tlead_options = sorted(df["Team Lead"].dropna().astype(str).unique()) if "Team Lead" in df.columns else []
+                domain_options = _dimension_options(df, "Domain ID")
+                func_options = _dimension_options(df, "Function")
+                flead_options = _dimension_options(df, "Function Lead")
+                tlead_options = _dimension_options(df, "Team Lead")
                 d_ids = c1.multiselect("Domain ID", domain_options)
                 funcs = c2.multiselect("Function", func_options)
                 f_leads = c3.multiselect("Function Lead", flead_options)
@@ -3337,8 +4308,10 @@ elif page == "TL Scorecard (Monthly/YTD metrics)":
                 return d_ids, funcs, f_leads, t_leads, months, search
 
         d_ids, funcs, f_leads, t_leads, months, search = render_ytd_filters_tl(ytd)
-        ytd_filtered = filter_combined(ytd, d_ids, funcs, f_leads, t_leads, months)
-        ytd_filtered = apply_search(ytd_filtered, search)
+        ytd_filtered = filter_combined(ytd, d_ids, funcs, f_leads, t_leads, months,
+                                       index=get_filter_index("TL", monthly_all, view="ytd"))
+        if search.strip():  # the index is built on the first search of a data version
+            ytd_filtered = apply_search(ytd_filtered, search, index=get_search_index("TL", monthly_all, view="ytd"))
         ytd_filtered = clean_dataframe_for_display(ytd_filtered, st.session_state.hide_cols)
 
         c1, c2, c3 = st.columns(3)
@@ -3366,9 +4339,9 @@ elif page == "TL Scorecard (Monthly/YTD metrics)":
                 st.info("No YTD data under current filters for advanced visuals.")
             else:
                 cset1, cset2, cset3, cset4 = st.columns([2,2,2,2])
-                metric_options_ytd = get_numeric_metric_options(ytd_filtered)
-                default_metric_list_ytd = metric_options_ytd if metric_options_ytd else ["Final Score_num"]
-                default_index_ytd = default_metric_list_ytd.index("Final Score_num") if "Final Score_num" in default_metric_list_ytd else 0
+                metric_options_ytd = stored_metric_columns("TL")
+                default_metric_list_ytd = metric_options_ytd if metric_options_ytd else ["Final Score"]
+                default_index_ytd = default_metric_list_ytd.index("Final Score") if "Final Score" in default_metric_list_ytd else 0
                 sel_metric_ytd = cset1.selectbox("Metric (numeric %)", options=default_metric_list_ytd, index=default_index_ytd)
                 agg_method_ytd = cset2.radio("Aggregation", ["mean", "median"], index=0)
                 dim_candidates_ytd = [c for c in ["Function","Team Lead","Function Lead","Domain ID"] if c in ytd_filtered.columns]
@@ -3378,11 +4351,13 @@ elif page == "TL Scorecard (Monthly/YTD metrics)":
                 top_n_ytd = cN1.slider("Top N", min_value=5, max_value=50, value=15, step=5)
                 ascending_ytd = cN2.checkbox("Show lowest first", value=False)
                 show_labels_ytd = cN3.checkbox("Bar labels", value=True)
-                agg_ytd = aggregate_df(ytd_filtered, dim=dim_ytd, metric=sel_metric_ytd, method=agg_method_ytd)
+                ytd_charted = load_view_columns("TL", monthly_all, ytd_filtered, [sel_metric_ytd])
+
+                agg_ytd = aggregate_df(ytd_charted, dim=dim_ytd, metric=sel_metric_ytd, method=agg_method_ytd)
                 agg_ytd = add_rank_and_topN(agg_ytd, dim=dim_ytd, metric=sel_metric_ytd, top_n=top_n_ytd, ascending=ascending_ytd)
                 st.altair_chart(
                     bar_chart(agg_ytd, dim=dim_ytd, metric=sel_metric_ytd,
-                              title=f"{agg_method_ytd.title()} {sel_metric_ytd.replace('_num',' (%)')} by {dim_ytd} (YTD)",
+                              title=f"{agg_method_ytd.title()} {metric_label(sel_metric_ytd)} by {dim_ytd} (YTD)",
                               palette=palette_ytd, show_labels=show_labels_ytd),
                     use_container_width=True
                 )
@@ -3390,41 +4365,32 @@ elif page == "TL Scorecard (Monthly/YTD metrics)":
                 bin_step_ytd = cH1.slider("Histogram bin step (percentage points)", 1, 20, 5, 1)
                 ref_ytd = cH2.radio("Reference line", ["mean", "median"], index=0)
                 st.altair_chart(
-                    histogram(ytd_filtered, metric=sel_metric_ytd, bin_step=bin_step_ytd,
-                              title=f"Distribution of {sel_metric_ytd.replace('_num',' (%)')} (YTD)",
+                    histogram(ytd_charted, metric=sel_metric_ytd, bin_step=bin_step_ytd,
+                              title=f"Distribution of {metric_label(sel_metric_ytd)} (YTD)",
                               reference=ref_ytd),
                     use_container_width=True
                 )
                 st.altair_chart(
-                    boxplot(ytd_filtered, dim=dim_ytd, metric=sel_metric_ytd, title=f"Distribution by {dim_ytd} (YTD)"),
+                    boxplot(ytd_charted, dim=dim_ytd, metric=sel_metric_ytd, title=f"Distribution by {dim_ytd} (YTD)"),
                     use_container_width=True
                 )
                 if "Function" in ytd_filtered.columns and "Team Lead" in ytd_filtered.columns:
                     st.altair_chart(
-                        heatmap(ytd_filtered, row_dim="Function", col_dim="Team Lead", metric=sel_metric_ytd,
-                                title=f"Heatmap: {sel_metric_ytd.replace('_num',' (%)')} (Function x Team Lead) - YTD"),
+                        heatmap(ytd_charted, row_dim="Function", col_dim="Team Lead", metric=sel_metric_ytd,
+                                title=f"Heatmap: {metric_label(sel_metric_ytd)} (Function x Team Lead) - YTD"),
                         use_container_width=True
                     )
                 else:
-                    ytd_norm = ytd_filtered.copy()
+                    ytd_norm = ytd_charted.copy()
                     ytd_norm["Month_norm"] = _to_month_str_series(ytd_norm)
                     if "Function" in ytd_norm.columns and "Month_norm" in ytd_norm.columns:
                         st.altair_chart(
                             heatmap(ytd_norm, row_dim="Function", col_dim="Month_norm", metric=sel_metric_ytd,
-                                    title=f"Heatmap: {sel_metric_ytd.replace('_num',' (%)')} (Function x Month) - YTD"),
+                                    title=f"Heatmap: {metric_label(sel_metric_ytd)} (Function x Month) - YTD"),
                             use_container_width=True
                         )
 
-        st.subheader("Filtered YTD Table (TL)")
-        st.caption(f"Showing {len(ytd_filtered)} of {len(ytd)} rows")
-        st.dataframe(ytd_filtered, height=480)
-        if exceeds_excel_limits(ytd_filtered):
-            st.caption("Note: Filtered result is too wide for Excel; download provided as CSV.")
-        st.download_button(
-            "⬇️ Download filtered (YTD)",
-            make_excel_bytes_from_df(ytd_filtered, st.session_state.hide_cols),
-            file_name=f"{TL_EXPORT_PREFIX}ytd_dashboard_filtered.xlsx"
-        )
+        render_filtered_ytd_table("TL", monthly_all, ytd, ytd_filtered, "Filtered YTD Table (TL)", TL_EXPORT_PREFIX)
 
 
 # -------------------------------------
@@ -3435,61 +4401,34 @@ elif page == "PL Scorecard (Monthly/YTD metrics)":
     mode = st.radio("View mode", ["Monthly", "YTD"], index=0, horizontal=True)
 
     if mode == "Monthly":
-        latest_row, latest_id, latest_data = pl_get_latest_monthly_data()
+        combined_df = pl_load_combined_cached()
+        latest_row, latest_id, latest_data = pl_get_latest_monthly_data(combined_df)
         if latest_data is None or latest_data.empty:
             st.warning("No active PL file available.")
         else:
             latest_data = clean_dataframe_for_display(latest_data, st.session_state.hide_cols)
-            latest_data = add_numeric_cached(latest_data)
 
             def render_shared_filters_pl(df, label="Filters (Monthly)"):
                 month_str = _to_month_str_series(df)
                 month_options = sorted([m for m in month_str.dropna().unique() if m and str(m).strip() != ""])
                 with st.expander(label, expanded=True):
                     c1, c2, c3, c4, c5 = st.columns(5)
-                    domain_options = sorted(df["Domain ID"].dropna().astype(str).unique()) if "Domain ID" in df.columns else []
-                    func_options = sorted(df["Function"].dropna().astype(str).unique()) if "Function" in df.columns else []
-                    flead_options = sorted(df["Function Lead"].dropna().astype(str).unique()) if "Function Lead" in df.columns else []
-                    tlead_options = sorted(df["Team Lead"].dropna().astype(str).unique()) if "Team Lead" in df.columns else []
-                    d_ids = c1.multiselect("Domain ID (select one to comment)", domain_options)
+                    domain_options = _dimension_options(df, "Domain ID")
+                    func_options = _dimension_options(df, "Function")
+                    flead_options = _dimension_options(df, "Function Lead")
+                    tlead_options = _dimension_options(df, "Team Lead")
+                    d_ids = c1.multiselect("Domain ID (select to comment)", domain_options)
                     funcs = c2.multiselect("Function", func_options)
                     f_leads = c3.multiselect("Function Lead", flead_options)
                     t_leads = c4.multiselect("Team Lead", tlead_options)
                     months = c5.multiselect("Month (YYYY-MM)", month_options)
 
-                    if d_ids and len(d_ids) == 1 and months and len(months) == 1:
-                        sel_domain = str(d_ids[0]); sel_month = str(months[0])
-                        st.markdown("**Monthly feedback/feedforward** (max 500 characters)")
-                        fb = pl_load_feedback()
-                        existing = fb[(fb["Domain ID"].astype(str) == sel_domain) & (fb["Month"].astype(str) == sel_month)]
-                        existing_text = existing.iloc[0]["Feedback"] if not existing.empty else ""
-                        comment = st.text_area(
-                            "Enter feedback for the selected Domain ID & Month",
-                            value=str(existing_text),
-                            max_chars=MAX_FEEDBACK_CHARS,
-                            height=120
-                        )
-                        password = st.text_input("Enter Team Lead password to confirm", type="password")
-                        if st.button("Submit Comment"):
-                            if password == FEEDBACK_PASSWORD:
-                                sel_df = df[df["Domain ID"].astype(str) == sel_domain]
-                                if not sel_df.empty:
-                                    name_val = sel_df.iloc[0]["Name"] if "Name" in sel_df.columns else sel_domain
-                                    tl_val = sel_df.iloc[0]["Team Lead"] if "Team Lead" in sel_df.columns else ""
-                                    if comment and comment.strip():
-                                        pl_upsert_feedback(sel_domain, str(name_val), sel_month, str(tl_val),
-                                                          comment.strip(), st.session_state.username or "user")
-                                        st.success("Feedback saved.")
-                                    else:
-                                        st.warning("Please enter a feedback comment before submitting.")
-                                else:
-                                    st.error("Selected Domain ID not found in current dataset.")
-                            else:
-                                st.error("Incorrect password. Feedback not saved.")
+                    render_feedback_entry("PL", df, d_ids, months)
                     return d_ids, funcs, f_leads, t_leads, months, None
 
             d_ids, funcs, f_leads, t_leads, months, _ = render_shared_filters_pl(latest_data)
-            filtered = filter_combined(latest_data, d_ids, funcs, f_leads, t_leads, months)
+            filtered = filter_combined(latest_data, d_ids, funcs, f_leads, t_leads, months,
+                                       index=get_filter_index("PL", combined_df))
             filtered = clean_dataframe_for_display(filtered, st.session_state.hide_cols)
 
             c1, c2, c3, c4 = st.columns(4)
@@ -3505,21 +4444,21 @@ elif page == "PL Scorecard (Monthly/YTD metrics)":
 
             mon_metrics = monthly_metrics_table_pl(filtered, report_month=active_month, group_by="Domain ID")
             st.caption(f"Showing {len(mon_metrics)} monthly rows (from filtered view)")
-            st.dataframe(mon_metrics, height=420)
+            st.dataframe(format_percent_columns(mon_metrics), height=420)
             if exceeds_excel_limits(mon_metrics):
                 st.caption("Note: Monthly metrics are too wide for Excel; download provided as CSV.")
             st.download_button(
                 "⬇️ Download Monthly Metrics",
-                make_excel_bytes_from_df(mon_metrics, st.session_state.hide_cols),
+                make_excel_bytes_from_df(format_percent_columns(mon_metrics), st.session_state.hide_cols),
                 file_name=f"{PL_EXPORT_PREFIX}monthly_pl_metrics_{active_month}.xlsx"
             )
 
             # Simple charts (same as BA/Associates)
-            if "Function" in filtered.columns and "Final Score_num" in filtered.columns:
+            if "Function" in filtered.columns and "Final Score" in filtered.columns:
                 final_func = (
-                    filtered.dropna(subset=["Final Score_num", "Function"])
-                            .groupby("Function", as_index=False)["Final Score_num"].mean()
-                            .rename(columns={"Final Score_num": "Avg Final Score (%)"})
+                    filtered.dropna(subset=["Final Score", "Function"])
+                            .groupby("Function", as_index=False, observed=True)["Final Score"].mean()
+                            .rename(columns={"Final Score": "Avg Final Score (%)"})
                 )
                 sel_func = alt.selection_multi(fields=["Function"], bind="legend")
                 chart_a = alt.Chart(final_func).mark_bar().encode(
@@ -3531,14 +4470,14 @@ elif page == "PL Scorecard (Monthly/YTD metrics)":
                 st.altair_chart(chart_a, use_container_width=True)
             else:
                 st.info("Final Score or Function column not found—'Avg Final Score by Function' chart skipped.")
-            if "Final Score_num" in filtered.columns:
+            if "Final Score" in filtered.columns:
                 st.altair_chart(
-                    alt.Chart(filtered.dropna(subset=["Final Score_num"]))
+                    alt.Chart(filtered.dropna(subset=["Final Score"]))
                        .mark_bar()
                        .encode(
-                           x=alt.X("Final Score_num:Q", bin=alt.Bin(step=5), title="Final Score (%)"),
+                           x=alt.X("Final Score:Q", bin=alt.Bin(step=5), title="Final Score (%)"),
                            y=alt.Y("count():Q", title="Count"),
-                           tooltip=[alt.Tooltip("Final Score_num:Q", title="Final Score (%)"), alt.Tooltip("count():Q", title="Count")]
+                           tooltip=[alt.Tooltip("Final Score:Q", title="Final Score (%)"), alt.Tooltip("count():Q", title="Count")]
                        ).properties(title="Final Score Distribution (Monthly, 5% bins)"),
                     use_container_width=True
                 )
@@ -3551,8 +4490,8 @@ elif page == "PL Scorecard (Monthly/YTD metrics)":
                 else:
                     cset1, cset2, cset3, cset4 = st.columns([2,2,2,2])
                     metric_options = get_numeric_metric_options(filtered)
-                    default_metric_list = metric_options if metric_options else ["Final Score_num"]
-                    default_index = default_metric_list.index("Final Score_num") if "Final Score_num" in default_metric_list else 0
+                    default_metric_list = metric_options if metric_options else ["Final Score"]
+                    default_index = default_metric_list.index("Final Score") if "Final Score" in default_metric_list else 0
                     sel_metric = cset1.selectbox("Metric (numeric %)", options=default_metric_list, index=default_index)
                     agg_method = cset2.radio("Aggregation", ["mean", "median"], index=0)
                     dim_candidates = [c for c in ["Function","Team Lead","Function Lead","Domain ID"] if c in filtered.columns]
@@ -3566,7 +4505,7 @@ elif page == "PL Scorecard (Monthly/YTD metrics)":
                     agg_df = add_rank_and_topN(agg_df, dim=dim, metric=sel_metric, top_n=top_n, ascending=ascending)
                     st.altair_chart(
                         bar_chart(agg_df, dim=dim, metric=sel_metric,
-                                  title=f"{agg_method.title()} {sel_metric.replace('_num',' (%)')} by {dim} (Monthly)",
+                                  title=f"{agg_method.title()} {metric_label(sel_metric)} by {dim} (Monthly)",
                                   palette=palette, show_labels=show_labels),
                         use_container_width=True
                     )
@@ -3575,7 +4514,7 @@ elif page == "PL Scorecard (Monthly/YTD metrics)":
                     ref = cH2.radio("Reference line", ["mean", "median"], index=0)
                     st.altair_chart(
                         histogram(filtered, metric=sel_metric, bin_step=bin_step,
-                                  title=f"Distribution of {sel_metric.replace('_num',' (%)')} (Monthly)",
+                                  title=f"Distribution of {metric_label(sel_metric)} (Monthly)",
                                   reference=ref),
                         use_container_width=True
                     )
@@ -3590,10 +4529,9 @@ elif page == "PL Scorecard (Monthly/YTD metrics)":
                         monthly_all = pl_load_combined_cached()
                         monthly_active = monthly_all.merge(active_ids, on="Attachment ID", how="inner")
                         monthly_active["reporting_month"] = monthly_active["reporting_month"].astype(str)
-                        monthly_active = add_numeric_percent_columns(monthly_active)
                         st.altair_chart(
                             line_trend(monthly_active, metric=sel_metric, month_col="reporting_month",
-                                       title=f"Trend by Month (active attachments): {sel_metric.replace('_num',' (%)')}"),
+                                       title=f"Trend by Month (active attachments): {metric_label(sel_metric)}"),
                             use_container_width=True
                         )
                     except Exception:
@@ -3601,34 +4539,29 @@ elif page == "PL Scorecard (Monthly/YTD metrics)":
 
             st.subheader("Filtered Table (latest active PL file)")
             st.caption(f"Showing {len(filtered)} of {len(latest_data)} rows")
-            st.dataframe(filtered if not filtered.empty else pd.DataFrame(), height=480)
+            st.dataframe(format_percent_columns(filtered) if not filtered.empty else pd.DataFrame(), height=480)
             if exceeds_excel_limits(filtered):
                 st.caption("Note: Filtered result is too wide for Excel; download provided as CSV.")
             st.download_button(
                 "⬇️ Download filtered (Monthly)",
-                make_excel_bytes_from_df(filtered, st.session_state.hide_cols),
+                make_excel_bytes_from_df(format_percent_columns(filtered), st.session_state.hide_cols),
                 file_name=f"{PL_EXPORT_PREFIX}monthly_scorecard_filtered.xlsx"
             )
 
             if st.session_state.role == "admin":
                 st.subheader("🛠 Admin — Edit Latest Active PL Data")
                 st.caption("Edit values directly. Saving replaces the data for the latest active PL attachment in combined storage (not the original Excel file).")
-                editable = st.data_editor(latest_data.copy(), num_rows="dynamic", use_container_width=True)
+                editable = st.data_editor(editable_frame(latest_data), num_rows="dynamic", use_container_width=True)
                 if st.button("Save Admin Changes (PL)", type="primary"):
                     try:
                         edited = editable.copy()
-                        edited = convert_percentage_columns(edited)
-                        edited = add_numeric_percent_columns(edited)
+                        edited = type_percent_columns(edited)
                         edited["Attachment ID"] = latest_id
-                        combined_df = pl_load_combined_cached()
-                        combined_df = combined_df[combined_df["Attachment ID"] != latest_id]
-                        combined_df = pd.concat([combined_df, edited], ignore_index=True)
-                        pl_save_combined(combined_df)
+                        COMBINED_STORES["PL"].write_partition(latest_id, edited)
                         pl_log_audit("Admin Save Edit (PL)", latest_id,
                                      latest_row["filename"] if "filename" in latest_row else "",
                                      st.session_state.username or "admin")
                         st.success("Admin changes saved to PL combined storage.")
-                        invalidate_data_caches()  # ensure next UI run fetches fresh files
                     except Exception as e:
                         st.error(f"Failed to save admin changes: {e}")
 
@@ -3637,13 +4570,12 @@ elif page == "PL Scorecard (Monthly/YTD metrics)":
         history = pl_load_history_cached()
         active_mask = _coerce_active_bool(history.get("active", pd.Series([], dtype="object")))
         active_ids = history[active_mask][["id","reporting_month"]].rename(columns={"id":"Attachment ID"})
-        monthly_all = pl_load_combined_cached()
-        ytd = monthly_all.merge(active_ids, on="Attachment ID", how="inner")
+        monthly_all = pl_load_ytd_view_cached()  # active attachments, metrics read on demand
+        ytd = active_rows(monthly_all, active_ids)
         if ytd.empty:
             st.warning("No PL YTD data.")
             st.stop()
         ytd = clean_dataframe_for_display(ytd, st.session_state.hide_cols)
-        ytd = add_numeric_cached(ytd)
 
         def render_ytd_filters_pl(df, label="Filters (YTD)"):
             month_str = _to_month_str_series(df)
@@ -3658,10 +4590,10 @@ elif page == "PL Scorecard (Monthly/YTD metrics)":
                 return f"FY{fy_start}-{str(fy_end)[-2:]}"
             with st.expander(label, expanded=True):
                 c1, c2, c3, c4, c5 = st.columns(5)
-                domain_options = sorted(df["Domain ID"].dropna().astype(str).unique()) if "Domain ID" in df.columns else []
-                func_options = sorted(df["Function"].dropna().astype(str).unique()) if "Function" in df.columns else []
-                flead_options = sorted(df["Function Lead"].dropna().astype(str).unique()) if "Function Lead" in df.columns else []
-                tlead_options = sorted(df["Team Lead"].dropna().astype(str).unique()) if "Team Lead" in df.columns else []
+                domain_options = _dimension_options(df, "Domain ID")
+                func_options = _dimension_options(df, "Function")
+                flead_options = _dimension_options(df, "Function Lead")
+                tlead_options = _dimension_options(df, "Team Lead")
                 d_ids = c1.multiselect("Domain ID", domain_options)
                 funcs = c2.multiselect("Function", func_options)
                 f_leads = c3.multiselect("Function Lead", flead_options)
@@ -3678,8 +4610,10 @@ elif page == "PL Scorecard (Monthly/YTD metrics)":
                 return d_ids, funcs, f_leads, t_leads, months, search
 
         d_ids, funcs, f_leads, t_leads, months, search = render_ytd_filters_pl(ytd)
-        ytd_filtered = filter_combined(ytd, d_ids, funcs, f_leads, t_leads, months)
-        ytd_filtered = apply_search(ytd_filtered, search)
+        ytd_filtered = filter_combined(ytd, d_ids, funcs, f_leads, t_leads, months,
+                                       index=get_filter_index("PL", monthly_all, view="ytd"))
+        if search.strip():  # the index is built on the first search of a data version
+            ytd_filtered = apply_search(ytd_filtered, search, index=get_search_index("PL", monthly_all, view="ytd"))
         ytd_filtered = clean_dataframe_for_display(ytd_filtered, st.session_state.hide_cols)
 
         c1, c2, c3 = st.columns(3)
@@ -3707,9 +4641,9 @@ elif page == "PL Scorecard (Monthly/YTD metrics)":
                 st.info("No YTD data under current filters for advanced visuals.")
             else:
                 cset1, cset2, cset3, cset4 = st.columns([2,2,2,2])
-                metric_options_ytd = get_numeric_metric_options(ytd_filtered)
-                default_metric_list_ytd = metric_options_ytd if metric_options_ytd else ["Final Score_num"]
-                default_index_ytd = default_metric_list_ytd.index("Final Score_num") if "Final Score_num" in default_metric_list_ytd else 0
+                metric_options_ytd = stored_metric_columns("PL")
+                default_metric_list_ytd = metric_options_ytd if metric_options_ytd else ["Final Score"]
+                default_index_ytd = default_metric_list_ytd.index("Final Score") if "Final Score" in default_metric_list_ytd else 0
                 sel_metric_ytd = cset1.selectbox("Metric (numeric %)", options=default_metric_list_ytd, index=default_index_ytd)
                 agg_method_ytd = cset2.radio("Aggregation", ["mean", "median"], index=0)
                 dim_candidates_ytd = [c for c in ["Function","Team Lead","Function Lead","Domain ID"] if c in ytd_filtered.columns]
@@ -3719,11 +4653,13 @@ elif page == "PL Scorecard (Monthly/YTD metrics)":
                 top_n_ytd = cN1.slider("Top N", min_value=5, max_value=50, value=15, step=5)
                 ascending_ytd = cN2.checkbox("Show lowest first", value=False)
                 show_labels_ytd = cN3.checkbox("Bar labels", value=True)
-                agg_ytd = aggregate_df(ytd_filtered, dim=dim_ytd, metric=sel_metric_ytd, method=agg_method_ytd)
+                ytd_charted = load_view_columns("PL", monthly_all, ytd_filtered, [sel_metric_ytd])
+
+                agg_ytd = aggregate_df(ytd_charted, dim=dim_ytd, metric=sel_metric_ytd, method=agg_method_ytd)
                 agg_ytd = add_rank_and_topN(agg_ytd, dim=dim_ytd, metric=sel_metric_ytd, top_n=top_n_ytd, ascending=ascending_ytd)
                 st.altair_chart(
                     bar_chart(agg_ytd, dim=dim_ytd, metric=sel_metric_ytd,
-                              title=f"{agg_method_ytd.title()} {sel_metric_ytd.replace('_num',' (%)')} by {dim_ytd} (YTD)",
+                              title=f"{agg_method_ytd.title()} {metric_label(sel_metric_ytd)} by {dim_ytd} (YTD)",
                               palette=palette_ytd, show_labels=show_labels_ytd),
                     use_container_width=True
                 )
@@ -3731,41 +4667,32 @@ elif page == "PL Scorecard (Monthly/YTD metrics)":
                 bin_step_ytd = cH1.slider("Histogram bin step (percentage points)", 1, 20, 5, 1)
                 ref_ytd = cH2.radio("Reference line", ["mean", "median"], index=0)
                 st.altair_chart(
-                    histogram(ytd_filtered, metric=sel_metric_ytd, bin_step=bin_step_ytd,
-                              title=f"Distribution of {sel_metric_ytd.replace('_num',' (%)')} (YTD)",
+                    histogram(ytd_charted, metric=sel_metric_ytd, bin_step=bin_step_ytd,
+                              title=f"Distribution of {metric_label(sel_metric_ytd)} (YTD)",
                               reference=ref_ytd),
                     use_container_width=True
                 )
                 st.altair_chart(
-                    boxplot(ytd_filtered, dim=dim_ytd, metric=sel_metric_ytd, title=f"Distribution by {dim_ytd} (YTD)"),
+                    boxplot(ytd_charted, dim=dim_ytd, metric=sel_metric_ytd, title=f"Distribution by {dim_ytd} (YTD)"),
                     use_container_width=True
                 )
                 if "Function" in ytd_filtered.columns and "Project Lead" in ytd_filtered.columns:
                     st.altair_chart(
-                        heatmap(ytd_filtered, row_dim="Function", col_dim="Team Lead", metric=sel_metric_ytd,
-                                title=f"Heatmap: {sel_metric_ytd.replace('_num',' (%)')} (Function x Team Lead) - YTD"),
+                        heatmap(ytd_charted, row_dim="Function", col_dim="Team Lead", metric=sel_metric_ytd,
+                                title=f"Heatmap: {metric_label(sel_metric_ytd)} (Function x Team Lead) - YTD"),
                         use_container_width=True
                     )
                 else:
-                    ytd_norm = ytd_filtered.copy()
+                    ytd_norm = ytd_charted.copy()
                     ytd_norm["Month_norm"] = _to_month_str_series(ytd_norm)
                     if "Function" in ytd_norm.columns and "Month_norm" in ytd_norm.columns:
                         st.altair_chart(
                             heatmap(ytd_norm, row_dim="Function", col_dim="Month_norm", metric=sel_metric_ytd,
-                                    title=f"Heatmap: {sel_metric_ytd.replace('_num',' (%)')} (Function x Month) - YTD"),
+                                    title=f"Heatmap: {metric_label(sel_metric_ytd)} (Function x Month) - YTD"),
                             use_container_width=True
                         )
 
-        st.subheader("Filtered YTD Table (PL)")
-        st.caption(f"Showing {len(ytd_filtered)} of {len(ytd)} rows")
-        st.dataframe(ytd_filtered, height=480)
-        if exceeds_excel_limits(ytd_filtered):
-            st.caption("Note: Filtered result is too wide for Excel; download provided as CSV.")
-        st.download_button(
-            "⬇️ Download filtered (YTD)",
-            make_excel_bytes_from_df(ytd_filtered, st.session_state.hide_cols),
-            file_name=f"{PL_EXPORT_PREFIX}ytd_dashboard_filtered.xlsx"
-        )
+        render_filtered_ytd_table("PL", monthly_all, ytd, ytd_filtered, "Filtered YTD Table (PL)", PL_EXPORT_PREFIX)
 
 
 
@@ -3792,50 +4719,60 @@ elif page == "Upload & Admin":
 
     file = st.file_uploader("Upload Excel (.xlsx with 'Data' sheet)", type=["xlsx"])
     if file:
+        # Staged by content hash: reruns and "Process Upload" reuse this parse (the hash is memoized per file)
+        digests = st.session_state.setdefault("upload_digests", {})
+        if file.file_id not in digests:
+            digests[file.file_id] = upload_digest(file.getvalue())
         try:
-            data_df = read_excel_bytes(file.getvalue())
-            st.write("Data Preview:")
-            st.dataframe(clean_dataframe_for_display(convert_percentage_columns(data_df).head(20), st.session_state.hide_cols))
+            staged_df, staged_error = preview_upload(file.getvalue(), digests[file.file_id])
+            if staged_error:
+                st.error(f"Preview failed: {staged_error}")
+            else:
+                st.write("Data Preview:")
+                st.dataframe(clean_dataframe_for_display(format_percent_columns(staged_df.head(20)), st.session_state.hide_cols))
+                missing_preview = validate_required_columns(staged_df)
+                if missing_preview:
+                    st.warning(f"Missing required columns in Data sheet: {', '.join(missing_preview)}")
         except Exception as e:
             st.error(f"Preview failed: {e}")
 
-    detected_dataset = None
+    detected_dataset = detect_dataset(file.name) if file else None
     if file:
-        fname_lower = file.name.lower()
-        if "business analyst" in fname_lower:
-            detected_dataset = "BA"
-            st.info("Detected dataset: **Business Analyst** (will be routed to BA storage).")
-        elif "associate" in fname_lower:
-            detected_dataset = "Associates"
-            st.info("Detected dataset: **Associates** (will be routed to Associates storage).")
-        elif "process expert" in fname_lower:  # NEW
-            detected_dataset = "PE"
-            st.info("Detected dataset: **Process Expert** (will be routed to PE storage).")
-        elif "team lead" in fname_lower:  # NEW
-            detected_dataset = "TL"
-            st.info("Detected dataset: **Team Lead** (will be routed to TL storage).")
-        elif "project lead" in fname_lower:  # NEW
-            detected_dataset = "PL"
-            st.info("Detected dataset: **Project Lead** (will be routed to PL storage).")
+        if detected_dataset:
+            st.info(f"Detected dataset: **{DATASET_LABELS[detected_dataset]}** (will be routed to {detected_dataset} storage).")
         else:
             st.warning("Filename does not include 'Associate', 'Business Analyst', 'Process Expert', 'Team Lead' or 'Project Lead'. Please include one of these terms for proper routing.")
 
     if st.button("Process Upload", disabled=(file is None or detected_dataset is None)):
-        if detected_dataset == "BA":
-            ok, msg, pd_preview = ba_process_upload(file.name, file.getvalue(), st.session_state.username)
-        elif detected_dataset == "PE":  # NEW
-            ok, msg, pd_preview = pe_process_upload(file.name, file.getvalue(), st.session_state.username)
-        elif detected_dataset == "TL":  # NEW
-            ok, msg, pd_preview = tl_process_upload(file.name, file.getvalue(), st.session_state.username)
-        elif detected_dataset == "PL":  # NEW
-            ok, msg, pd_preview = pl_process_upload(file.name, file.getvalue(), st.session_state.username)
-        else:
-            ok, msg, pd_preview = process_upload(file.name, file.getvalue(), st.session_state.username)
-        if ok:
-            st.success(msg)
-            st.dataframe(clean_dataframe_for_display(pd_preview, st.session_state.hide_cols))
-        else:
-            st.error(msg)
+        # Processed by the background worker; the page stays usable and the job list below tracks it
+        job_id = get_ingest_queue().submit(detected_dataset, file.name, file.getvalue(), st.session_state.username)
+        st.session_state["ingest_job"] = job_id
+        st.info(f"Upload queued as job {job_id}.")
+
+    with st.expander("Bulk upload (several files, e.g. every dataset for a month)"):
+        bulk_files = st.file_uploader(
+            "Upload Excel files (.xlsx with 'Data' sheet)", type=["xlsx"], accept_multiple_files=True, key="bulk_upload"
+        )
+        bulk_routed = [(f, detect_dataset(f.name)) for f in bulk_files or []]
+        if bulk_routed:
+            st.dataframe(pd.DataFrame({
+                "File": [f.name for f, _ in bulk_routed],
+                "Dataset": [DATASET_LABELS[d] if d else "not routed (skipped)" for _, d in bulk_routed],
+            }), hide_index=True)
+            if any(d is None for _, d in bulk_routed):
+                st.warning("Files without 'Associate', 'Business Analyst', 'Process Expert', 'Team Lead' or 'Project Lead' in the name are skipped.")
+        # Files are parsed in parallel worker processes, then committed one by one in the order listed
+        if st.button("Process Uploads", disabled=not any(d for _, d in bulk_routed)):
+            job_ids = get_ingest_queue().submit_batch(
+                [(d, f.name, f.getvalue()) for f, d in bulk_routed if d], st.session_state.username
+            )
+            st.info(f"{len(job_ids)} uploads queued.")
+    watcher = get_drop_watcher()
+    if watcher is not None:
+        st.caption(f"Drop folder: {watcher.directory} — polled every {watcher.interval:g}s, last at {watcher.last_poll or 'n/a'}. "
+                   "Ingested files move to processed/, rejected ones to failed/."
+                   + (f" Last poll failed at {watcher.last_error}" if watcher.last_error else ""))
+    ingest_jobs_panel()
 
     st.divider()
     st.subheader("Manage Attachments")
@@ -3927,6 +4864,36 @@ elif page == "Upload & Admin":
                     ok, msg = pl_mark_valid_and_rebuild(pl_selected_id, pl_make_active, st.session_state.username)
                     st.success(msg) if ok else st.error(msg)
 
+    st.divider()
+    st.subheader("Metadata Exports")
+    st.caption("History and feedback live in `metadata.db`, the audit log in `audit/*.jsonl`; download them here as spreadsheets.")
+    exp_dataset = st.selectbox("Dataset", DATASET_KEYS, key="meta_export_dataset")
+    e1, e2, e3 = st.columns(3)
+    # Each export reads a whole table (or every journal segment) and writes a workbook, so only build it when asked
+    for col, label, tables in [(e1, "History", HISTORY_TABLES), (e3, "Feedback", FEEDBACK_TABLES)]:
+        if col.button(f"Prepare {label} export", use_container_width=True):
+            col.download_button(
+                f"⬇️ Download {label}",
+                export_metadata_xlsx(tables[exp_dataset]),
+                file_name=f"{tables[exp_dataset]}.xlsx",
+                use_container_width=True
+            )
+    if e2.button("Prepare Audit Log export", use_container_width=True):
+        e2.download_button(
+            "⬇️ Download Audit Log",
+            export_audit_xlsx(exp_dataset),
+            file_name=f"{AUDIT_JOURNALS[exp_dataset]}.xlsx",
+            use_container_width=True
+        )
+
+    with st.expander("Shared data cache (memory)"):
+        cache_stats = pd.DataFrame(get_data_cache().stats() + get_staged_uploads().stats())
+        if cache_stats.empty:
+            st.caption("Nothing loaded yet.")
+        else:
+            st.caption(f"One copy per dataset shared by all sessions — {cache_stats['MB'].sum():.1f} MB total.")
+            st.dataframe(cache_stats, hide_index=True, use_container_width=True)
+
 
 st.divider()
 st.subheader("Admin Notes")
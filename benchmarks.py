@@ -0,0 +1,406 @@
+"""
+Ingest micro-benchmarks. Run with:  python benchmarks.py [rows] [cols]
+
+Each benchmark checks the current implementation against the previous one on the same
+synthetic data before timing them, so a speedup can't come from changed results.
+"""
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+import io
+
+import numpy as np
+import pandas as pd
+
+import ingest
+
+REQUIRED_COLS = ["Domain ID", "Function", "Function Lead", "Team Lead"]
+
+
+# -------------------------------------
+# Reference implementations (percent text + per-load `_num` companions)
+# -------------------------------------
+def legacy_convert_percentage_columns(df: pd.DataFrame) -> pd.DataFrame:
+    if df is None or df.empty:
+        return df
+    cols_to_convert = [col for col in df.columns if ingest.looks_like_percent_col(str(col))]
+    def to_percent_str(x):
+        if pd.isna(x): return x
+        s = str(x).strip().replace(" ", "").replace(",", ".")
+        if s.endswith("%"):
+            try:
+                val = float(s[:-1])
+                return f"{round(val, 2)}%"
+            except:
+                return s
+        try:
+            v = float(s)
+            return f"{round(v*100 if v <= 1.5 else v, 2)}%"
+        except:
+            return x
+    for col in cols_to_convert:
+        df[col] = df[col].apply(to_percent_str)
+    return df
+
+def legacy_add_numeric_percent_columns(df: pd.DataFrame) -> pd.DataFrame:
+    if df is None or df.empty:
+        return df
+    for col in df.columns:
+        if not ingest.looks_like_percent_col(str(col)):
+            continue
+        s = df[col].astype(str).str.strip().str.replace(" ", "", regex=False).str.replace(",", ".", regex=False)
+        s = s.str.replace("%", "", regex=False)
+        num = pd.to_numeric(s, errors="coerce")
+        if num.notna().any():
+            num = num.where(num > 1.5, num * 100)
+            df[f"{col}_num"] = num
+    return df
+
+def legacy_month_str_series(df: pd.DataFrame) -> pd.Series:
+    candidates = [c for c in ["Month", "Reporting Month", "Report Month", "Date"] if c in df.columns]
+    if not candidates:
+        return pd.Series(dtype="object", index=df.index)
+    s = df[candidates[0]]
+    out = pd.to_datetime(s, errors="coerce").dt.strftime("%Y-%m")
+    if out.isna().all():
+        out = s.astype(str).str.strip()
+    return out
+
+def legacy_read_data_sheet(file_bytes):
+    xls = pd.ExcelFile(io.BytesIO(file_bytes), engine="openpyxl")
+    raw = pd.read_excel(xls, sheet_name="Data", header=None)
+    header_idx = 0
+    for i in range(min(10, len(raw))):
+        row = [str(v).strip() for v in raw.iloc[i].tolist()]
+        if all(col in row for col in REQUIRED_COLS):
+            header_idx = i
+            break
+    df = pd.read_excel(xls, sheet_name="Data", header=header_idx)
+    df.columns = df.columns.str.strip()
+    return df
+
+
+# -------------------------------------
+# Synthetic upload
+# -------------------------------------
+def make_scorecard_frame(rows: int = 50_000, cols: int = 60, seed: int = 7) -> pd.DataFrame:
+    """Percent-like columns in the shapes real uploads mix: fractions, '%'-strings, comma decimals, blanks, text."""
+    rng = np.random.default_rng(seed)
+    data = {
+        "Domain ID": [f"D{i:06d}" for i in range(rows)],
+        "Name": rng.choice(["Asha", "Ben", "Chen", "Dana", "Eli"], rows),
+        "Function": rng.choice(["IT", "HR", "Finance", "Ops", "Sales", "Legal"], rows),
+        "Team Lead": np.char.add("TL", rng.integers(0, 200, rows).astype(str)),
+        "Month": "2025-04",
+    }
+    kinds = ["fraction", "percent_str", "comma_str", "mixed", "whole"]
+    for i in range(cols - len(data)):
+        kind = kinds[i % len(kinds)]
+        name = f"KPI{i} {'Target' if i % 3 == 0 else 'Actual' if i % 3 == 1 else 'Rating'}"
+        frac = rng.integers(0, 14000, rows) / 10000  # 0 .. 1.4 in 0.01% steps
+        if kind == "fraction":
+            col = frac
+        elif kind == "percent_str":
+            col = np.char.add((frac * 100).round(2).astype(str), "%")
+        elif kind == "comma_str":
+            col = np.char.replace((frac * 100).round(1).astype(str), ".", ",")
+        elif kind == "whole":
+            col = rng.integers(60, 130, rows).astype(float)
+        else:
+            col = pd.Series(frac, dtype=object)
+            col[rng.random(rows) < 0.05] = None
+            col[rng.random(rows) < 0.02] = "N/A"
+            col[rng.random(rows) < 0.02] = " 87,5 % "
+            col = col.to_numpy()
+        data[name] = col
+    data["Final Score"] = rng.integers(7000, 11500, rows) / 100
+    return pd.DataFrame(data)
+
+
+def make_upload_workbook(rows: int = 20_000, cols: int = 30) -> bytes:
+    """XLSX bytes shaped like a real upload: two title rows above the header on a 'Data' sheet."""
+    from openpyxl import Workbook
+    df = make_scorecard_frame(rows, cols)
+    df.insert(2, "Function Lead", "FL1")
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Data")
+    ws.append(["Monthly scorecard"])
+    ws.append([])
+    ws.append(list(df.columns))
+    for row in df.itertuples(index=False):
+        ws.append([None if isinstance(v, float) and np.isnan(v) else v for v in row])
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def _frames_equal(a: pd.DataFrame, b: pd.DataFrame) -> bool:
+    if list(a.columns) != list(b.columns):
+        return False
+    for col in a.columns:
+        x, y = a[col], b[col]
+        if x.dtype.kind == "f" or y.dtype.kind == "f":
+            if not np.allclose(pd.to_numeric(x), pd.to_numeric(y), rtol=0, atol=0, equal_nan=True):
+                return False
+        elif not (x.isna().equals(y.isna()) and (x[x.notna()].astype(str) == y[y.notna()].astype(str)).all()):
+            return False
+    return True
+
+
+def _display_matches_legacy(legacy: pd.DataFrame, display: pd.DataFrame) -> bool:
+    """Same cells as the legacy text, except that NA tokens ("N/A", "-", ...) are now blank."""
+    if list(legacy.columns) != list(display.columns):
+        return False
+    for col in legacy.columns:
+        x = legacy[col].astype(object)
+        x = x.where(~x.astype(str).str.strip().str.lower().isin(ingest.NA_TOKENS), None)
+        y = display[col].astype(object)
+        if not (x.isna().equals(y.isna()) and (x[x.notna()].astype(str) == y[y.notna()].astype(str)).all()):
+            return False
+    return True
+
+
+def _best_of(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 2**20
+
+
+def bench_percent_normalization(rows: int, cols: int):
+    """Percent text rule: per-cell Series.apply (legacy) vs once per distinct value (percent_display_series)."""
+    base = make_scorecard_frame(rows, cols)
+    pct = ingest.percent_columns(base)
+    normalize = lambda: pd.DataFrame({c: ingest.percent_display_series(base[c]) for c in pct})
+    assert _frames_equal(legacy_convert_percentage_columns(base.copy())[pct], normalize()), \
+        "percent_display_series diverges from the legacy rule"
+    t_legacy = _best_of(lambda: legacy_convert_percentage_columns(base.copy()))
+    t_new = _best_of(normalize)
+    print(f"percent normalization  {rows}x{cols}: legacy {t_legacy:.3f}s  vectorized {t_new:.3f}s  "
+          f"({t_legacy / t_new:.1f}x)")
+
+
+def bench_percent_storage(rows: int, cols: int):
+    base = make_scorecard_frame(rows, cols)
+    pct = ingest.percent_columns(base)
+    legacy_text = legacy_convert_percentage_columns(base.copy())
+    display = pd.DataFrame({c: ingest.percent_display_series(base[c]) for c in pct})
+    assert _frames_equal(legacy_text[pct], display), "percent_display_series diverges from the legacy rule"
+    typed = ingest.type_percent_columns(base.copy())
+    assert _display_matches_legacy(legacy_text, ingest.format_percent_columns(typed)), "typed round trip diverges"
+    # A metric with real text in one month only: months typed apart (one partition each) and widened
+    # when read together must give the frame typing them as one upload gives
+    raw, half = base.copy(), rows // 2
+    raw[pct[0]] = raw[pct[0]].astype(object)
+    raw.loc[rows - 1, pct[0]] = "Meets"
+    months = [ingest.type_percent_columns(raw.iloc[:half].copy()), ingest.type_percent_columns(raw.iloc[half:].copy())]
+    read_together = pd.concat(ingest.widen_frames(months), ignore_index=True)
+    assert _frames_equal(ingest.type_percent_columns(raw.copy()), read_together), "partitions don't widen alike"
+
+    t_legacy = _best_of(lambda: legacy_convert_percentage_columns(base.copy()))
+    t_new = _best_of(lambda: ingest.type_percent_columns(base.copy()))
+    print(f"upload normalization   {rows}x{cols}: legacy {t_legacy:.3f}s  typed {t_new:.3f}s  "
+          f"({t_legacy / t_new:.1f}x)")
+
+    # Every page load used to rebuild the `_num` companions from the stored text; typed frames are used as loaded
+    t_reparse = _best_of(lambda: legacy_add_numeric_percent_columns(legacy_text.copy()))
+    loaded = legacy_add_numeric_percent_columns(legacy_text.copy())
+    print(f"per-load reparse       {rows}x{cols}: legacy {t_reparse:.3f}s  typed none")
+    print(f"loaded frame memory    {rows}x{cols}: legacy {_mb(loaded):.1f} MB  typed {_mb(typed):.1f} MB")
+    shown = typed.head(500)
+    t_fmt = _best_of(lambda: ingest.format_percent_columns(shown))
+    print(f"display formatting     500 rows: {t_fmt * 1000:.1f} ms")
+
+
+def bench_dimension_filters(rows: int, months: int = 12):
+    """A year of uploads: dimension columns as object text vs categoricals (what the loaders now produce)."""
+    month = make_scorecard_frame(rows, 8)[["Domain ID", "Name", "Function", "Team Lead", "Final Score"]]
+    plain = pd.concat([month.assign(**{"Attachment ID": f"{i:08x}-0000-4000-8000-{i:012x}"}) for i in range(months)],
+                      ignore_index=True)
+    dims = [c for c in ingest.DIMENSION_COLUMNS if c in plain.columns]
+    encoded = plain.assign(**{c: ingest.as_dimension(plain[c]) for c in dims})
+    picks = {"Function": ["IT", "Ops"], "Team Lead": [f"TL{i}" for i in range(0, 200, 3)]}
+
+    def filter_plain():
+        mask = pd.Series(True, index=plain.index)
+        for col, values in picks.items():
+            mask &= plain[col].astype(str).isin(values)
+        return plain[mask]
+
+    def filter_encoded():
+        mask = pd.Series(True, index=encoded.index)
+        for col, values in picks.items():
+            mask &= ingest.isin_text(encoded[col], values)
+        return encoded[mask]
+
+    assert filter_plain().index.equals(filter_encoded().index), "categorical filter diverges"
+    by_plain = plain.groupby("Team Lead")["Final Score"].mean()
+    by_encoded = encoded.groupby("Team Lead", observed=True)["Final Score"].mean()
+    assert np.allclose(by_plain.to_numpy(), by_encoded.to_numpy()), "categorical groupby diverges"
+
+    n = len(plain)
+    t_plain, t_enc = _best_of(filter_plain), _best_of(filter_encoded)
+    print(f"multiselect filter     {n} rows: text {t_plain * 1000:.1f} ms  codes {t_enc * 1000:.1f} ms  "
+          f"({t_plain / t_enc:.1f}x)")
+    g_plain = _best_of(lambda: plain.groupby("Team Lead")["Final Score"].mean())
+    g_enc = _best_of(lambda: encoded.groupby("Team Lead", observed=True)["Final Score"].mean())
+    print(f"groupby mean           {n} rows: text {g_plain * 1000:.1f} ms  codes {g_enc * 1000:.1f} ms  "
+          f"({g_plain / g_enc:.1f}x)")
+    print(f"dimension memory       {n} rows: text {_mb(plain[dims]):.1f} MB  categorical {_mb(encoded[dims]):.1f} MB")
+
+
+def bench_month_filter(rows: int, months: int = 12):
+    """Month multiselect: parse the Month column on every rerun vs the MONTH_KEY column computed at load."""
+    starts = pd.date_range("2025-01-01", periods=months, freq="MS")
+    frame = pd.DataFrame({"Month": np.repeat(starts, rows // months + 1)[:rows]})
+    picks = ["2025-03", "2025-04"]
+    assert legacy_month_str_series(frame).equals(ingest.normalized_month(frame).astype(object)), "month key diverges"
+    t_once = _best_of(lambda: ingest.normalized_month(frame))
+    frame[ingest.MONTH_KEY] = ingest.normalized_month(frame)
+    t_legacy = _best_of(lambda: frame[legacy_month_str_series(frame).isin(picks)])
+    t_new = _best_of(lambda: frame[ingest.isin_text(frame[ingest.MONTH_KEY], picks)])
+    print(f"month filter           {rows} rows: parse per rerun {t_legacy * 1000:.1f} ms  precomputed "
+          f"{t_new * 1000:.1f} ms  ({t_legacy / t_new:.1f}x; {t_once * 1000:.1f} ms once per load)")
+
+
+def _year_of_months(rows: int, months: int = 12) -> pd.DataFrame:
+    """A dataset as loaded: `months` monthly uploads of `rows` rows, dimensions categorical, MONTH_KEY added."""
+    month = make_scorecard_frame(rows, 8)
+    month.insert(2, "Function Lead", np.char.add("FL", (np.arange(rows) % 9).astype(str)))
+    year = pd.concat([month.assign(Month=f"2025-{m + 1:02d}", **{"Attachment ID": f"a{m}"}) for m in range(months)],
+                     ignore_index=True)
+    year = year.assign(**{c: ingest.as_dimension(year[c]) for c in ingest.DIMENSION_COLUMNS if c in year.columns})
+    year[ingest.MONTH_KEY] = ingest.normalized_month(year)
+    return year
+
+
+def bench_filter_index(rows: int, months: int = 12, queries: int = 50):
+    """Dashboard filters: per-column isin scans (filter_combined without an index) vs FilterIndex masks."""
+    year = _year_of_months(rows, months)
+    rng = np.random.default_rng(3)
+    options = {c: year[c].cat.categories.astype(str) for c in ingest.FILTER_INDEX_COLUMNS}
+    picks = [{c: list(rng.choice(options[c], rng.integers(1, 4 if c == "Domain ID" else len(options[c]) // 2 + 2)))
+              for c in rng.choice(ingest.FILTER_INDEX_COLUMNS, rng.integers(1, 5), replace=False)}
+             for _ in range(queries)]
+
+    def scan(pick):
+        df = year
+        for col, values in pick.items():
+            df = df[ingest.isin_text(df[col], values)]
+        return df
+
+    t0 = time.perf_counter()
+    index = ingest.FilterIndex(year)
+    t_build = time.perf_counter() - t0
+    indexed = lambda pick: year[np.logical_and.reduce([index.mask(c, v) for c, v in pick.items()])]
+    for pick in picks:
+        assert scan(pick).index.equals(indexed(pick).index), f"FilterIndex diverges on {pick}"
+    t_scan = _best_of(lambda: [scan(p) for p in picks]) / queries
+    t_index = _best_of(lambda: [indexed(p) for p in picks]) / queries
+    print(f"filter index           {len(year)} rows: scan {t_scan * 1000:.1f} ms  index {t_index * 1000:.1f} ms  "
+          f"({t_scan / t_index:.1f}x; built once per load in {t_build * 1000:.0f} ms, {index.nbytes / 2**20:.1f} MB)")
+
+
+def scan_search(df: pd.DataFrame, q: str) -> pd.DataFrame:
+    """Rows where any text column contains `q`, ignoring case: one str.contains pass per column on every search."""
+    q, mask = q.lower(), np.zeros(len(df), dtype=bool)
+    for col in df.columns:
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype) or s.dtype == object or pd.api.types.is_string_dtype(s.dtype):
+            mask |= (s.notna() & s.astype(str).str.lower().str.contains(q, regex=False)).to_numpy()
+    return df[mask]
+
+
+def bench_search_index(rows: int, months: int = 12):
+    """YTD search box: a str.contains scan of every text column vs SearchIndex trigram lookups."""
+    year = ingest.type_percent_columns(_year_of_months(rows, months))
+    queries = ["asha", "D00012", "finance", "tl19", "2025-03", "n/a", "zz", "e"]
+    t0 = time.perf_counter()
+    index = ingest.SearchIndex(year)
+    t_build = time.perf_counter() - t0
+    for q in queries:
+        assert scan_search(year, q).index.equals(year[index.mask(q)].index), f"SearchIndex diverges on {q!r}"
+    t_scan = _best_of(lambda: [scan_search(year, q) for q in queries], repeat=2) / len(queries)
+    t_index = _best_of(lambda: [year[index.mask(q)] for q in queries]) / len(queries)
+    print(f"search index           {len(year)} rows: scan {t_scan * 1000:.0f} ms  index {t_index * 1000:.1f} ms  "
+          f"({t_scan / t_index:.0f}x; built on the first search in {t_build * 1000:.0f} ms, "
+          f"{index.nbytes / 2**20:.1f} MB)")
+
+
+def bench_upload_read(rows: int):
+    data = make_upload_workbook(rows)
+    legacy = legacy_read_data_sheet(data)
+    current = ingest.read_data_sheet(data, REQUIRED_COLS, engine="openpyxl")
+    assert legacy.equals(current), "single-pass read diverges"
+    t_legacy = _best_of(lambda: legacy_read_data_sheet(data), repeat=2)
+    t_new = _best_of(lambda: ingest.read_data_sheet(data, REQUIRED_COLS, engine="openpyxl"), repeat=2)
+    print(f"upload read            {rows}x{current.shape[1]}: two parses {t_legacy:.3f}s  one parse {t_new:.3f}s  "
+          f"({t_legacy / t_new:.1f}x)")
+
+    # Reader engines on the same workbook, against openpyxl as the reference
+    for engine in ingest.EXCEL_ENGINES:
+        if engine not in ingest.available_excel_engines():
+            print(f"excel engine {engine:<9} not installed (pip install python-{engine}); skipped")
+            continue
+        frame = ingest.read_data_sheet(data, REQUIRED_COLS, engine=engine)
+        try:
+            pd.testing.assert_frame_equal(current, frame, check_dtype=False)
+            same = "same frame"
+        except AssertionError as e:
+            same = f"differs: {str(e).splitlines()[0]}"
+        t = _best_of(lambda: ingest.read_data_sheet(data, REQUIRED_COLS, engine=engine), repeat=2)
+        print(f"excel engine {engine:<9} {rows}x{frame.shape[1]}: {t:.3f}s  ({t_new / t:.1f}x vs openpyxl, {same})")
+
+
+def bench_projected_load(rows: int, months: int = 12, active: int = 10):
+    """YTD cold load: every monthly partition with every column vs the active ones' summary columns only."""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("projected load         pyarrow not installed; skipped")
+        return
+    month = ingest.type_percent_columns(make_scorecard_frame(rows, 60))
+    metrics = set(ingest.metric_columns(month)) - {"Final Score"}
+    summary = [c for c in month.columns if c not in metrics] + ["Attachment ID"]
+    with tempfile.TemporaryDirectory() as d:
+        paths = [os.path.join(d, f"{i}.parquet") for i in range(months)]
+        for i, path in enumerate(paths):
+            month.assign(**{"Attachment ID": str(i)}).to_parquet(path, index=False)
+        full = lambda: pd.concat([pd.read_parquet(p) for p in paths], ignore_index=True)
+        projected = lambda: pd.concat([pd.read_parquet(p, columns=summary) for p in paths[:active]], ignore_index=True)
+        everything, view = full(), projected()
+        wanted = everything[everything["Attachment ID"].isin([str(i) for i in range(active)])]
+        assert view.equals(wanted[summary].reset_index(drop=True)), "projected read diverges"
+        chunk_bytes = lambda ps, cols=None: sum(
+            md.row_group(g).column(c).total_compressed_size
+            for md in (pq.ParquetFile(p).metadata for p in ps)
+            for g in range(md.num_row_groups) for c in range(md.num_columns)
+            if cols is None or md.row_group(g).column(c).path_in_schema in cols
+        )
+        b_full, b_view = chunk_bytes(paths), chunk_bytes(paths[:active], set(summary))
+        t_full, t_view = _best_of(full), _best_of(projected)
+    print(f"projected load         {months}x{rows} rows: all {t_full * 1000:.0f} ms / {b_full / 2**20:.1f} MB  "
+          f"summary {t_view * 1000:.0f} ms / {b_view / 2**20:.1f} MB  ({b_view / b_full:.0%} of the bytes)")
+
+
+if __name__ == "__main__":
+    warnings.simplefilter("ignore", pd.errors.PerformanceWarning)  # the legacy column-by-column inserts
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    n_cols = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    bench_percent_normalization(n_rows, n_cols)
+    bench_percent_storage(n_rows, n_cols)
+    bench_dimension_filters(n_rows)
+    bench_month_filter(n_rows * 12)
+    bench_filter_index(n_rows)
+    bench_search_index(n_rows)
+    bench_upload_read(n_rows // 5)
+    bench_projected_load(n_rows // 10)
@@ -0,0 +1,533 @@
+"""
+Pure reading/parsing/normalization helpers for scorecard uploads, and the indexes over loaded frames.
+
+Kept free of Streamlit so they can be imported by worker processes and by benchmarks.py.
+"""
+import io
+import os
+import weakref
+from itertools import chain, islice
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.cell.cell import ERROR_CODES
+from pandas.io.parsers import TextParser
+
+try:  # Rust-backed XLSX reader (pandas engine="calamine"); optional, openpyxl is the fallback
+    import python_calamine  # noqa: F401
+except ImportError:
+    python_calamine = None
+
+
+# -------------------------------------
+# Workbook reading
+# -------------------------------------
+HEADER_SCAN_ROWS = 10  # the header row must be within the first rows of the sheet
+EXCEL_ENGINES = ("calamine", "openpyxl")  # fastest first
+
+def available_excel_engines() -> list:
+    return [e for e in EXCEL_ENGINES if e != "calamine" or python_calamine is not None]
+
+def excel_engine_order(requested=None) -> list:
+    """
+    Engines to try, in order. `requested` (default: $EXCEL_READER_ENGINE) is "auto" for the fastest
+    installed engine, or an engine name to prefer it; openpyxl always remains as the fallback.
+    """
+    requested = (requested or os.getenv("EXCEL_READER_ENGINE", "auto")).strip().lower()
+    available = available_excel_engines()
+    if requested in available:
+        return [requested] + [e for e in available if e != requested]
+    return available
+
+def find_header_row(xls, sheet_name, required_cols) -> int:
+    """Index of the first row naming every required column; reads only the first HEADER_SCAN_ROWS rows."""
+    head = pd.read_excel(xls, sheet_name=sheet_name, header=None, nrows=HEADER_SCAN_ROWS)
+    for i in range(len(head)):
+        row = [str(v).strip() for v in head.iloc[i].tolist()]
+        if all(col in row for col in required_cols):
+            return i
+    return 0
+
+def detect_header_and_read(xls, sheet_name, required_cols):
+    # The workbook is opened once (read-only); the header scan stops after a few rows, the body is parsed once
+    header_idx = find_header_row(xls, sheet_name, required_cols)
+    df = pd.read_excel(xls, sheet_name=sheet_name, header=header_idx)
+    df.columns = df.columns.str.strip()
+    return df
+
+def read_data_sheet(file_bytes, required_cols, sheet_name="Data", engine=None):
+    """Parse the upload's data sheet with the preferred engine, falling back to the next one if it fails."""
+    error = None
+    for name in excel_engine_order(engine):
+        try:
+            xls = pd.ExcelFile(io.BytesIO(file_bytes), engine=name)
+        except Exception as e:
+            error = error or e
+            continue
+        with xls:
+            if sheet_name not in xls.sheet_names:
+                raise ValueError(f"Missing required sheet: {sheet_name}")
+            try:
+                return detect_header_and_read(xls, sheet_name, required_cols)
+            except Exception as e:
+                error = error or e
+    raise ValueError(f"Invalid Excel file: {error}")
+
+def _column_names(header) -> list:
+    """read_excel's names for a header row: blanks become "Unnamed: i", repeats get ".1", ".2", ..."""
+    cells = list(header)
+    while cells and cells[-1] is None:
+        cells.pop()
+    names, seen = [], {}
+    for i, v in enumerate(cells):
+        name = f"Unnamed: {i}" if v is None else str(v).strip()
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        seen.setdefault(name, 0)
+        names.append(name)
+    return names
+
+def _cell(v):
+    # Same conversions as pandas' openpyxl reader: integral floats become ints, error cells become NaN
+    if v is None:
+        return ""
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    if isinstance(v, str) and v in ERROR_CODES:
+        return np.nan
+    return v
+
+def _rows_frame(rows, names) -> pd.DataFrame:
+    width = len(names)
+    data = [r[:width] + [""] * (width - len(r)) for r in rows]
+    return TextParser(data, names=names, header=None).read() if data else pd.DataFrame(columns=names)
+
+def iter_data_sheet(source, required_cols, sheet_name="Data", chunk_rows=20000):
+    """
+    The data sheet as DataFrames of up to `chunk_rows` rows, read with openpyxl in read-only mode so
+    memory stays bounded whatever the file size (`source` is a path or binary file object). Header
+    detection, column names and cell conversion follow read_data_sheet; cells to the right of the
+    header row are ignored. Always yields at least one (possibly empty) chunk.
+    """
+    try:
+        wb = load_workbook(source, read_only=True, data_only=True)
+    except Exception as e:
+        raise ValueError(f"Invalid Excel file: {e}")
+    try:
+        if sheet_name not in wb.sheetnames:
+            raise ValueError(f"Missing required sheet: {sheet_name}")
+        rows = wb[sheet_name].iter_rows(values_only=True)
+        head = list(islice(rows, HEADER_SCAN_ROWS))
+        header_idx = next(
+            (i for i, r in enumerate(head) if all(c in [str(v).strip() for v in r] for c in required_cols)), 0
+        )
+        names = _column_names(head[header_idx]) if head else []
+        buf, blanks, emitted = [], [], False
+        for row in chain(head[header_idx + 1:], rows):
+            values = [_cell(v) for v in row]
+            if all(v == "" for v in values):
+                blanks.append(values)  # trailing blank rows are dropped, as read_excel does
+                continue
+            buf.extend(blanks)
+            blanks = []
+            buf.append(values)
+            if len(buf) >= chunk_rows:
+                yield _rows_frame(buf, names)
+                buf, emitted = [], True
+        if buf or not emitted:
+            yield _rows_frame(buf, names)
+    finally:
+        wb.close()
+
+def parse_upload_file(file_bytes, required_cols, engine=None):
+    """
+    (frame, error) for one upload: the Data sheet with percent metrics typed, or the reason it could
+    not be read. Module-level and picklable so bulk uploads can run it in a process pool.
+    """
+    try:
+        return type_percent_columns(read_data_sheet(file_bytes, required_cols, engine=engine)), None
+    except ValueError as e:
+        return None, str(e)
+
+
+# -------------------------------------
+# Percentage normalization
+# -------------------------------------
+def looks_like_percent_col(name: str) -> bool:
+    n = name.strip().lower()
+    return ("target" in n or "actual" in n or "rating" in n or "final score" in n
+            or n.endswith("_t") or n.endswith("_a") or n.endswith("_r"))
+
+def _companion_columns(df: pd.DataFrame) -> list:
+    """`<col>_num` numeric companions that older versions stored next to percent text."""
+    names = {str(c) for c in df.columns}
+    return [
+        col for col in df.columns
+        if str(col).endswith("_num") and str(col)[:-len("_num")] in names
+        and looks_like_percent_col(str(col)[:-len("_num")])
+    ]
+
+def percent_columns(df: pd.DataFrame) -> list:
+    """Percent-like columns, excluding legacy `<col>_num` companions."""
+    companions = set(_companion_columns(df))
+    return [col for col in df.columns if looks_like_percent_col(str(col)) and col not in companions]
+
+_KEEP = object()  # "leave the original cell as it was"
+
+def _percent_text(text: str):
+    s = text.strip().replace(" ", "").replace(",", ".")
+    if s.endswith("%"):
+        try:
+            val = float(s[:-1])
+            return f"{round(val, 2)}%"
+        except ValueError:
+            return s
+    try:
+        v = float(s)
+        return f"{round(v*100 if v <= 1.5 else v, 2)}%"
+    except ValueError:
+        return _KEEP
+
+def to_percent_str(x):
+    """Reference scalar rule: '%'-suffixed values are rounded as-is; bare numbers <= 1.5 are fractions."""
+    if pd.isna(x): return x
+    r = _percent_text(str(x))
+    return x if r is _KEEP else r
+
+def _display_numeric(s: pd.Series) -> pd.Series:
+    v = s.to_numpy(dtype=float, na_value=np.nan)
+    mask = ~np.isnan(v)
+    scaled = np.where(v <= 1.5, v * 100, v)[mask]
+    # Python's round() is correctly rounded and differs from np.round at ties, so format each distinct value once
+    uniq, inverse = np.unique(scaled, return_inverse=True)
+    display = s.astype(object)
+    display[mask] = np.asarray([f"{round(u, 2)}%" for u in uniq.tolist()], dtype=object)[inverse]
+    return display
+
+def _display_generic(s: pd.Series) -> pd.Series:
+    mask = s.notna().to_numpy()
+    codes, uniq = pd.factorize(s[mask].astype(str))  # the rule only looks at str(x)
+    results = [_percent_text(k) for k in uniq]
+    keep = np.fromiter((r is _KEEP for r in results), dtype=bool, count=len(results))
+    display = s.astype(object)
+    rows = np.flatnonzero(mask)
+    converted = ~keep[codes]
+    display.iloc[rows[converted]] = np.asarray(results, dtype=object)[codes[converted]]
+    return display
+
+def percent_display_series(s: pd.Series) -> pd.Series:
+    """
+    `s.apply(to_percent_str)`, computed once per distinct value so cost tracks cardinality
+    rather than row count.
+    """
+    if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+        v = s.to_numpy(dtype=float, na_value=np.nan)
+        if not np.signbit(v[v == 0]).any():  # -0.0 and 0.0 format differently but share a unique slot
+            return _display_numeric(s)
+    return _display_generic(s)
+
+def _with_columns(df: pd.DataFrame, columns: dict) -> pd.DataFrame:
+    """
+    `df` with `columns` replaced/appended, built as one consolidated frame. Setting dozens of
+    columns one by one fragments the block manager and makes every later op slower.
+    """
+    if not columns:
+        return df
+    if not df.columns.is_unique:
+        for name, values in columns.items():
+            df[name] = values
+        return df
+    data = {c: columns.get(c, df[c]) for c in df.columns}
+    data.update((c, v) for c, v in columns.items() if c not in data)
+    return pd.DataFrame(data, index=df.index)
+
+# -------------------------------------
+# Typed percent storage
+# -------------------------------------
+# Cells that mean "no value" in a percent column; anything else unparseable is real text.
+NA_TOKENS = frozenset({"", "-", "--", "na", "n/a", "#n/a", "nan", "none", "null"})
+
+def _points_from_display(display: pd.Series):
+    """Float percentage points for display text, or None when some cell is real text (e.g. "Meets")."""
+    mask = display.notna().to_numpy()
+    codes, uniq = pd.factorize(display[mask].astype(str))
+    keys = pd.Series(uniq, dtype=object).str.strip()
+    values = pd.to_numeric(keys.str.removesuffix("%"), errors="coerce")
+    if (values.isna() & ~keys.str.lower().isin(NA_TOKENS)).any():
+        return None
+    out = np.full(len(display), np.nan)
+    out[mask] = values.to_numpy(dtype=float)[codes]
+    return pd.Series(out, index=display.index)
+
+def type_percent_columns(df: pd.DataFrame, raw: bool = True) -> pd.DataFrame:
+    """
+    Percent-like columns as float64 percentage points, the storage schema for metrics.
+    raw=True applies the upload rule (bare numbers <= 1.5 are fractions); columns holding real
+    text keep the "97.5%" display text as before. raw=False is for frames read back from storage:
+    numeric columns are already typed and only legacy "97.5%" text is parsed.
+    Legacy `<col>_num` companions are dropped.
+    """
+    if df is None or df.empty:
+        return df
+    typed = {}
+    for col in percent_columns(df):
+        s = df[col]
+        if not raw and _is_number_series(s):
+            continue
+        display = percent_display_series(s)
+        values = _points_from_display(display)
+        if values is not None:
+            typed[col] = values
+        elif raw:
+            typed[col] = display
+    companions = _companion_columns(df)
+    if companions:
+        df = df.drop(columns=companions)
+    return _with_columns(df, typed)
+
+def _is_number_series(s: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s)
+
+def metric_columns(df: pd.DataFrame) -> list:
+    """Column-type registry: the percent-like columns that are stored as numbers."""
+    return [c for c in percent_columns(df) if _is_number_series(df[c])]
+
+def _format_points(s: pd.Series) -> pd.Series:
+    v = s.to_numpy(dtype=float, na_value=np.nan) + 0.0  # fold -0.0 into 0.0
+    mask = ~np.isnan(v)
+    uniq, inverse = np.unique(v[mask], return_inverse=True)
+    out = s.astype(object)
+    out[mask] = np.asarray([f"{round(u, 2)}%" for u in uniq.tolist()], dtype=object)[inverse]
+    return out
+
+def stored_text(name, s: pd.Series) -> pd.Series:
+    """`s` as text, for a column that has to hold text: percent metrics as "97.5%", other values as str."""
+    if _is_number_series(s) and looks_like_percent_col(str(name)):
+        s = _format_points(s)
+    s = s.astype(object)
+    return s.where(s.isna(), s.astype(str))
+
+def widen_frames(frames: list) -> list:
+    """
+    Frames read separately (one per partition) given one type per column before they are concatenated:
+    a column typed differently across them, e.g. a metric stored as numbers in one month and as text in
+    another, becomes text in all of them; mixed number types are left to concat.
+    """
+    kinds = {}
+    for frame in frames:
+        for name, s in frame.items():
+            if s.notna().any():  # an all-empty column says nothing about its type
+                kinds.setdefault(name, set()).add("number" if _is_number_series(s) else str(s.dtype))
+    mixed = {name for name, seen in kinds.items() if len(seen) > 1}
+    if not mixed:
+        return frames
+    return [_with_columns(f, {n: stored_text(n, f[n]) for n in f.columns if n in mixed}) for f in frames]
+
+def format_percent_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Display/export copy with metric columns rendered as "97.5%" text and without MONTH_KEY. Call it on
+    the rows about to be shown or downloaded, never on stored frames: formatting is per distinct value.
+    """
+    if df is not None and MONTH_KEY in df.columns:
+        df = df.drop(columns=MONTH_KEY)
+    if df is None or df.empty:
+        return df
+    return _with_columns(df, {c: _format_points(df[c]) for c in metric_columns(df)})
+
+
+# -------------------------------------
+# Dimension columns
+# -------------------------------------
+# Low-cardinality columns every page filters and groups by; loaded frames hold them as categoricals
+DIMENSION_COLUMNS = ["Domain ID", "Function", "Function Lead", "Team Lead", "Designation", "Name", "Attachment ID"]
+
+def as_dimension(s: pd.Series) -> pd.Series:
+    """Categorical over the text form of the values, since filters and option lists compare as text."""
+    return s.where(s.isna(), s.astype(str)).astype("category")
+
+def isin_text(s: pd.Series, values) -> pd.Series:
+    """`s.astype(str).isin(values)`; on a categorical only the category labels are compared, then the codes."""
+    if not isinstance(s.dtype, pd.CategoricalDtype):
+        return s.astype(str).isin(values)
+    wanted = s.cat.categories.astype(str).get_indexer(pd.Index([str(v) for v in values]).unique())
+    return pd.Series(np.isin(s.cat.codes.to_numpy(), wanted[wanted >= 0]), index=s.index)
+
+
+# -------------------------------------
+# Reporting month
+# -------------------------------------
+MONTH_KEY = "_month"  # normalized month added to loaded frames; never stored, dropped for display/export
+MONTH_SOURCE_COLUMNS = ["Month", "Reporting Month", "Report Month", "Date"]
+
+def _text_months(df: pd.DataFrame, rows: np.ndarray) -> np.ndarray:
+    """First non-blank MONTH_SOURCE_COLUMNS value of the `rows` (a mask) as stripped text, NaN where none is."""
+    out = np.full(int(rows.sum()), np.nan, dtype=object)
+    for col in MONTH_SOURCE_COLUMNS:
+        todo = pd.isna(out)
+        if col not in df.columns or not todo.any():
+            continue
+        s = pd.Series(df[col].to_numpy()[rows][todo], dtype=object)
+        text = s.astype(str).str.strip().where(s.notna())
+        out[todo] = text.where(text != "").to_numpy()
+    return out
+
+def normalized_month(df: pd.DataFrame) -> pd.Series:
+    """
+    YYYY-MM of every row, as a categorical: the row's first value among MONTH_SOURCE_COLUMNS that parses
+    as a date (Month, else Reporting Month, ... else Date). A row where none does keeps its first non-blank
+    value as text (a label like "Apr-FY25"), and is missing when it has none. This is the one month rule,
+    for filters and for filing uploads alike. Only each column's distinct values are parsed.
+    """
+    keys = np.full(len(df), -1, dtype=np.int64)  # year * 100 + month, -1 while unknown
+    for col in MONTH_SOURCE_COLUMNS:
+        todo = keys < 0
+        if col not in df.columns or not todo.any():
+            continue
+        codes, uniques = pd.factorize(df[col].to_numpy()[todo])
+        d = pd.to_datetime(pd.Series(np.asarray(uniques, dtype=object)), errors="coerce")
+        per_value = (d.dt.year * 100 + d.dt.month).fillna(-1).to_numpy(dtype=np.int64)
+        keys[todo] = np.append(per_value, -1)[codes]  # codes of -1 (missing values) pick the appended -1
+    codes, months = pd.factorize(keys, sort=True)
+    if len(months) and months[0] < 0:
+        codes, months = codes - 1, months[1:]
+    categories = pd.Index([f"{k // 100:04d}-{k % 100:02d}" for k in months.tolist()], dtype=object)
+    unknown = codes < 0
+    if unknown.any():
+        labels = _text_months(df, unknown)
+        found = pd.notna(labels)
+        if found.any():
+            categories = categories.append(pd.Index(np.unique(labels[found].astype(str))).difference(categories))
+            codes[np.flatnonzero(unknown)[found]] = categories.get_indexer(labels[found])
+    return pd.Series(pd.Categorical.from_codes(codes, categories=categories), index=df.index)
+
+
+# -------------------------------------
+# Frame indexes
+# -------------------------------------
+class _FrameIndex:
+    """Base of the indexes built over one shared (cached) frame; their masks are over its row positions."""
+    cache_key = None
+
+    def __init__(self, frame: pd.DataFrame):
+        self._frame = weakref.ref(frame)
+        self.rows = len(frame)
+        self._range = isinstance(frame.index, pd.RangeIndex) and frame.index.start == 0 and frame.index.step == 1
+        self._labels = None if self._range else frame.index
+
+    def indexes(self, frame) -> bool:
+        return self._frame() is frame
+
+    def positions(self, index: pd.Index) -> np.ndarray:
+        """Positions in the indexed frame of rows taken from it (their labels kept)."""
+        return index.to_numpy() if self._range else self._labels.get_indexer(index)
+
+FILTER_INDEX_COLUMNS = ["Domain ID", "Function", "Function Lead", "Team Lead", MONTH_KEY]
+
+class FilterIndex(_FrameIndex):
+    """
+    Sorted-codes index over the filter columns of a shared frame. Per column it keeps the row positions
+    ordered by category code and where each code's run starts, so the rows of any selected values are
+    a few slices; a filter combination is the AND of one boolean row mask per column.
+    """
+    cache_key = "filter_index"
+
+    def __init__(self, frame: pd.DataFrame):
+        super().__init__(frame)
+        self.columns = {}  # column -> (category labels as text, row positions by code, run starts)
+        for col in FILTER_INDEX_COLUMNS:
+            if col not in frame.columns or not isinstance(frame[col].dtype, pd.CategoricalDtype):
+                continue
+            s = frame[col]
+            codes = s.cat.codes.to_numpy()
+            order = np.argsort(codes, kind="stable")
+            starts = np.searchsorted(codes[order], np.arange(len(s.cat.categories) + 1))
+            self.columns[col] = (s.cat.categories.astype(str), order, starts)
+        self.nbytes = sum(order.nbytes + starts.nbytes for _, order, starts in self.columns.values())
+
+    def mask(self, col, values) -> np.ndarray:
+        """Row mask (over the indexed frame) of the rows whose `col` is one of `values`, compared as text."""
+        labels, order, starts = self.columns[col]
+        wanted = labels.get_indexer(pd.Index([str(v) for v in values]).unique())
+        mask = np.zeros(self.rows, dtype=bool)
+        for code in wanted[wanted >= 0]:
+            mask[order[starts[code]:starts[code + 1]]] = True
+        return mask
+
+class SearchIndex(_FrameIndex):
+    """
+    Case-insensitive substring search over the text columns (categorical, string or object) of a frame.
+    The columns' distinct values are pooled into one lowercased vocabulary, indexed by the byte trigrams
+    of its UTF-8 text: a query's candidates are the values holding all of its trigrams, confirmed with
+    a substring test, and each column maps the matching values to its rows through its codes.
+    """
+    cache_key = "search_index"
+
+    def __init__(self, frame: pd.DataFrame):
+        super().__init__(frame)
+        self.columns = {}  # column -> (row codes, vocabulary id of each code)
+        texts = []
+        for col in dict.fromkeys(frame.columns):
+            s = frame[col]
+            if isinstance(s.dtype, pd.CategoricalDtype):
+                codes, values = s.cat.codes.to_numpy(), s.cat.categories
+            elif s.dtype == object or pd.api.types.is_string_dtype(s.dtype):
+                codes, values = pd.factorize(s)
+                codes = codes.astype(np.int32)
+            else:
+                continue
+            self.columns[col] = codes
+            texts.append(pd.Index(values).astype(str).str.lower())
+        # one vocabulary entry per distinct lowercased text, whichever columns it occurs in
+        ids, vocab = pd.factorize(np.concatenate([t.to_numpy(dtype=object) for t in texts]) if texts else np.array([], dtype=object))
+        self.vocab = np.asarray(vocab, dtype=object)
+        bounds = np.cumsum([0] + [len(t) for t in texts])
+        for (col, codes), lo, hi in zip(list(self.columns.items()), bounds[:-1], bounds[1:]):
+            self.columns[col] = (codes, ids[lo:hi])
+        # (trigram, vocabulary id) pairs, sorted: the postings of a trigram are one contiguous run
+        data = np.frombuffer("\0".join(self.vocab).encode("utf-8"), dtype=np.uint8)
+        owner = np.repeat(np.arange(len(self.vocab), dtype=np.int64),
+                          [len(v.encode("utf-8")) + 1 for v in self.vocab])[:len(data)]
+        keys = np.unique((self._trigrams(data) << 32) | owner[:max(len(data) - 2, 0)])
+        keys = keys[(keys >> 32) > 0]  # trigrams spanning a separator were zeroed
+        self.trigrams, self.postings = (keys >> 32).astype(np.int32), (keys & 0xFFFFFFFF).astype(np.int32)
+        self.nbytes = (self.trigrams.nbytes + self.postings.nbytes + sum(v.nbytes for _, v in self.columns.values())
+                       + sum(c.nbytes for c, _ in self.columns.values() if c.dtype == np.int32))
+
+    @staticmethod
+    def _trigrams(data: np.ndarray) -> np.ndarray:
+        """Trigram code at every byte offset (0 where the three bytes include a NUL separator)."""
+        if len(data) < 3:
+            return np.zeros(0, dtype=np.int64)
+        a, b, c = (data[i:len(data) - 2 + i].astype(np.int64) for i in range(3))
+        return np.where((a > 0) & (b > 0) & (c > 0), (a << 16) | (b << 8) | c, 0)
+
+    def matching_values(self, q: str) -> np.ndarray:
+        """Vocabulary ids of the values containing `q` (case-insensitive)."""
+        q = q.lower()
+        candidates = None  # queries shorter than a trigram check every value
+        grams = np.unique(self._trigrams(np.frombuffer(q.encode("utf-8"), dtype=np.uint8)))
+        for gram in grams[grams > 0]:
+            lo, hi = np.searchsorted(self.trigrams, [gram, gram + 1])
+            posting = self.postings[lo:hi]
+            candidates = posting if candidates is None else np.intersect1d(candidates, posting, assume_unique=True)
+            if not len(candidates):
+                break
+        if candidates is None:
+            candidates = np.arange(len(self.vocab))
+        found = pd.Series(self.vocab[candidates], dtype=object).str.contains(q, regex=False).to_numpy(dtype=bool)
+        return candidates[found]
+
+    def mask(self, q: str, columns=None) -> np.ndarray:
+        """Row mask (over the indexed frame) of the rows where any of `columns` (default: all) contains `q`."""
+        hit = np.zeros(len(self.vocab) + 1, dtype=bool)  # the extra False is for missing values (code -1)
+        hit[self.matching_values(q)] = True
+        mask = np.zeros(self.rows, dtype=bool)
+        for col, (codes, value_ids) in self.columns.items():
+            if columns is not None and col not in columns:
+                continue
+            value_hit = np.append(hit[value_ids], False)
+            if value_hit.any():
+                mask |= value_hit[codes]
+        return mask
@@ -0,0 +1,77 @@
+"""
+Shared fixtures. app.py builds its UI at import time, so `app` loads everything above its
+"# Streamlit UI" section as a module, with DISK_PATH pointing at a fresh temporary directory.
+"""
+import datetime as dt
+import io
+import logging
+import os
+import sys
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    import streamlit as st
+    logging.getLogger("streamlit").setLevel(logging.ERROR)  # "no runtime" warnings of the cached helpers
+    monkeypatch.setenv("DISK_PATH", str(tmp_path / "data"))
+    st.cache_resource.clear()  # shared caches outlive a module; never let one test see another's data
+    st.cache_data.clear()
+    path = os.path.join(ROOT, "app.py")
+    with open(path, encoding="utf-8") as fh:
+        src = fh.read()
+    module = types.ModuleType("app")
+    module.__file__ = path
+    exec(compile(src[:src.index("# Streamlit UI")], path, "exec"), module.__dict__)
+    module.ensure_storage()
+    for dataset in ("ba", "pe", "tl", "pl"):
+        getattr(module, f"ensure_storage_{dataset}")()
+    yield module
+    st.cache_resource.clear()
+
+
+@pytest.fixture
+def scorecard():
+    """scorecard(rows, month="2025-04", seed=0): a Data sheet frame shaped like a real upload."""
+    def make(rows=40, month="2025-04", seed=0):
+        rng = np.random.default_rng(seed)
+        year, mo = map(int, month.split("-"))
+        return pd.DataFrame({
+            "Domain ID": [f"D{i:05d}" for i in range(rows)],
+            "Function": rng.choice(["Finance", "Ops", "HR", "IT"], rows),
+            "Function Lead": [f"FL{i % 3}" for i in range(rows)],
+            "Team Lead": [f"TL{i % 5}" for i in range(rows)],
+            "Name": [f"Person {i}" for i in range(rows)],
+            "Month": dt.datetime(year, mo, 1),
+            "KPI1 Target": rng.integers(50, 120, rows) / 100,
+            "KPI1 Actual": [f"{v:.1f}%" for v in rng.uniform(50, 120, rows)],
+            "Final Score": rng.integers(7000, 11000, rows) / 10000,
+            "Comments": rng.choice(["good", "needs work", ""], rows),
+        })
+    return make
+
+
+@pytest.fixture
+def workbook():
+    """workbook(frame, title_rows=2): XLSX bytes with `frame` on a "Data" sheet below a few title rows."""
+    def make(frame, title_rows=2):
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "Data"
+        for i in range(title_rows):
+            ws.append([f"Scorecard export line {i}"])
+        ws.append(list(frame.columns))
+        for row in frame.itertuples(index=False):
+            ws.append([None if isinstance(v, float) and np.isnan(v) else v for v in row])
+        buf = io.BytesIO()
+        wb.save(buf)
+        return buf.getvalue()
+    return make
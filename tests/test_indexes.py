@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import ingest
+
+
+@pytest.fixture
+def loaded(scorecard):
+    """Three months of uploads as a dataset load returns them: dimensions categorical, MONTH_KEY added."""
+    frame = pd.concat([scorecard(60, month, seed=i) for i, month in enumerate(["2025-03", "2025-04", "2025-05"])],
+                      ignore_index=True)
+    frame.loc[5, "Team Lead"] = None
+    frame = frame.assign(**{c: ingest.as_dimension(frame[c]) for c in ingest.DIMENSION_COLUMNS if c in frame.columns})
+    frame[ingest.MONTH_KEY] = ingest.normalized_month(frame)
+    return frame
+
+
+# ---- FilterIndex ----
+def test_filter_index_matches_the_column_scans(app, loaded):
+    index = ingest.FilterIndex(loaded)
+    rng = np.random.default_rng(0)
+    subset = loaded[loaded["Function"] != "HR"]  # rows taken from the indexed frame, labels kept
+    for _ in range(100):
+        d_ids, funcs, f_leads, t_leads, months = (
+            list(rng.choice(loaded[c].dropna().astype(str).unique(), rng.integers(0, 3)))
+            for c in ingest.FILTER_INDEX_COLUMNS
+        )
+        for df in (loaded, subset):
+            expected = app.filter_combined(df, d_ids, funcs, f_leads, t_leads, months)
+            got = app.filter_combined(df, d_ids, funcs, f_leads, t_leads, months, index=index)
+            assert got.index.equals(expected.index)
+
+
+def test_filter_index_compares_values_as_text(loaded):
+    index = ingest.FilterIndex(loaded)
+    assert np.array_equal(index.mask("Team Lead", ["TL1", "TL9"]), (loaded["Team Lead"] == "TL1").to_numpy())
+    assert not index.mask("Team Lead", ["None", "nan"]).any()  # a missing value is never selected
+    assert np.array_equal(index.mask(ingest.MONTH_KEY, ["2025-04"]), (loaded["Month"].dt.month == 4).to_numpy())
+
+
+def test_cached_index_is_rebuilt_for_a_reloaded_frame(app, loaded):
+    first = app.get_filter_index("Associates", loaded)
+    assert first.indexes(loaded) and app.get_filter_index("Associates", loaded) is first
+    reloaded = loaded.copy()  # same data version, another frame object
+    second = app.get_filter_index("Associates", reloaded)
+    assert second is not first and second.indexes(reloaded)
+    assert app.get_filter_index("Associates", reloaded) is second
+
+
+def test_monthly_page_rows_are_answered_from_the_dataset_index(app, scorecard, workbook):
+    frame = pd.concat([scorecard(30, "2025-03", seed=1), scorecard(30, "2025-04", seed=2)], ignore_index=True)
+    app.ba_process_upload("Business Analyst Q.xlsx", workbook(frame), "admin")
+    combined = app.ba_load_combined_cached()
+    _, _, latest = app.ba_get_latest_monthly_data(combined)
+    assert len(latest) == 30 and latest.index.isin(combined.index).all()
+    index = app.get_filter_index("BA", combined)
+    selection = ([], ["Ops", "IT"], [], ["TL1", "TL2", "TL3"], [])
+    got = app.filter_combined(latest, *selection, index=index)
+    assert len(got) and got.index.equals(app.filter_combined(latest, *selection).index)
+
+
+# ---- SearchIndex ----
+def scan(df, q):
+    """The plain pandas search: rows where any text column contains `q`, ignoring case."""
+    mask = np.zeros(len(df), dtype=bool)
+    for col in df.columns:
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype) or s.dtype == object or pd.api.types.is_string_dtype(s.dtype):
+            mask |= (s.notna() & s.astype(str).str.lower().str.contains(q.lower(), regex=False)).to_numpy()
+    return df[mask]
+
+
+@pytest.mark.parametrize("q", ["person 1", "PERSON 12", "ops", "o", "d0001", "Needs W", "2025-04", "fl2", "xyz",
+                               "é", ".", "(", "[a-z]"])
+def test_search_index_matches_a_column_scan(app, loaded, q):
+    loaded.loc[7, "Comments"] = "Café (revisit) [a-z]."
+    index = ingest.SearchIndex(loaded)
+    subset = loaded[loaded.index % 3 > 0]
+    expected = scan(subset, q)
+    assert app.apply_search(subset, q, index=index).index.equals(expected.index)
+    assert app.apply_search(subset, f"  {q} ").index.equals(expected.index)
+
+
+def test_search_skips_numeric_columns(loaded):
+    index = ingest.SearchIndex(loaded)
+    assert "Final Score" not in index.columns
+    score = str(loaded["Final Score"].iloc[0])
+    assert not index.mask(score).any()
@@ -0,0 +1,61 @@
+import io
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+import ingest
+
+REQUIRED_COLS = ["Domain ID", "Function", "Function Lead", "Team Lead"]
+
+
+# ---- Data sheet reading ----
+@pytest.mark.parametrize("title_rows", [0, 2, ingest.HEADER_SCAN_ROWS - 1])
+def test_header_row_is_found_below_title_rows(scorecard, workbook, title_rows):
+    frame = scorecard(12)
+    df = ingest.read_data_sheet(workbook(frame, title_rows), REQUIRED_COLS, engine="openpyxl")
+    assert list(df.columns) == list(frame.columns)
+    assert df["Domain ID"].tolist() == frame["Domain ID"].tolist()
+
+
+@pytest.mark.parametrize("engine", ingest.available_excel_engines())
+def test_engines_read_the_same_frame(scorecard, workbook, engine):
+    data = workbook(scorecard(12))
+    reference = ingest.read_data_sheet(data, REQUIRED_COLS, engine="openpyxl")
+    pd.testing.assert_frame_equal(ingest.read_data_sheet(data, REQUIRED_COLS, engine=engine), reference,
+                                  check_dtype=False)
+
+
+def test_unreadable_uploads_are_reported():
+    wb = Workbook()
+    wb.active.title = "Summary"
+    buf = io.BytesIO()
+    wb.save(buf)
+    assert ingest.parse_upload_file(buf.getvalue(), REQUIRED_COLS) == (None, "Missing required sheet: Data")
+    frame, error = ingest.parse_upload_file(b"not a workbook", REQUIRED_COLS)
+    assert frame is None and error.startswith("Invalid Excel file")
+
+
+def test_missing_required_columns_are_named(app, scorecard, workbook):
+    data = workbook(scorecard(5).drop(columns=["Team Lead"]), title_rows=0)
+    ok, msg, _ = app.process_upload("Associate April.xlsx", data, "admin")
+    assert not ok and msg == "Missing required columns in Data sheet: Team Lead"
+    assert app.load_history().empty
+
+
+# ---- Month normalization ----
+def test_text_months_are_kept_as_written():
+    df = pd.DataFrame({"Month": ["Apr-FY25", " Apr-FY25 ", None, "2025-03-01", "", "TBD"],
+                       "Date": [None, None, "May-FY25", None, None, "2025-06-15"]})
+    month = ingest.normalized_month(df)
+    assert month.astype(object).where(month.notna(), None).tolist() == [
+        "Apr-FY25", "Apr-FY25", "May-FY25", "2025-03", None, "2025-06"]  # a date in any column comes first
+
+
+def test_upload_with_text_months_is_filed_under_them(app, scorecard, workbook):
+    frame = pd.concat([scorecard(10, seed=1).assign(Month="Apr-FY25"), scorecard(10, seed=2).assign(Month="May-FY25")],
+                      ignore_index=True)
+    ok, msg, _ = app.process_upload("Associate Q1.xlsx", workbook(frame), "admin")
+    assert ok and sorted(app.load_history()["reporting_month"]) == ["Apr-FY25", "May-FY25"]
+    combined = app.load_combined_cached()
+    assert sorted(combined[ingest.MONTH_KEY].astype(str).unique()) == ["Apr-FY25", "May-FY25"]
@@ -0,0 +1,81 @@
+import os
+import sqlite3
+
+import pandas as pd
+
+
+def fresh_database(app):
+    for suffix in ("", "-wal", "-shm"):
+        try: os.remove(app.METADATA_DB + suffix)
+        except FileNotFoundError: pass
+
+
+# ---- SQLite metadata store ----
+def test_legacy_workbooks_are_imported_once(app):
+    fresh_database(app)
+    pd.DataFrame([
+        {"id": "a1", "filename": "April.xlsx", "reporting_month": "2025-04", "rows_count": 10, "active": "TRUE"},
+        {"id": "a2", "filename": "May.xlsx", "reporting_month": "2025-05", "rows_count": 12, "active": False},
+    ]).to_excel(app.HISTORY_FILE, index=False)
+    pd.DataFrame([
+        {"Domain ID": "D1", "Month": "2025-04", "Feedback": "first"},
+        {"Domain ID": "D1", "Month": "2025-04", "Feedback": "second"},
+        {"Domain ID": "D2", "Month": "2025-04", "Feedback": "other"},
+    ]).to_excel(app.FEEDBACK_FILE, index=False)
+    app.ensure_metadata_store()
+    app.ensure_metadata_store()
+
+    history = app.load_history()
+    assert history["id"].tolist() == ["a1", "a2"]
+    assert history["active"].tolist() == [True, False] and history["rows_count"].tolist() == [10, 12]
+    feedback = app.load_feedback()  # one comment per (Domain ID, Month), the newest of any duplicates
+    assert feedback[["Domain ID", "Feedback"]].values.tolist() == [["D1", "second"], ["D2", "other"]]
+
+
+def test_history_rows_are_updated_in_place(app):
+    for aid in ("a1", "a2"):  # the second supersedes the first
+        app.record_upload("Associates", {"id": aid, "saved_path": "", "reporting_month": "2025-04", "active": True})
+    history = app.load_history().set_index("id")
+    assert history.loc["a1", "superseded_by"] == "a2" and not history.loc["a1", "active"]
+    version = app.meta_table_version("history")
+    app.update_history("Associates", "a2", validation_status="Invalid")
+    assert app.get_history_row("Associates", "a2")["validation_status"] == "Invalid"
+    assert app.meta_table_version("history") != version
+
+
+def test_superseded_files_are_removed_and_failures_logged(app, tmp_path, caplog):
+    gone, stuck = tmp_path / "gone.xlsx", tmp_path / "stuck"
+    gone.write_bytes(b"old")
+    stuck.mkdir()  # os.remove() refuses a directory
+    for aid, path in (("a1", gone), ("a2", ""), ("a3", stuck), ("a4", "")):
+        app.record_upload("Associates", {"id": aid, "saved_path": str(path), "reporting_month": "2025-04",
+                                         "active": True})
+    assert not gone.exists() and stuck.exists()
+    logged = [r.getMessage() for r in caplog.records if "superseded file" in r.getMessage()]
+    assert len(logged) == 1 and logged[0].startswith(f"Associates: could not remove superseded file {stuck}: ")
+
+
+def test_feedback_upsert_keeps_one_row_per_domain_and_month(app):
+    app.upsert_feedback("D1", "Asha", "2025-04", "TL1", "good", "admin")
+    app.upsert_feedback("D1", "Asha", "2025-04", "TL1", "better", "admin")
+    app.upsert_feedback("D1", "Asha", "2025-05", "TL1", "new month", "admin")
+    feedback = app.load_feedback()
+    assert feedback[["Month", "Feedback"]].values.tolist() == [["2025-04", "better"], ["2025-05", "new month"]]
+
+
+def test_table_versions_move_only_with_their_own_table(app):
+    versions = lambda: {ds: app.history_version(ds) for ds in app.DATASET_KEYS}
+    before, feedback = versions(), app.meta_table_version("monthly_feedback")
+    app.upsert_feedback("D1", "Asha", "2025-04", "TL1", "good", "admin")
+    assert versions() == before and app.meta_table_version("monthly_feedback") != feedback
+
+    app.record_upload("BA", {"id": "b1", "saved_path": "", "reporting_month": "2025-04", "active": True})
+    after = versions()
+    assert after["BA"] != before["BA"] and all(after[ds] == before[ds] for ds in app.DATASET_KEYS if ds != "BA")
+
+
+def test_edits_made_outside_the_app_move_the_version(app):
+    version = app.history_version("PE")
+    with app.closing(sqlite3.connect(app.METADATA_DB)) as conn, conn:  # e.g. the sqlite3 shell
+        conn.execute("INSERT INTO pe_history (id, reporting_month) VALUES ('p1', '2025-04')")
+    assert app.history_version("PE") != version
@@ -0,0 +1,107 @@
+import os
+
+import pandas as pd
+
+
+def rows(attachment_id, n=3):
+    return pd.DataFrame({
+        "Domain ID": [f"D{i}" for i in range(n)], "Final Score": [90.0 + i for i in range(n)],
+        "Attachment ID": attachment_id,
+    })
+
+
+# ---- Partitioned Parquet store ----
+def test_partitions_load_in_manifest_order(app):
+    store = app.COMBINED_STORES["Associates"]
+    store.write_partition("b", rows("b", 2))
+    store.write_partition("a", rows("a", 3))
+    manifest = store._read_manifest()
+    assert list(manifest["partitions"]) == ["b", "a"]
+    assert [e["rows"] for e in manifest["partitions"].values()] == [2, 3]
+    assert store.load()["Attachment ID"].astype(str).tolist() == ["b"] * 2 + ["a"] * 3
+    assert store.load(attachment_ids=["a"])["Domain ID"].astype(str).tolist() == ["D0", "D1", "D2"]
+
+
+def test_drop_partition_touches_that_attachment_only(app):
+    store = app.COMBINED_STORES["Associates"]
+    store.write_partition("a", rows("a"))
+    store.write_partition("b", rows("b"))
+    kept = os.path.join(store.directory, store._partition_name("a"))
+    stamp, version = os.stat(kept).st_mtime_ns, store._read_manifest()["version"]
+    store.drop_partition("b")
+    manifest = store._read_manifest()
+    assert list(manifest["partitions"]) == ["a"] and manifest["version"] == version + 1
+    assert not os.path.exists(os.path.join(store.directory, store._partition_name("b")))
+    assert os.stat(kept).st_mtime_ns == stamp
+    store.drop_partition("b")  # already gone: no manifest write
+    assert store._read_manifest()["version"] == version + 1
+
+
+def test_version_token_changes_with_every_write(app):
+    store = app.COMBINED_STORES["Associates"]
+    seen = {store.version()}
+    store.write_partition("a", rows("a"))
+    seen.add(store.version())
+    store.write_partition("a", rows("a", 5))
+    seen.add(store.version())
+    store.drop_partition("a")
+    seen.add(store.version())
+    assert len(seen) == 4
+
+
+def test_legacy_combined_workbook_is_partitioned_once(app):
+    store = app.COMBINED_STORES["BA"]
+    for entry in store._read_manifest()["partitions"].values():
+        os.remove(os.path.join(store.directory, entry["file"]))
+    os.remove(store.manifest_path)
+    pd.concat([rows("x", 2), rows("y", 4)]).to_excel(store.legacy_xlsx, index=False)
+    store.ensure()
+    manifest = store._read_manifest()
+    assert {aid: e["rows"] for aid, e in manifest["partitions"].items()} == {"x": 2, "y": 4}
+    store.ensure()
+    assert store._read_manifest()["version"] == manifest["version"]
+
+
+# ---- Projected loads ----
+def test_ytd_view_reads_summary_columns_and_fills_the_rest_on_demand(app, scorecard, workbook):
+    frame = pd.concat([scorecard(30, "2025-03", seed=1), scorecard(30, "2025-04", seed=2)], ignore_index=True)
+    app.process_upload("Associate Q.xlsx", workbook(frame), "admin")
+    app.process_upload("Associate April.xlsx", workbook(scorecard(30, "2025-04", seed=3)), "admin")
+    ytd = app._load_ytd_view_cached("Associates")
+    assert "KPI1 Actual" not in ytd.columns and "Final Score" in ytd.columns
+    assert len(ytd) == 60  # the superseded April rows are not read
+
+    rows = ytd[ytd["Team Lead"].astype(str) == "TL1"]
+    table = app.load_view_columns("Associates", ytd, rows)
+    full = app.load_view("Associates").set_axis(ytd.index)  # same active partitions, in the same order
+    stored = list(app.stored_columns("Associates"))
+    assert list(table.columns[:len(stored)]) == stored
+    pd.testing.assert_frame_equal(table[stored], full.loc[rows.index, stored], check_dtype=False,
+                                  check_categorical=False)
+
+
+def test_default_ytd_table_reads_no_metric_columns(app, scorecard, workbook, monkeypatch):
+    frame = pd.concat([scorecard(30, month, seed=i) for i, month in enumerate(["2025-03", "2025-04"])],
+                      ignore_index=True)
+    app.process_upload("Associate Q.xlsx", workbook(frame), "admin")
+    store = app.COMBINED_STORES["Associates"]
+    chunks = []  # columns read, one entry per partition file
+    read_file = store._read_file
+    def counted(name, columns=None):
+        df = read_file(name, columns)
+        chunks.append(len(df.columns))
+        return df
+    monkeypatch.setattr(store, "_read_file", counted)
+
+    ytd = app._load_ytd_view_cached("Associates")
+    summary = len(app.summary_columns("Associates"))
+    assert chunks == [summary, summary] and summary < len(app.stored_columns("Associates"))
+    rows = ytd[ytd["Function"].astype(str) != "HR"]
+    assert app.filtered_ytd_table("Associates", ytd, rows) is rows  # the default page: nothing more is read
+    assert chunks == [summary, summary]
+
+    table = app.filtered_ytd_table("Associates", ytd, rows, every_column=True)
+    assert "KPI1 Actual" in table.columns and table.index.equals(rows.index)
+    assert len(chunks) == 4
+    assert app.filtered_ytd_table("Associates", ytd, rows, every_column=True) is table  # a rerun reads nothing
+    assert len(chunks) == 4
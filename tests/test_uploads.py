@@ -0,0 +1,208 @@
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+
+def stored_rows(app, file_bytes, attachment_id):
+    """The rows an upload of `file_bytes` should hold once stored, as text (stored form, Attachment ID set)."""
+    rows = app._typed_for_parquet(app.parse_upload(file_bytes))
+    rows["Attachment ID"] = attachment_id
+    return as_text(rows)
+
+
+def as_text(df):
+    df = df.reset_index(drop=True)
+    return df.astype(object).where(df.notna(), None).astype(str)
+
+
+def corrected(frame):
+    """`frame` with two scores changed, one row removed and one added: a small correction."""
+    fixed = frame.copy()
+    fixed.loc[[3, 4], "Final Score"] = 0.5
+    fixed = fixed.drop(index=10)
+    added = fixed.iloc[[0]].assign(**{"Domain ID": "NEW1"})
+    return pd.concat([fixed, added], ignore_index=True)
+
+
+# ---- Row-level deltas ----
+def test_corrected_reupload_is_stored_as_a_delta(app, scorecard, workbook):
+    store = app.COMBINED_STORES["Associates"]
+    first, fixed = scorecard(), corrected(scorecard())
+    assert app.process_upload("Associate April.xlsx", workbook(first), "admin")[0]
+    ok, msg, _ = app.process_upload("Associate April fixed.xlsx", workbook(fixed), "admin")
+    assert ok and "2 changed, 1 added, 1 removed" in msg
+
+    new_id = app.load_history()["id"].iloc[-1]
+    entry = store._read_manifest()["partitions"][new_id]
+    assert entry["delta_rows"] == 3 and entry["removed"] == ["D00010"] and entry["rows"] == len(fixed)
+    stored = as_text(store.load_partition(new_id))
+    assert stored.equals(stored_rows(app, workbook(fixed), new_id)[stored.columns])
+
+
+def test_delta_is_materialized_before_its_base_is_invalidated(app, scorecard, workbook):
+    store = app.COMBINED_STORES["Associates"]
+    fixed = workbook(corrected(scorecard()))
+    app.process_upload("Associate April.xlsx", workbook(scorecard()), "admin")
+    app.process_upload("Associate April fixed.xlsx", fixed, "admin")
+    base_id, new_id = app.load_history()["id"]
+
+    assert app.mark_invalid_and_cleanup(base_id, "admin")[0]
+    partitions = store._read_manifest()["partitions"]
+    assert list(partitions) == [new_id] and "base" not in partitions[new_id]
+    stored = as_text(store.load_partition(new_id))
+    assert stored.equals(stored_rows(app, fixed, new_id)[stored.columns])
+    assert len(app.load_combined()) == len(corrected(scorecard()))
+
+
+def test_large_correction_is_stored_in_full(app, scorecard, workbook):
+    store = app.COMBINED_STORES["Associates"]
+    app.process_upload("Associate April.xlsx", workbook(scorecard(seed=1)), "admin")
+    ok, msg, _ = app.process_upload("Associate April v2.xlsx", workbook(scorecard(seed=2)), "admin")
+    assert ok and "only these rows were stored" not in msg
+    new_id = app.load_history()["id"].iloc[-1]
+    assert "base" not in store._read_manifest()["partitions"][new_id]
+    assert app.load_history()["message"].iloc[-1].startswith("full vs ")
+
+
+# ---- Content-hash deduplication ----
+def test_identical_reupload_changes_nothing(app, scorecard, workbook):
+    store = app.COMBINED_STORES["Associates"]
+    data = workbook(scorecard())
+    app.process_upload("Associate April.xlsx", data, "admin")
+    before = store._read_manifest()
+    ok, msg, preview = app.process_upload("Associate April copy.xlsx", data, "admin")
+    assert ok and msg.endswith("nothing changed.") and len(preview) == 20
+    assert len(app.load_history()) == 1
+    assert store._read_manifest() == before
+
+
+def test_uploads_without_a_validation_status_are_matched(app, scorecard, workbook):
+    data = workbook(scorecard())
+    app.process_upload("Associate April.xlsx", data, "admin")
+    with app.closing(app._meta_connect()) as conn, conn:  # rows written before statuses were recorded
+        conn.execute("UPDATE history SET validation_status = NULL")
+    assert len(app.find_uploads_by_digest("Associates", app.upload_digest(data))) == 1
+    assert app.process_upload("Associate April copy.xlsx", data, "admin")[1].endswith("nothing changed.")
+    assert len(app.load_history()) == 1
+
+
+def test_identical_reupload_reactivates_the_superseded_file(app, scorecard, workbook):
+    first, second = workbook(scorecard(seed=1)), workbook(scorecard(seed=2))
+    app.process_upload("Associate April.xlsx", first, "admin")
+    app.process_upload("Associate April v2.xlsx", second, "admin")
+    ok, msg, _ = app.process_upload("Associate April again.xlsx", first, "admin")
+    history = app.load_history()
+    assert ok and "active file for month 2025-04 again" in msg
+    assert len(history) == 2 and history["active"].tolist() == [True, False]
+    with open(history["saved_path"].iloc[0], "rb") as f:
+        assert f.read() == first  # restored, so the attachment can still be rebuilt
+
+
+def test_reactivation_logs_a_superseded_file_it_cannot_remove(app, scorecard, workbook, caplog):
+    first = workbook(scorecard(seed=1))
+    app.process_upload("Associate April.xlsx", first, "admin")
+    app.process_upload("Associate April v2.xlsx", workbook(scorecard(seed=2)), "admin")
+    stuck = app.load_history()["saved_path"].iloc[1]
+    os.remove(stuck)
+    os.mkdir(stuck)  # os.remove() refuses a directory
+    ok, msg, _ = app.process_upload("Associate April again.xlsx", first, "admin")
+    assert ok and "active file for month 2025-04 again" in msg and os.path.isdir(stuck)
+    assert any(r.getMessage().startswith(f"Associates: could not remove superseded file {stuck}: ")
+               for r in caplog.records)
+
+
+def test_migration_hashes_files_uploaded_before_hashes_were_recorded(app, scorecard, workbook):
+    data = workbook(scorecard())
+    app.process_upload("Associate April.xlsx", data, "admin")
+    with app.closing(app._meta_connect()) as conn, conn:
+        conn.execute("UPDATE history SET content_sha256 = NULL")
+        conn.execute("DELETE FROM _migrations WHERE name = 'history_content_sha256'")
+    app.ensure_metadata_store()
+    assert app.load_history()["content_sha256"].tolist() == [app.upload_digest(data)]
+    assert app.process_upload("Associate April.xlsx", data, "admin")[1].endswith("nothing changed.")
+
+
+# ---- Staged parses ----
+def test_preview_and_processing_share_one_parse(app, scorecard, workbook, monkeypatch):
+    parses = []
+    def counted(*args, **kwargs):
+        parses.append(args[0])
+        return parse(*args, **kwargs)
+    parse = app.parse_upload_file
+    monkeypatch.setattr(app, "parse_upload_file", counted)
+    data = workbook(scorecard())
+    frame, error = app.preview_upload(data)
+    assert error is None and len(frame) == 40
+    assert app.process_upload("Associate April.xlsx", data, "admin")[0]
+    assert app.preview_upload(data)[0] is frame
+    assert len(parses) == 1
+
+
+def test_staged_uploads_evict_the_least_recently_used(app):
+    staged = app.StagedUploads(max_entries=2)
+    for digest in ("a", "b"):
+        staged.get(digest, lambda: (None, digest))
+    staged.get("a", lambda: None)  # touched: "b" is now the oldest
+    staged.get("c", lambda: (None, "c"))
+    assert [row["key"] for row in staged.stats()] == ["staged upload / a", "staged upload / c"]
+
+
+# ---- Background ingestion ----
+def run_job(app, queue, *upload):
+    done = threading.Event()
+    job_id = queue.submit("Associates", *upload, on_done=lambda job: done.set())
+    assert done.wait(30)
+    return queue.job(job_id)
+
+
+def test_queued_upload_finishes_with_its_result(app, scorecard, workbook):
+    job = run_job(app, app.IngestQueue(), "Associate April.xlsx", workbook(scorecard()), "admin")
+    assert job["state"] == "done" and job["message"] == "Uploaded and processed for month 2025-04."
+    assert len(job["preview"]) == 20 and len(app.load_combined()) == 40
+
+
+def test_failed_upload_leaves_storage_as_it_was(app, scorecard, workbook, monkeypatch):
+    store = app.COMBINED_STORES["Associates"]
+    app.process_upload("Associate April.xlsx", workbook(scorecard(seed=1)), "admin")
+    manifest, saved = store._read_manifest(), sorted(os.listdir(app.ATTACHMENTS_DIR))
+    def locked(*args):
+        raise sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(app, "record_uploads", locked)
+
+    job = run_job(app, app.IngestQueue(), "Associate April v2.xlsx", workbook(scorecard(seed=2)), "admin")
+    assert job["state"] == "failed" and job["message"] == "Processing failed: database is locked"
+    assert list(store._read_manifest()["partitions"]) == list(manifest["partitions"])
+    assert sorted(os.listdir(app.ATTACHMENTS_DIR)) == saved  # no partial copy left behind
+    assert len(app.load_history()) == 1
+
+
+def test_saved_copy_failure_keeps_the_committed_upload(app, scorecard, workbook, monkeypatch):
+    def full_disk(source, paths):
+        raise OSError(28, "No space left on device")
+    monkeypatch.setattr(app, "_place_saved_copies", full_disk)
+    ok, msg, _ = app.process_upload("Associate April.xlsx", workbook(scorecard()), "admin")
+    assert ok and "could not be kept for later rebuilds" in msg
+    assert app.load_history()["active"].tolist() == [True] and len(app.load_combined()) == 40
+    assert os.listdir(app.ATTACHMENTS_DIR) == []
+
+
+def test_drop_folder_errors_are_kept_for_the_admin_page(app, tmp_path):
+    watcher = app.DropFolderWatcher(str(tmp_path / "missing"), app.IngestQueue(), interval=0.01)
+    watcher._thread.start()  # not start(): the folder is never created, so every poll fails
+    try:
+        for _ in range(500):
+            if watcher.last_error:
+                break
+            time.sleep(0.01)
+        assert "No such file or directory" in watcher.last_error and watcher._thread.is_alive()
+        os.makedirs(watcher.directory)
+        for _ in range(500):
+            if not watcher.last_error:
+                break
+            time.sleep(0.01)
+        assert watcher.last_error == "" and watcher.last_poll
+    finally:
+        watcher.stop()